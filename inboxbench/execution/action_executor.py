@@ -0,0 +1,69 @@
+import logging
+
+from execution.mutation_plan import (
+    CONFLICT_TAGS, TOGGLE_CHUNK, TOGGLE_WORKERS, build_plan, apply_plan,
+)
+
+class ActionExecutor:
+    """
+    Applies a whole run's DecisionEngine actions to Instantly in bulk.
+
+    Instead of per-account remove/add calls (each preceded by a full tag
+    listing), the actions become one minimal mutation plan (execution/mutation_plan.py):
+    tag IDs resolved once, changes diffed against current tags and grouped
+    by (tag, assign), then sent as toggle-resource calls carrying up to
+    TOGGLE_CHUNK accounts each, a few at a time under the client's rate limiter.
+    """
+    def __init__(self, api, tag_map, conflict_tags=CONFLICT_TAGS, max_workers=TOGGLE_WORKERS, chunk_size=TOGGLE_CHUNK):
+        self.api = api
+        self.tag_map = tag_map
+        self.conflict_tags = conflict_tags
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._refreshed = None
+
+    def resolve(self, name):
+        """Fallback for tag names missing from the hydrated map: one API refresh, then cached."""
+        if self._refreshed is None:
+            try:
+                self._refreshed = {label: tid for tid, label in reversed(list(self.api.get_all_tags_map().items()))}
+            except Exception as e:
+                logging.warning(f"Failed to refresh tag map: {e}")
+                self._refreshed = {}
+        return self._refreshed.get(name)
+
+    def plan(self, items):
+        """items: [(account, action), ...] -> mutation plan dict"""
+        return build_plan(items, self.tag_map, resolve=self.resolve,
+                          conflict_tags=self.conflict_tags, chunk_size=self.chunk_size)
+
+    def apply(self, plan, apply_warmup=False, journal=None, unit=None, deadline=None):
+        skip, on_batch = None, None
+        if journal is not None:
+            prefix = "" if unit is None else f"{unit}/"
+            skip = {k[len(prefix):] for k in journal.applied if k.startswith(prefix)} if prefix else journal.applied
+            on_batch = lambda key, ok: journal.record_mutation(prefix + key, ok)
+        return apply_plan(self.api, plan, apply_warmup=apply_warmup,
+                          max_workers=self.max_workers, chunk_size=self.chunk_size,
+                          skip=skip, on_batch=on_batch, deadline=deadline)
+
+    def execute(self, items, journal=None, unit=None, deadline=None):
+        """
+        Plans + applies every action. Returns per-account outcomes {email: outcome} for each action.
+        With a RunJournal (lib/run_journal.py) the plan (with a unit, also its actions) and
+        each applied batch are recorded, and a resumed run reuses the journaled plan and
+        skips batches already applied.
+        unit names the part of the run these actions are (a customer bucket), so several
+        plans can share one journal. Batches still unsent when deadline expires come back
+        as "queued" in the outcomes.
+        """
+        plan = journal.get_plan(unit) if journal is not None else None
+        if plan is None:
+            plan = self.plan(items)
+            if journal is not None: journal.record_plan(plan, unit=unit, actions=[action for _, action in items] if unit is not None else None)
+        logging.info(f"Mutation plan{f' ({unit})' if unit is not None else ''}: {plan['stats']} | cost {plan['cost']}")
+        outcomes = self.apply(plan, journal=journal, unit=unit, deadline=deadline)
+        for _, action in items:
+            outcomes.setdefault(action["email"], {"email": action["email"], "removed": [], "added": [],
+                                                  "failed": [], "queued": [], "skipped": None, "warmup": None})
+        return outcomes
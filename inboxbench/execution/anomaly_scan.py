@@ -0,0 +1,187 @@
+"""
+Fleet-wide warmup anomaly scan over recorded daily snapshots.
+
+For every account (and every sending domain, using the daily mean of its
+inboxes) the trailing window of warmup scores gives a baseline mean, a
+least-squares slope and the z-score of today's score against the baseline.
+Accounts that are still above their Sick threshold but dropping sharply go on
+a pre-emptive "watch" list. Everything is computed on (accounts x days) arrays
+in one pass; no per-account Python loops.
+
+Usage:
+    python3 anomaly_scan.py --snapshots data/snapshots [--days 30] [--window 7]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.snapshots import load_snapshots
+from execution.decision_engine import WARMUP_INBOX_MIN
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(levelname)s: %(message)s')
+
+DEFAULT_WINDOW = 7
+DEFAULT_Z = 2.5          # today this many baseline std-devs below the baseline mean
+DEFAULT_SLOPE = -1.5     # points per day over the window
+MIN_STD = 1.0            # scores are integers; flatter baselines would make every 1-point dip a spike
+MIN_POINTS = 4           # days of history needed before an account can be flagged
+WATCH_LIST_LIMIT = 50    # entries kept in run_summary (the total is always reported)
+
+def build_score_matrix(snapshots):
+    """
+    Stacks snapshots into a (n_accounts, n_days) float32 matrix, NaN where an
+    account has no score that day. Returns (emails, customer_tags, scores).
+    """
+    index = {}
+    emails = []
+    customer_tags = []
+    for snap in snapshots:
+        cols = snap["accounts"]
+        tags = cols.get("customer_tag") or [None] * len(cols["email"])
+        for email, tag in zip(cols["email"], tags):
+            if email not in index:
+                index[email] = len(emails)
+                emails.append(email)
+                customer_tags.append(tag)
+            else:
+                customer_tags[index[email]] = tag # Latest wins
+
+    scores = np.full((len(emails), len(snapshots)), np.nan, dtype=np.float32)
+    for d, snap in enumerate(snapshots):
+        cols = snap["accounts"]
+        idx = np.fromiter(map(index.__getitem__, cols["email"]), dtype=np.int64, count=len(cols["email"]))
+        scores[idx, d] = np.array(cols["stat_warmup_score"], dtype=np.float32)
+    return emails, customer_tags, scores
+
+def window_stats(scores, window=DEFAULT_WINDOW):
+    """
+    Trailing-window statistics for the last column of a (rows, days) matrix.
+    Returns dict of arrays: today, baseline (mean of the previous `window` days),
+    std, z, slope (over the last `window` days incl. today) and points.
+    """
+    today = scores[:, -1]
+    base = scores[:, -window - 1:-1]
+    base_mask = ~np.isnan(base)
+    base_vals = np.where(base_mask, base, 0.0)
+    base_n = base_mask.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = base_vals.sum(axis=1) / base_n
+        var = (base_vals * base_vals).sum(axis=1) / base_n - mean * mean
+    std = np.maximum(np.sqrt(np.maximum(var, 0.0)), MIN_STD)
+    z = (today - mean) / std
+
+    # Least-squares slope with missing days masked out
+    recent = scores[:, -window:]
+    mask = ~np.isnan(recent)
+    y = np.where(mask, recent, 0.0)
+    t = np.arange(recent.shape[1], dtype=np.float32)
+    mt = mask * t
+    n = mask.sum(axis=1)
+    sum_t = mt.sum(axis=1)
+    sum_y = y.sum(axis=1)
+    sum_tt = (mt * t).sum(axis=1)
+    sum_ty = (y * t).sum(axis=1)
+    denom = n * sum_tt - sum_t * sum_t
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(denom > 0, (n * sum_ty - sum_t * sum_y) / denom, np.nan)
+
+    return {"today": today, "baseline": mean, "std": std, "z": z, "slope": slope, "points": base_n}
+
+def _flag(stats, warmup_min, z_threshold, slope_threshold):
+    """Boolean mask + reason codes: above the Sick line today, but dropping."""
+    healthy_today = stats["today"] >= warmup_min
+    enough = stats["points"] >= MIN_POINTS
+    z_drop = stats["z"] <= -z_threshold
+    slope_drop = stats["slope"] <= slope_threshold
+    return healthy_today & enough & (z_drop | slope_drop), z_drop, slope_drop
+
+def _entries(keys, stats, flagged, z_drop, slope_drop, key_name):
+    order = np.flatnonzero(flagged)
+    order = order[np.argsort(stats["z"][order], kind="stable")] # Sharpest drops first
+    entries = []
+    for i in order:
+        reasons = []
+        if z_drop[i]: reasons.append("sudden drop")
+        if slope_drop[i]: reasons.append("downtrend")
+        entries.append({
+            key_name: keys[i],
+            "score": round(float(stats["today"][i]), 1),
+            "baseline": round(float(stats["baseline"][i]), 1),
+            "slope": round(float(stats["slope"][i]), 2),
+            "z": round(float(stats["z"][i]), 2),
+            "reason": ", ".join(reasons),
+        })
+    return entries
+
+def domain_matrix(emails, scores):
+    """Daily mean score per sending domain: (n_domains, n_days) matrix via one bincount."""
+    domains = [e.split("@")[-1].lower() if e else "" for e in emails]
+    names, codes = np.unique(np.array(domains, dtype=object), return_inverse=True)
+    n_dom, n_days = len(names), scores.shape[1]
+    valid = ~np.isnan(scores)
+    flat = (codes[:, None] * n_days + np.arange(n_days)).ravel()
+    sums = np.bincount(flat, weights=np.where(valid, scores, 0.0).ravel(), minlength=n_dom * n_days)
+    counts = np.bincount(flat, weights=valid.ravel(), minlength=n_dom * n_days)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums / counts).reshape(n_dom, n_days).astype(np.float32)
+    return list(names), means
+
+def scan_anomalies(emails, scores, warmup_min=WARMUP_INBOX_MIN, window=DEFAULT_WINDOW,
+                   z_threshold=DEFAULT_Z, slope_threshold=DEFAULT_SLOPE):
+    """
+    Returns {"accounts": [...], "domains": [...]} watch entries, sharpest drops first.
+    warmup_min may be a scalar or a per-account array (PolicyTable thresholds).
+    """
+    if scores.shape[1] < 2:
+        return {"accounts": [], "domains": []}
+
+    acc_stats = window_stats(scores, window)
+    flagged, z_drop, slope_drop = _flag(acc_stats, warmup_min, z_threshold, slope_threshold)
+    accounts = _entries(emails, acc_stats, flagged, z_drop, slope_drop, "email")
+
+    dom_names, dom_scores = domain_matrix(emails, scores)
+    dom_stats = window_stats(dom_scores, window)
+    dom_min = np.min(warmup_min) if np.ndim(warmup_min) else warmup_min
+    d_flagged, d_z, d_slope = _flag(dom_stats, dom_min, z_threshold, slope_threshold)
+    domains = _entries(dom_names, dom_stats, d_flagged, d_z, d_slope, "domain")
+
+    return {"accounts": accounts, "domains": domains}
+
+def build_watch_list(snapshots, policy=None, window=DEFAULT_WINDOW, limit=WATCH_LIST_LIMIT):
+    """run_summary["watch"] payload from snapshots (oldest-first)."""
+    emails, customer_tags, scores = build_score_matrix(snapshots)
+    warmup_min = WARMUP_INBOX_MIN
+    if policy is not None:
+        by_tag = {}
+        warmup_min = np.array([by_tag.setdefault(t, policy.for_tag(t).warmup_threshold) for t in customer_tags], dtype=np.float32)
+    found = scan_anomalies(emails, scores, warmup_min=warmup_min, window=window)
+    return {
+        "days_scanned": scores.shape[1],
+        "total_accounts": len(found["accounts"]),
+        "total_domains": len(found["domains"]),
+        "accounts": found["accounts"][:limit],
+        "domains": found["domains"][:limit],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshots", required=True, help="Directory written by run_adhoc_workflow.py --snapshot_dir")
+    parser.add_argument("--days", type=int, default=30, help="Most recent N days to load (Default 30)")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    parser.add_argument("--warmup_threshold", type=float, default=WARMUP_INBOX_MIN)
+    args = parser.parse_args()
+
+    snapshots = load_snapshots(args.snapshots, limit_days=args.days)
+    if not snapshots:
+        print(json.dumps({"type": "error", "message": f"No snapshots found in {args.snapshots}"}))
+        sys.exit(1)
+    emails, _, scores = build_score_matrix(snapshots)
+    result = scan_anomalies(emails, scores, warmup_min=args.warmup_threshold, window=args.window)
+    print(json.dumps({"type": "result", "data": result}))
@@ -0,0 +1,254 @@
+"""
+Vectorized (numpy) version of DecisionEngine.evaluate_account and the rotation planner.
+
+The row path (evaluate_account) stays the source of truth for the live workflow;
+this path exists for bulk work such as backtests and what-if sweeps, where the
+same rules have to run over tens of thousands of accounts many times.
+Both paths must agree: materialize_actions() turns batch output back into the
+exact action dicts evaluate_account would have returned.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from execution.decision_engine import (
+    MIN_AGE_DAYS, BENCH_REST_DAYS,
+    TAG_STATUS_SENDING, TAG_STATUS_WARMING, TAG_STATUS_BENCHED, TAG_STATUS_SICK,
+)
+
+# Status codes (index into STATUS_NAMES)
+NO_ACTION = -1
+STATUS_NONE = 0
+STATUS_SENDING = 1
+STATUS_WARMING = 2
+STATUS_BENCHED = 3
+STATUS_SICK = 4
+
+STATUS_NAMES = [None, TAG_STATUS_SENDING, TAG_STATUS_WARMING, TAG_STATUS_BENCHED, TAG_STATUS_SICK]
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES) if name}
+
+BIT_SENDING = 1 << STATUS_SENDING
+BIT_WARMING = 1 << STATUS_WARMING
+BIT_BENCHED = 1 << STATUS_BENCHED
+BIT_SICK = 1 << STATUS_SICK
+
+# Reason codes: (reason template, campaigns). Order matches evaluate_account.
+REASONS = [
+    ("Rule 1: New Account (<14 days)", "REMOVE"),
+    ("Rule 1: New Account (<14 days) (Cleanup)", "REMOVE"),
+    ("Rule 3: Low Health Score ({score} < {threshold})", "REMOVE"),
+    ("Rule 3: Low Health Score ({score} < {threshold}) (Cleanup)", "REMOVE"),
+    ("Rule 4: Recovered (Score > 95)", "REMOVE"),
+    ("Conflicting Status Tags (Cleanup)", "REMOVE"),    # Sick
+    ("Rule 5: Rotation Target (Force Bench)", "REMOVE"),
+    ("Rule 6: Rotation Target (Force Sending)", "ADD"),
+    ("Conflicting Status Tags (Cleanup)", "ADD"),       # Sending
+    ("Rule 6: Rested & Healthy", "ADD"),
+    ("Conflicting Status Tags (Cleanup)", "REMOVE"),    # Benched
+    ("Rule 0: Unlabeled -> Sending", "ADD"),
+    ("Conflicting Status Tags (Cleanup)", None),        # Catch-all, keeps current status
+]
+
+def _parse_created(created_at_str):
+    return datetime.fromisoformat(created_at_str.replace("Z", "+00:00")).timestamp()
+
+class FleetArrays:
+    """
+    Column arrays for a list of hydrated accounts (tags_resolved + customer_tag).
+    Build once per snapshot, evaluate many times.
+    """
+    def __init__(self, emails, created_ts, score, has_score, status_mask, n_status, bucket_codes, bucket_names, days_benched=None):
+        self.emails = emails
+        self.created_ts = created_ts
+        self.score = score
+        self.has_score = has_score
+        self.status_mask = status_mask
+        self.n_status = n_status
+        self.bucket_codes = bucket_codes
+        self.bucket_names = bucket_names
+        # Days since the account was benched; -1 when unknown (live data has no history)
+        self.days_benched = days_benched if days_benched is not None else np.full(len(emails), -1, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.emails)
+
+    @classmethod
+    def from_accounts(cls, accounts, bucket_key="customer_tag"):
+        n = len(accounts)
+        emails = []
+        created_ts = np.empty(n, dtype=np.float64)
+        score = np.zeros(n, dtype=np.int32)
+        has_score = np.zeros(n, dtype=bool)
+        status_mask = np.zeros(n, dtype=np.uint8)
+        n_status = np.zeros(n, dtype=np.int8)
+        bucket_index = {}
+        bucket_codes = np.zeros(n, dtype=np.int32)
+        days_benched = np.full(n, -1, dtype=np.int32)
+
+        for i, acc in enumerate(accounts):
+            emails.append(acc.get("email"))
+            created_ts[i] = _parse_created(acc.get("timestamp_created"))
+            if "stat_warmup_score" in acc:
+                has_score[i] = True
+                score[i] = int(acc["stat_warmup_score"] or 0)
+            mask = 0
+            count = 0
+            for t in acc.get("tags_resolved", []):
+                code = STATUS_CODES.get(t)
+                if code:
+                    mask |= 1 << code
+                    count += 1
+            status_mask[i] = mask
+            n_status[i] = count
+            b_key = acc.get(bucket_key, "-") if bucket_key else "Global"
+            bucket_codes[i] = bucket_index.setdefault(b_key, len(bucket_index))
+            if acc.get("days_benched") is not None:
+                days_benched[i] = acc["days_benched"]
+
+        return cls(emails, created_ts, score, has_score, status_mask, n_status, bucket_codes, list(bucket_index), days_benched)
+
+    def take(self, idx):
+        """Returns a FleetArrays restricted to the given index array."""
+        return FleetArrays(
+            list(map(self.emails.__getitem__, idx.tolist())), self.created_ts[idx], self.score[idx], self.has_score[idx],
+            self.status_mask[idx], self.n_status[idx], self.bucket_codes[idx], self.bucket_names,
+            self.days_benched[idx],
+        )
+
+def policy_arrays(fleet, policy):
+    """
+    Per-account (warmup_min, rest_days) from a PolicyTable.
+    Falls back to plain scalars when every bucket shares the default policy.
+    """
+    if not policy.by_tag:
+        return policy.default.warmup_threshold, policy.default.bench_rest_days
+    warmup, _, rest = policy.bucket_columns(fleet.bucket_names)
+    codes = fleet.bucket_codes
+    return np.asarray(warmup, dtype=np.float64)[codes], np.asarray(rest, dtype=np.float64)[codes]
+
+def resolve_status(status_mask, score, warmup_min):
+    """Effective status code per account (same conflict rules as evaluate_account)."""
+    has_sending = (status_mask & BIT_SENDING) != 0
+    has_warming = (status_mask & BIT_WARMING) != 0
+    has_benched = (status_mask & BIT_BENCHED) != 0
+    has_sick = (status_mask & BIT_SICK) != 0
+    sick_vs_benched = has_sick & has_benched
+    return np.select(
+        [sick_vs_benched & (score < warmup_min), sick_vs_benched, has_sick, has_warming, has_benched, has_sending],
+        [STATUS_SICK, STATUS_BENCHED, STATUS_SICK, STATUS_WARMING, STATUS_BENCHED, STATUS_SENDING],
+        STATUS_NONE,
+    ).astype(np.int8)
+
+def evaluate_batch(fleet, now_ts, warmup_min, force=None, rest_days=BENCH_REST_DAYS):
+    """
+    Runs the evaluate_account rules over every account at once.
+
+    warmup_min, rest_days and force broadcast against the account axis, so
+    passing warmup_min with shape (k, 1) evaluates k thresholds in one call,
+    and per-account arrays (policy_arrays) apply per-bucket policies.
+    force holds status codes (STATUS_NONE = no forced rotation).
+    Returns (new_status, reason) int8 arrays; NO_ACTION where nothing changes.
+    """
+    warmup_min = np.asarray(warmup_min)
+    score = fleet.score
+    age_days = np.floor((now_ts - fleet.created_ts) / 86400.0)
+    conflicts = fleet.n_status > 1
+    status = resolve_status(fleet.status_mask, score, warmup_min)
+    if force is None:
+        force = STATUS_NONE
+
+    is_new = age_days < MIN_AGE_DAYS
+    low = score < warmup_min
+    sick = status == STATUS_SICK
+    benched = status == STATUS_BENCHED
+    warming = status == STATUS_WARMING
+    rested = (fleet.days_benched < 0) | (fleet.days_benched >= rest_days)
+
+    # (condition, new status, reason code). First match wins, like the early returns in evaluate_account.
+    rules = [
+        (is_new & warming & conflicts, STATUS_WARMING, 1),
+        (is_new & ~warming, STATUS_WARMING, 0),
+        (is_new, NO_ACTION, NO_ACTION),
+        (low & sick & conflicts, STATUS_SICK, 3),
+        (low & ~sick, STATUS_SICK, 2),
+        (low, NO_ACTION, NO_ACTION),
+        (sick & (score > 95), STATUS_BENCHED, 4),
+        (sick & conflicts, STATUS_SICK, 5),
+        (sick, NO_ACTION, NO_ACTION),
+        ((force == STATUS_BENCHED) & (~benched | conflicts), STATUS_BENCHED, 6),
+        ((force == STATUS_SENDING) & ((status != STATUS_SENDING) | conflicts), STATUS_SENDING, 7),
+        ((status == STATUS_SENDING) & conflicts, STATUS_SENDING, 8),
+        (benched & (score >= 90) & rested, STATUS_SENDING, 9),
+        (benched & conflicts, STATUS_BENCHED, 10),
+        (benched, NO_ACTION, NO_ACTION),
+        (status == STATUS_NONE, STATUS_SENDING, 11),
+        (conflicts, status, 12),
+    ]
+    conds = [r[0] for r in rules]
+    new_status = np.select(conds, [r[1] for r in rules], NO_ACTION).astype(np.int8)
+    reason = np.select(conds, [r[2] for r in rules], NO_ACTION).astype(np.int8)
+    return new_status, reason
+
+def plan_rotation_batch(fleet, bench_percent, bucket_has_campaigns=None, ignore_customer_tags=True):
+    """
+    Vectorized plan_rotation (execution/rotation.py).
+    bench_percent may be a scalar or an array indexed by bucket code.
+    Returns an int8 array of forced status codes (STATUS_NONE = not forced).
+    """
+    n = len(fleet)
+    force = np.zeros(n, dtype=np.int8)
+    is_active = (fleet.status_mask & BIT_SENDING) != 0
+    is_benched = ~is_active & ((fleet.status_mask & BIT_BENCHED) != 0)
+    buckets = np.zeros(n, dtype=np.int32) if ignore_customer_tags else fleet.bucket_codes
+    bench_percent = np.broadcast_to(np.asarray(bench_percent), (len(fleet.bucket_names) or 1,))
+
+    # Same sort keys as plan_rotation: missing score sorts as 100 for actives, 0 for benched
+    active_key = np.where(fleet.has_score, fleet.score, 100)
+    benched_key = np.where(fleet.has_score, fleet.score, 0)
+
+    for b in np.unique(buckets):
+        pct = bench_percent[0] if ignore_customer_tags else bench_percent[b]
+        if pct <= 0:
+            continue
+        in_bucket = buckets == b
+        active_idx = np.flatnonzero(in_bucket & is_active)
+        benched_idx = np.flatnonzero(in_bucket & is_benched)
+        total_pool = len(active_idx) + len(benched_idx)
+        if total_pool == 0:
+            continue
+
+        has_campaigns = True
+        if not ignore_customer_tags and bucket_has_campaigns is not None:
+            has_campaigns = bool(bucket_has_campaigns[b])
+        if not has_campaigns and fleet.bucket_names[b] != "General":
+            target = total_pool
+        else:
+            target = int(total_pool * pct / 100)
+
+        current = len(benched_idx)
+        if current < target:
+            order = np.argsort(active_key[active_idx], kind="stable")
+            force[active_idx[order[:target - current]]] = STATUS_BENCHED
+        elif current > target:
+            order = np.argsort(-benched_key[benched_idx], kind="stable")
+            force[benched_idx[order[:current - target]]] = STATUS_SENDING
+    return force
+
+def materialize_actions(fleet, new_status, reason, warmup_min):
+    """
+    Converts batch output into the action dicts evaluate_account returns.
+    warmup_min is a scalar or a list indexed by bucket code (PolicyTable.bucket_columns).
+    """
+    per_bucket = isinstance(warmup_min, (list, tuple))
+    actions = []
+    for i in np.flatnonzero(new_status != NO_ACTION):
+        template, campaigns = REASONS[reason[i]]
+        threshold = warmup_min[fleet.bucket_codes[i]] if per_bucket else warmup_min
+        actions.append({
+            "email": fleet.emails[i],
+            "reason": template.format(score=int(fleet.score[i]), threshold=threshold),
+            "new_tag": STATUS_NAMES[new_status[i]],
+            "warmup": True,
+            "campaigns": campaigns,
+        })
+    return actions
@@ -0,0 +1,184 @@
+"""
+Microbenchmarks for the engine hot loops on synthetic fleets.
+
+Measured separately, per fleet size:
+  - resolve_tags          tag IDs -> tags_resolved + customer_tag
+  - customer_buckets      get_customer_tag bucketing (build_rotation_buckets)
+  - plan_rotation         row rotation planner
+  - plan_rotation_batch   vectorized rotation planner
+  - evaluate_account      row DecisionEngine, one call per account
+  - evaluate_batch        vectorized DecisionEngine (incl. FleetArrays build)
+
+Reports accounts/sec (best of --repeat runs), peak traced bytes per account and
+net retained allocation blocks per account (tracemalloc, measured on a separate run).
+Engine INFO logging is silenced so the numbers reflect the rules, not log I/O.
+
+Usage:
+    python3 benchmark_engine.py --sizes 1000,10000,100000 --repeat 3 [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from execution.decision_engine import DecisionEngine
+from execution.rotation import build_rotation_buckets, plan_rotation
+from execution.workspace import resolve_tags
+from execution.batch_engine import FleetArrays, plan_rotation_batch, materialize_actions
+
+STATUS_TAG_NAMES = ["Sending", "Warming", "Benched", "Sick"]
+FIXED_NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+def make_synthetic_fleet(n_accounts, n_customers=50, seed=42):
+    """
+    Builds accounts/campaigns shaped like list_accounts() output after hydration
+    (tag IDs in 'tags'), plus the tag ID -> name map.
+
+    Mix: ~70% one status tag, ~12% conflicting status tags, ~8% unlabeled,
+    ~8% younger than 14 days, scores skewed high with a sick tail, a few missing scores,
+    customers sized on a long tail, a few hidden/unresolvable tags.
+    """
+    rng = random.Random(seed)
+    tag_map = {f"tag-status-{name.lower()}": name for name in STATUS_TAG_NAMES}
+    tag_map.update({"tag-active": "Active", "tag-dead": "Dead"})
+    customers = [f"Customer {i:03d}" for i in range(n_customers)]
+    for c in customers:
+        tag_map[f"tag-{c}"] = c
+    status_ids = [f"tag-status-{name.lower()}" for name in STATUS_TAG_NAMES]
+    customer_weights = [1.0 / (i + 1) for i in range(n_customers)]
+
+    accounts = []
+    for i in range(n_accounts):
+        roll = rng.random()
+        if roll < 0.70:
+            tags = [rng.choices(status_ids, weights=[60, 15, 15, 10])[0]]
+        elif roll < 0.82:
+            tags = rng.sample(status_ids, rng.choice([2, 2, 3]))
+        elif roll < 0.92:
+            tags = [rng.choice(["tag-active", "tag-dead"])]
+        else:
+            tags = []
+        tags.append(f"tag-{rng.choices(customers, weights=customer_weights)[0]}")
+        if rng.random() < 0.02:
+            tags.append(f"hidden-{rng.randint(0, 9)}") # Not in tag_map -> resolves to its ID
+
+        age_days = rng.randint(0, 13) if rng.random() < 0.08 else rng.randint(14, 365)
+        acc = {
+            "id": f"acc-{i}",
+            "email": f"inbox{i}@domain{i % 997}.com",
+            "timestamp_created": (FIXED_NOW - timedelta(days=age_days, minutes=rng.randint(0, 1439))).isoformat().replace("+00:00", "Z"),
+            "status": 1,
+            "limit": 30,
+            "tags": tags,
+        }
+        if rng.random() > 0.01:
+            acc["stat_warmup_score"] = min(100, max(0, int(100 - rng.expovariate(1 / 8.0))))
+        accounts.append(acc)
+
+    # One or two campaigns for most customers; the long tail has none (forced 100% bench)
+    campaigns = []
+    for ci, c in enumerate(customers):
+        for j in range(2 if ci < n_customers // 2 else (1 if ci < n_customers * 0.8 else 0)):
+            campaigns.append({"id": f"camp-{ci}-{j}", "name": f"{c} #{j}", "status": 1, "tags": [f"tag-{c}"]})
+
+    return accounts, campaigns, tag_map
+
+def _fixed_clock(tz=None):
+    return FIXED_NOW.astimezone(tz) if tz else FIXED_NOW.replace(tzinfo=None)
+
+def _measure(fn, n, repeat):
+    """Returns (accounts/sec, peak bytes/account, retained blocks/account)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    keep = fn()
+    blocks_after = sys.getallocatedblocks()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+
+    return {
+        "accounts_per_sec": round(n / best) if best > 0 else None,
+        "best_sec": round(best, 4),
+        "peak_bytes_per_account": round(peak / n, 1),
+        "retained_blocks_per_account": round((blocks_after - blocks_before) / n, 2),
+    }
+
+def run_benchmarks(n_accounts, repeat=3, bench_percent=20, warmup_threshold=70):
+    accounts, campaigns, tag_map = make_synthetic_fleet(n_accounts)
+    config = {"warmup_threshold": warmup_threshold, "bench_percent": bench_percent}
+    engine = DecisionEngine(None, config=config, clock=_fixed_clock)
+
+    # Inputs for the later stages are prepared once, outside the timed region
+    resolve_tags(accounts, tag_map)
+    resolve_tags(campaigns, tag_map)
+    buckets = build_rotation_buckets(accounts, campaigns, tag_map, ignore_customer_tags=False)
+    force_map = plan_rotation(buckets, bench_percent, ignore_customer_tags=False)
+    fleet = FleetArrays.from_accounts(accounts)
+    campaign_tags = {c["customer_tag"] for c in campaigns}
+    has_campaigns = [name in campaign_tags for name in fleet.bucket_names]
+
+    def evaluate_rows():
+        return [engine.evaluate_account(acc, None, force_status=force_map.get(acc["email"])) for acc in accounts]
+
+    def evaluate_batch():
+        f = FleetArrays.from_accounts(accounts)
+        force = plan_rotation_batch(f, bench_percent, has_campaigns, ignore_customer_tags=False)
+        return engine.evaluate_batch(f, force)
+
+    stages = {
+        "resolve_tags": lambda: resolve_tags(accounts, tag_map),
+        "customer_buckets": lambda: build_rotation_buckets(accounts, campaigns, tag_map, ignore_customer_tags=False),
+        "plan_rotation": lambda: plan_rotation(buckets, bench_percent, ignore_customer_tags=False),
+        "plan_rotation_batch": lambda: plan_rotation_batch(fleet, bench_percent, has_campaigns, ignore_customer_tags=False),
+        "evaluate_account": evaluate_rows,
+        "evaluate_batch": evaluate_batch,
+    }
+    results = {name: _measure(fn, n_accounts, repeat) for name, fn in stages.items()}
+
+    # Sanity: both engine paths must agree before their speeds are worth comparing
+    row_actions = [a for a in evaluate_rows() if a]
+    new_status, reason = evaluate_batch()
+    batch_actions = materialize_actions(fleet, new_status, reason, warmup_threshold)
+    results["batch_matches_row"] = row_actions == batch_actions
+    return results
+
+def _print_table(all_results):
+    print(f"{'stage':<22}{'accounts':>10}{'acc/sec':>14}{'best s':>10}{'peak B/acc':>12}{'blocks/acc':>12}")
+    for n, results in all_results.items():
+        for name, r in results.items():
+            if not isinstance(r, dict):
+                continue
+            print(f"{name:<22}{n:>10}{r['accounts_per_sec']:>14,}{r['best_sec']:>10}{r['peak_bytes_per_account']:>12}{r['retained_blocks_per_account']:>12}")
+        print(f"{'batch == row':<22}{n:>10}{str(results['batch_matches_row']):>14}")
+        print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated fleet sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Engine logs one INFO line per account; keep the benchmark about the rules
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    all_results = {n: run_benchmarks(n, repeat=args.repeat) for n in sizes}
+    if args.json:
+        print(json.dumps({str(n): r for n, r in all_results.items()}, indent=2))
+    else:
+        _print_table(all_results)
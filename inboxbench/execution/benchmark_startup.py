@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark for the execution entry points.
+
+For every entry point, in fresh interpreters (nothing cached but the .pyc files):
+  - import_ms     cumulative `-X importtime` cost of importing the module
+  - cold_ms       wall time of `python3 -c "import <module>"` (interpreter start-up + imports)
+  - heaviest      the largest direct imports, to see what a regression pulled in
+
+Reports the median of --repeat runs. With --check, exits 1 if an entry point's
+import_ms is over its budget (STARTUP_BUDGETS_MS): heavy dependencies (google
+clients, resend, numpy, requests) are meant to load only when the stage that
+needs them runs.
+
+Usage:
+    python3 benchmark_startup.py --repeat 5 [--json] [--check]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> import budget (ms) on a warm disk cache; None = report only.
+# The entry points the UI spawns per request get a budget; the others need their
+# heavy dependencies for any useful work anyway.
+STARTUP_BUDGETS_MS = {
+    "execution.run_adhoc_workflow": 80,
+    "orchestration.batch_runner": 60,
+    "execution.verify_workspace": None,     # needs requests
+    "execution.run_threshold_sweep": None,  # needs numpy + requests
+    "execution.create_client_sheet": None,  # needs the google clients
+    "orchestration.main_workflow": None,
+    "execution.worker_daemon": None,        # imports everything up front on purpose
+}
+
+def parse_importtime(stderr, module):
+    """(cumulative µs of module, [(name, cumulative µs)] of its direct imports) from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, name.strip(), int(cumulative)))
+    total, children = 0, []
+    for i, (depth, name, cumulative) in enumerate(rows):
+        if name == module:
+            total = cumulative
+            # Children are printed before their parent, one level deeper
+            j = i - 1
+            while j >= 0 and rows[j][0] > depth:
+                if rows[j][0] == depth + 1:
+                    children.append((rows[j][1], rows[j][2]))
+                j -= 1
+            break
+    return total, children
+
+def measure_import(module):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+    return parse_importtime(proc.stderr, module)
+
+def measure_cold(module):
+    # Import only: some entry points (main_workflow.py) start working without arguments
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def run_benchmarks(modules, repeat=5, top=3):
+    results = {}
+    for module in modules:
+        imports, colds, children = [], [], []
+        for _ in range(repeat):
+            total, children = measure_import(module)
+            imports.append(total / 1000)
+            colds.append(measure_cold(module) * 1000)
+        budget = STARTUP_BUDGETS_MS.get(module)
+        import_ms = round(statistics.median(imports), 1)
+        results[module] = {
+            "import_ms": import_ms,
+            "cold_ms": round(statistics.median(colds), 1),
+            "budget_ms": budget,
+            "within_budget": budget is None or import_ms <= budget,
+            "heaviest": [{"module": name, "ms": round(us / 1000, 1)}
+                         for name, us in sorted(children, key=lambda c: -c[1])[:top]],
+        }
+    return results
+
+def _print_table(results):
+    print(f"{'entry point':<34}{'import ms':>10}{'cold ms':>11}{'budget':>8}  heaviest imports")
+    for module, r in results.items():
+        budget = "-" if r["budget_ms"] is None else f"{r['budget_ms']}{'' if r['within_budget'] else '!'}"
+        heaviest = ", ".join(f"{h['module']} {h['ms']}" for h in r["heaviest"])
+        print(f"{module:<34}{r['import_ms']:>10}{r['cold_ms']:>11}{budget:>8}  {heaviest}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", default=",".join(STARTUP_BUDGETS_MS), help="Comma-separated entry point modules")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if an entry point is over its import budget")
+    args = parser.parse_args()
+
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    results = run_benchmarks(modules, repeat=args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+    if args.check and not all(r["within_budget"] for r in results.values()):
+        sys.exit(1)
@@ -1,5 +1,6 @@
 import logging
-from datetime import datetime, timedelta
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
 
 # Constants for Rules
 MIN_AGE_DAYS = 14
@@ -19,11 +20,73 @@ TAG_STATUS_SICK = "Sick"
 
 STATUS_TAGS = {TAG_STATUS_SENDING, TAG_STATUS_WARMING, TAG_STATUS_BENCHED, TAG_STATUS_SICK}
 
+Policy = namedtuple("Policy", ["warmup_threshold", "bench_percent", "bench_rest_days"])
+
+class PolicyTable:
+    """
+    Per-customer-tag engine policy, compiled once per run.
+
+    Config shape (everything optional):
+        {
+            "warmup_threshold": 70, "bench_percent": 10, "bench_rest_days": 7,
+            "customer_policies": {"Client X": {"warmup_threshold": 85, "bench_percent": 30}}
+        }
+    Top-level values are the default; each customer entry overrides only the keys it sets.
+    """
+    def __init__(self, default, by_tag=None):
+        self.default = default
+        self.by_tag = by_tag or {}
+
+    @classmethod
+    def compile(cls, config=None):
+        config = config or {}
+        default = Policy(
+            config.get("warmup_threshold", WARMUP_INBOX_MIN),
+            config.get("bench_percent", 0),
+            config.get("bench_rest_days", BENCH_REST_DAYS),
+        )
+        by_tag = {}
+        for tag, overrides in (config.get("customer_policies") or {}).items():
+            if not isinstance(overrides, dict):
+                logging.warning(f"Ignoring policy for '{tag}': expected an object")
+                continue
+            values = {}
+            for key, value in overrides.items():
+                if key not in Policy._fields:
+                    logging.warning(f"Ignoring unknown policy key '{key}' for '{tag}'")
+                elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                    logging.warning(f"Ignoring non-numeric {key}={value!r} for '{tag}'")
+                else:
+                    values[key] = value
+            by_tag[tag] = default._replace(**values)
+        return cls(default, by_tag)
+
+    def for_tag(self, customer_tag):
+        """O(1) lookup; unknown tags get the default policy."""
+        return self.by_tag.get(customer_tag, self.default)
+
+    def has_rotation(self):
+        """True if any bucket asks for a bench percentage."""
+        return self.default.bench_percent > 0 or any(p.bench_percent > 0 for p in self.by_tag.values())
+
+    def for_buckets(self, bucket_names):
+        """Policies as a list indexed by bucket code (see batch_engine.FleetArrays)."""
+        return [self.for_tag(name) for name in bucket_names]
+
+    def bucket_columns(self, bucket_names):
+        """(warmup_thresholds, bench_percents, bench_rest_days) lists indexed by bucket code."""
+        policies = self.for_buckets(bucket_names) or [self.default]
+        return tuple(list(col) for col in zip(*policies))
+
 class DecisionEngine:
-    def __init__(self, api, config=None):
+    def __init__(self, api, config=None, clock=None, policy=None):
         self.api = api
         self.config = config or {}
         self.actions_log = []
+        # clock(tz) -> datetime. Defaults to wall time; backtests inject a simulated clock.
+        self.clock = clock or datetime.now
+        # Thresholds are resolved once here, not per account
+        self.policy = policy or PolicyTable.compile(self.config)
 
     def evaluate_account(self, account, analytics=None, force_status=None):
         """
@@ -34,12 +97,13 @@ class DecisionEngine:
         created_at_str = account.get("timestamp_created")
         current_tags = account.get("tags_resolved", []) # List of tag names
         
-        # Parse Thresholds
-        warmup_min = self.config.get("warmup_threshold", WARMUP_INBOX_MIN)
+        # Thresholds for this account's customer bucket
+        policy = self.policy.for_tag(account.get("customer_tag"))
+        warmup_min = policy.warmup_threshold
         
         # Parse Dates
         created_at = datetime.fromisoformat(created_at_str.replace("Z", "+00:00"))
-        age_days = (datetime.now(created_at.tzinfo) - created_at).days
+        age_days = (self.clock(created_at.tzinfo) - created_at).days
 
         # Analytics (Fallback if missing)
         inbox_rate = analytics.get("inbox_rate", 100.0) if analytics else 100.0
@@ -132,8 +196,10 @@ class DecisionEngine:
 
         # --- RULE 6: Return to Sending Check (Default Logic if no force) ---
         if status_tag == TAG_STATUS_BENCHED:
-            # If healthy, bring back.
-            if warmup_score >= 90:
+            # If healthy (and rested, when we know how long it has been benched), bring back.
+            days_benched = account.get("days_benched")
+            rested = days_benched is None or days_benched >= policy.bench_rest_days
+            if warmup_score >= 90 and rested:
                  return self._create_action(email, "Rule 6: Rested & Healthy", TAG_STATUS_SENDING, warmup=True, campaigns="ADD")
             
             if has_conflicts:
@@ -150,6 +216,16 @@ class DecisionEngine:
 
         return None
 
+    def evaluate_batch(self, fleet, force=None):
+        """
+        Vectorized evaluate_account over a FleetArrays (see execution/batch_engine.py).
+        Returns (new_status, reason) code arrays; -1 means no action.
+        """
+        from execution.batch_engine import evaluate_batch, policy_arrays
+        warmup_min, rest_days = policy_arrays(fleet, self.policy)
+        now_ts = self.clock(timezone.utc).timestamp()
+        return evaluate_batch(fleet, now_ts, warmup_min, force=force, rest_days=rest_days)
+
     def _get_status_tag(self, tags):
         for t in tags:
             if t in STATUS_TAGS:
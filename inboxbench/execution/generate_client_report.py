@@ -9,11 +9,14 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from lib.instantly_api import InstantlyAPI
 from lib.utils import setup_logging
+from execution.workspace import fetch_workspace, fetch_campaign_analytics
 
 def generate_client_report(api_key, tag_name, client_name):
     """
     Generates a report for a specific client.
     Fetches data directly using tag filters.
+    For many clients in one workspace, use fetch_workspace_snapshot + build_client_report
+    instead (one fetch, partitioned locally).
     
     Args:
         api_key (str): Instantly API Key
@@ -28,17 +31,7 @@ def generate_client_report(api_key, tag_name, client_name):
     tag_id = api.get_tag_id_by_name(tag_name)
     if not tag_id:
         logging.warning(f"Tag '{tag_name}' not found in Instantly workspace. skipping.")
-        return {
-            "client_name": client_name,
-            "formatted_date": datetime.now().strftime('%Y-%m-%d'),
-            "error": "Tag not found",
-            "campaigns": [],
-            "accounts": [],
-            "total_sent": 0,
-            "total_leads": 0,
-            "total_replies": 0,
-            "total_opportunities": 0
-        }
+        return _tag_not_found(client_name)
     
     # 2. Fetch filtered data
     c_data = api.list_campaigns(tag_ids=tag_id)
@@ -50,6 +43,64 @@ def generate_client_report(api_key, tag_name, client_name):
     if not client_campaigns: client_campaigns = []
     if not client_accounts: client_accounts = []
 
+    return _client_report(client_name, tag_name, client_accounts, client_campaigns, api.get_campaign_summary)
+
+def fetch_workspace_snapshot(api):
+    """
+    Everything the per-client reports need, fetched once for the whole workspace:
+    hydrated accounts/campaigns (execution/workspace.py, hidden tags included),
+    analytics for every campaign, and a tag ID -> {"accounts", "campaigns"} index.
+    API calls scale with the workspace, not with the number of clients.
+    """
+    snapshot = fetch_workspace(api)
+    snapshot["analytics"] = fetch_campaign_analytics(api, snapshot["campaigns"])
+
+    index = {}
+    for kind in ("accounts", "campaigns"):
+        for res in snapshot[kind]:
+            for tid in res.get("tags", []):
+                index.setdefault(tid, {"accounts": [], "campaigns": []})[kind].append(res)
+    tag_ids_by_name = {}
+    for tid, name in snapshot["tag_map"].items():
+        tag_ids_by_name.setdefault(name, []).append(tid)
+    snapshot["tag_index"] = index
+    snapshot["tag_ids_by_name"] = tag_ids_by_name
+    logging.info(f"Workspace snapshot: {len(snapshot['accounts'])} accounts, {len(snapshot['campaigns'])} campaigns, {len(index)} tags")
+    return snapshot
+
+def build_client_report(snapshot, tag_name, client_name):
+    """generate_client_report for one client, partitioned out of a fetch_workspace_snapshot (no API calls)."""
+    logging.info(f"Generating report for client: {client_name} (Tag: {tag_name})")
+    tag_ids = snapshot["tag_ids_by_name"].get(tag_name)
+    if not tag_ids:
+        logging.warning(f"Tag '{tag_name}' not found in Instantly workspace. skipping.")
+        return _tag_not_found(client_name)
+
+    # A label can belong to more than one tag ID; each resource is counted once
+    accounts, campaigns = {}, {}
+    for tid in tag_ids:
+        part = snapshot["tag_index"].get(tid) or {"accounts": [], "campaigns": []}
+        for acc in part["accounts"]: accounts.setdefault(acc.get("email"), acc)
+        for camp in part["campaigns"]: campaigns.setdefault(camp.get("id"), camp)
+
+    return _client_report(client_name, tag_name, list(accounts.values()), list(campaigns.values()),
+                          lambda camp_id: snapshot["analytics"].get(camp_id))
+
+def _tag_not_found(client_name):
+    return {
+        "client_name": client_name,
+        "formatted_date": datetime.now().strftime('%Y-%m-%d'),
+        "error": "Tag not found",
+        "campaigns": [],
+        "accounts": [],
+        "total_sent": 0,
+        "total_leads": 0,
+        "total_replies": 0,
+        "total_opportunities": 0
+    }
+
+def _client_report(client_name, tag_name, client_accounts, client_campaigns, get_summary):
+    """Builds the report from one client's accounts/campaigns; get_summary(campaign_id) gives its analytics."""
     # 3. Process Accounts
     processed_accounts = []
     for acc in client_accounts:
@@ -78,7 +129,7 @@ def generate_client_report(api_key, tag_name, client_name):
         status = camp.get("status", "Unknown")
         
         # Get analytics summary
-        summary = api.get_campaign_summary(camp_id)
+        summary = get_summary(camp_id)
         
         sent = summary.get("sent", 0) if summary else 0
         replies = summary.get("replies", 0) if summary else 0
@@ -0,0 +1,221 @@
+"""
+Turns DecisionEngine actions into a minimal mutation plan, and applies it.
+
+build_plan diffs each account's desired tags against its hydrated current
+tags (tag IDs), so no-ops and remove/re-add pairs cancel out and only real
+changes are left. Tag changes are grouped by (tag, assign) so apply_plan can
+send them as bulk toggle-resource calls. The plan is plain JSON:
+
+    {
+      "created_at": "...",
+      "tags": [{"tag_id": "...", "tag": "Sick", "assign": true,
+                "accounts": [{"id": "...", "email": "..."}]}],
+      "warmup": [{"email": "...", "enable": false, "current": 1}],
+      "unresolved": [{"email": "...", "tag": "..."}],   # new tag with no ID
+      "skipped": [{"email": "...", "reason": "..."}],
+      "stats": {"actions": 0, "accounts_changed": 0, "noop": 0, "cancelled": 0},
+      "cost": {"tag_calls": 0, "warmup_calls": 0, "total": 0}   # warmup_calls: 0 unless built with apply_warmup
+    }
+
+"cancelled" counts the per-action tag calls the diff made unnecessary.
+Warmup deltas are planned but only applied with apply_warmup=True (the
+ad-hoc run has never written warmup state).
+
+See run_daily_cycle.py --dry-run / --plan-out / --apply / --apply-plan.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Status tags an account may only carry one of
+CONFLICT_TAGS = {"Active", "Dead", "Sending", "Sick", "Warming", "Benched"}
+
+TOGGLE_CHUNK = 100    # resource_ids per toggle-resource call
+TOGGLE_WORKERS = 4
+
+QUEUED = "queued" # apply_plan batch result: not sent before the deadline
+
+def _warmup_enabled(acc):
+    """Current warmup state from the list response, or None if unknown."""
+    status = acc.get("warmup_status")
+    return None if status is None else status == 1
+
+def build_plan(decisions, tag_map, resolve=None, conflict_tags=CONFLICT_TAGS, chunk_size=TOGGLE_CHUNK, apply_warmup=False):
+    """
+    decisions: [(account, action), ...]; accounts must be hydrated ('tags' IDs + 'tags_resolved').
+    Several actions for one account are applied in order before diffing.
+    resolve(name) -> tag ID is consulted for tag names not in tag_map.
+    apply_warmup: whether the plan's warmup deltas will be applied (for its cost).
+    """
+    name_to_id = {}
+    for tid, label in tag_map.items():
+        name_to_id.setdefault(label, tid)
+
+    def tag_id(name):
+        if name not in name_to_id and resolve:
+            name_to_id[name] = resolve(name)
+        return name_to_id.get(name)
+
+    # Per-account desired state, starting from the current one
+    state = {}
+    unresolved = []
+    skipped = []
+    n_actions = 0
+    naive_calls = 0 # What applying each action on its own would have cost
+    for acc, action in decisions:
+        if not action:
+            continue
+        n_actions += 1
+        email = action["email"]
+        if not acc.get("id"):
+            logging.warning(f"Account {email} has no ID inside logic. Skipping tag updates.")
+            skipped.append({"email": email, "reason": "no account id"})
+            continue
+
+        if email not in state:
+            current = dict(zip(acc.get("tags", []), acc.get("tags_resolved", [])))
+            state[email] = {"acc": acc, "current": current, "desired": dict(current), "warmup": None}
+        s = state[email]
+        new_tag = action["new_tag"]
+
+        # Drop every other status tag, then make sure the new one is there
+        keep = {tid: name for tid, name in s["desired"].items() if name not in conflict_tags or name == new_tag}
+        naive_calls += len(s["desired"]) - len(keep)
+        s["desired"] = keep
+        if new_tag not in keep.values():
+            t_id = tag_id(new_tag)
+            if t_id:
+                keep[t_id] = new_tag
+                naive_calls += 1
+            else:
+                logging.warning(f"Could not resolve ID for new tag '{new_tag}'")
+                unresolved.append({"email": email, "tag": new_tag})
+
+        if action.get("warmup") is not None:
+            s["warmup"] = action["warmup"]
+
+    # Diff desired vs current
+    groups = {}
+    warmup = []
+    noop = 0
+    n_tag_changes = 0
+    for email, s in state.items():
+        acc, current, desired = s["acc"], s["current"], s["desired"]
+        changes = [(tid, False, current[tid]) for tid in current if tid not in desired]
+        changes += [(tid, True, desired[tid]) for tid in desired if tid not in current]
+        for tid, assign, name in changes:
+            group = groups.setdefault((tid, assign), {"tag": name, "accounts": []})
+            group["accounts"].append({"id": acc["id"], "email": email})
+        n_tag_changes += len(changes)
+
+        w_now = _warmup_enabled(acc)
+        w_delta = s["warmup"] is not None and w_now is not None and s["warmup"] != w_now
+        if w_delta:
+            warmup.append({"email": email, "enable": s["warmup"], "current": acc.get("warmup_status")})
+
+        if not changes and not w_delta:
+            noop += 1
+
+    plan = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "tags": [{"tag_id": tid, "tag": g["tag"], "assign": assign, "accounts": g["accounts"]}
+                 for (tid, assign), g in groups.items()],
+        "warmup": warmup,
+        "unresolved": unresolved,
+        "skipped": skipped,
+        "stats": {
+            "actions": n_actions,
+            "accounts_changed": len(state) - noop,
+            "noop": noop,
+            "cancelled": naive_calls - n_tag_changes,
+        },
+    }
+    plan["cost"] = estimate_cost(plan, chunk_size, apply_warmup)
+    return plan
+
+def estimate_cost(plan, chunk_size=TOGGLE_CHUNK, apply_warmup=False):
+    """API calls apply_plan(..., apply_warmup) will make (warmup calls only count if applied)."""
+    tag_calls = sum(-(-len(op["accounts"]) // chunk_size) for op in plan["tags"])
+    warmup_calls = len(plan["warmup"]) if apply_warmup else 0
+    return {"tag_calls": tag_calls, "warmup_calls": warmup_calls, "total": tag_calls + warmup_calls}
+
+def save_plan(plan, path):
+    with open(path, "w") as f:
+        json.dump(plan, f, indent=2)
+
+def load_plan(path):
+    with open(path) as f:
+        return json.load(f)
+
+def batch_key(op, index):
+    """Stable ID of one toggle-resource batch of a plan (for the run journal)."""
+    return f"{op['tag_id']}:{int(op['assign'])}:{index}"
+
+def apply_plan(api, plan, apply_warmup=False, max_workers=TOGGLE_WORKERS, chunk_size=TOGGLE_CHUNK,
+               skip=None, on_batch=None, deadline=None):
+    """
+    Executes a plan. Returns per-account outcomes
+    {email: {"email", "removed": [...], "added": [...], "failed": [...], "queued": [...],
+             "skipped": reason|None, "warmup": bool|None}}.
+    skip: batch keys already applied (resumed run); they count as done without a call.
+    on_batch(key, ok) is called after each batch (journaling).
+    deadline: batches not yet sent when it expires are left "queued" (not journaled
+    as applied, so a resumed run sends them).
+    """
+    skip = skip or set()
+    outcomes = {}
+    def outcome(email):
+        if email not in outcomes:
+            outcomes[email] = {"email": email, "removed": [], "added": [], "failed": [], "queued": [],
+                               "skipped": None, "warmup": None}
+        return outcomes[email]
+
+    for item in plan["skipped"]:
+        outcome(item["email"])["skipped"] = item["reason"]
+    for item in plan["unresolved"]:
+        outcome(item["email"])["failed"].append(item["tag"])
+
+    batches = []
+    for op in plan["tags"]:
+        for i in range(0, len(op["accounts"]), chunk_size):
+            batches.append((op, op["accounts"][i:i + chunk_size], batch_key(op, i // chunk_size)))
+
+    def toggle(op, chunk, key):
+        if key in skip:
+            return True
+        if deadline is not None and deadline.expired():
+            return QUEUED
+        ok = api.toggle_account_tags([op["tag_id"]], [a["id"] for a in chunk], assign=op["assign"]) is not None
+        if on_batch: on_batch(key, ok)
+        return ok
+
+    pending = sum(1 for _, _, key in batches if key not in skip)
+    logging.info(f"Applying plan: {plan['stats']['actions']} actions -> {pending} toggle-resource calls ({len(batches) - pending} already applied)...")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [(pool.submit(toggle, op, chunk, key), op, chunk) for op, chunk, key in batches]
+        for future, op, chunk in futures:
+            try:
+                ok = future.result()
+            except Exception as e:
+                logging.warning(f"Toggle of tag {op['tag']} failed: {e}")
+                ok = False
+            for a in chunk:
+                if ok is QUEUED:
+                    outcome(a["email"])["queued"].append(op["tag"])
+                elif not ok:
+                    outcome(a["email"])["failed"].append(op["tag"])
+                else:
+                    outcome(a["email"])["added" if op["assign"] else "removed"].append(op["tag"])
+
+    if apply_warmup:
+        for item in plan["warmup"]:
+            if deadline is not None and deadline.expired():
+                outcome(item["email"])["queued"].append("warmup")
+                continue
+            res = api.set_warmup_status(item["email"], item["enable"])
+            if res is None:
+                outcome(item["email"])["failed"].append("warmup")
+            else:
+                outcome(item["email"])["warmup"] = item["enable"]
+    return outcomes
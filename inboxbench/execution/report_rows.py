@@ -0,0 +1,158 @@
+import logging
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+# Row builders shared by run_adhoc_workflow.py and its streaming mode (stream_report.py)
+
+TRANSITIONS_KEPT = 100  # transition lines kept when the rows don't all stay in memory / in the result
+
+# --stream_rows line columns (lib/progress.RowStream)
+ACCOUNT_ROW_COLUMNS = ["email", "customer_tag", "status", "daily_limit", "warmup_score", "tags", "change", "outcome"]
+ACTION_COLUMNS = ["email", "customer_tag", "new_tag", "reason"]
+
+# Status Mapping
+STATUS_MAP = {
+    1: "Active",
+    2: "Paused",
+    3: "Completed",
+    0: "Inactive"
+}
+
+def status_label(res):
+    raw_status = res.get("status_v2", res.get("status"))
+    return STATUS_MAP.get(raw_status, str(raw_status))
+
+def campaign_entry(camp, summary):
+    """Returns (campaign row for the report, {"sent", "replies", "leads"} for the totals)."""
+    success_stats = {"sent": 0, "opens": 0, "replies": 0, "leads": 0}
+    if summary:
+        # Robust extraction: check keys found in debug (`emails_sent_count`, etc.)
+        # User preference: "Sent" column should show "Sequence Started" (unique leads contacted)
+        success_stats["sent"] = summary.get("new_leads_contacted_count", summary.get("contacted_count", 0))
+
+        # User preference: "Replies" matching UI (20) which is manual (4) + auto (16)
+        manual_replies = summary.get("reply_count", summary.get("replies", 0))
+        auto_replies = summary.get("reply_count_automatic", 0)
+        success_stats["replies"] = manual_replies + auto_replies
+
+        success_stats["opens"] = summary.get("open_count", summary.get("opens", 0))
+        success_stats["leads"] = summary.get("leads_count", summary.get("opportunities", 0))
+
+        # Check for zero stats warning
+        if success_stats["sent"] == 0:
+             logging.info(f"Campaign {camp.get('name')} returned 0 contacted. Keys: {list(summary.keys())}")
+
+    entry = {
+        "name": camp.get("name"),
+        "status": status_label(camp),
+        "customer_tag": camp["customer_tag"],
+        "sent": success_stats["sent"],
+        "opens": success_stats["opens"],
+        "replies": success_stats["replies"],
+        "click_rate": 0,
+        "reply_rate": 0
+    }
+    return entry, {k: success_stats[k] for k in ("sent", "replies", "leads")}
+
+def account_entry(acc, action, outcome=None):
+    """
+    Returns (account row for the report, Action Log row or None).
+    outcome is the ActionExecutor result for this account's action.
+    """
+    # Default status/tags from current state
+    final_tags = list(acc.get("tags_resolved", [])) # Make a mutable copy
+    final_status = status_label(acc)
+    log_row = None
+
+    if action:
+        email = action['email']
+        reason = action['reason']
+        new_tag = action['new_tag']
+
+        logging.info(f"ACTION REQUIRED: {email} -> {new_tag} ({reason})")
+
+        # Update local state for report (visuals only)
+        if outcome:
+            final_tags = [t for t in final_tags if t not in outcome["removed"]]
+            final_tags.extend(t for t in outcome["added"] if t not in final_tags)
+            if outcome["failed"]:
+                reason = f"{reason} [tag update failed: {', '.join(outcome['failed'])}]"
+            elif outcome.get("queued"):
+                reason = f"{reason} [queued: {', '.join(outcome['queued'])}]"
+            elif outcome["skipped"]:
+                reason = f"{reason} [skipped: {outcome['skipped']}]"
+
+        log_row = [
+            datetime.now(ZoneInfo("US/Mountain")).strftime('%Y-%m-%d %H:%M:%S'),
+            acc.get("customer_tag", "Unknown Client"),
+            email,
+            final_status,
+            new_tag,
+            reason,
+            "-",
+            "-"
+        ]
+        change_display = f"-> {new_tag}"
+    else:
+        change_display = "-"
+
+    # User Feedback: Don't show Customer Tag in "Tags" column (since it has its own column).
+    # Also filter out internal status tags if present.
+    c_tag = acc.get("customer_tag")
+    display_tags = [
+        t for t in final_tags
+        if t != c_tag and not t.startswith("status-")
+    ]
+
+    entry = {
+        "email": acc.get("email"),
+        "status": final_status,
+        "daily_limit": acc.get("limit", acc.get("daily_limit", 0)), # Robust Daily Limit
+        "warmup_score": f"{acc.get('stat_warmup_score', 0)}/100",
+        "tags": ", ".join(display_tags),
+        "customer_tag": acc.get("customer_tag", "-"),
+        "change": change_display
+    }
+    return entry, log_row
+
+def primary_status(entry):
+    """Status bucket of a report account row for the global counts (None if it has none)."""
+    tags_list = entry.get("tags", "").split(", ")
+    # Priority Order
+    for status in ("Sick", "Warming", "Benched", "Sending"):
+        if status in tags_list:
+            return status
+    return None
+
+def status_counts(entries):
+    """Global status counts (Sending/Sick/Warming/Benched) of report account rows."""
+    counts = {"Sending": 0, "Sick": 0, "Warming": 0, "Benched": 0}
+    for entry in entries:
+        primary = primary_status(entry)
+        if primary in counts:
+            counts[primary] += 1
+    return counts
+
+def transition_key(new_tag):
+    return new_tag.replace("status-", "").capitalize()
+
+def transition_line(log_row):
+    # log format: [time, client, email, prev, new, reason, ...]
+    return f"{log_row[2]} -> {log_row[4]} ({log_row[5]})"
+
+def outcome_label(outcome):
+    """applied | failed | queued | skipped for an ActionExecutor outcome ("" for no action)."""
+    if not outcome: return ""
+    if outcome["failed"]: return "failed"
+    if outcome.get("queued"): return "queued"
+    if outcome["skipped"]: return "skipped"
+    return "applied"
+
+def account_stream_row(entry, outcome=None):
+    """An account_rows row (ACCOUNT_ROW_COLUMNS) from a report account entry."""
+    return [entry["email"], entry["customer_tag"], entry["status"], entry["daily_limit"],
+            entry["warmup_score"], entry["tags"], entry["change"], outcome_label(outcome)]
+
+def action_stream_row(acc, action):
+    """An action row (ACTION_COLUMNS) for an engine decision, before it's applied."""
+    return [action["email"], acc.get("customer_tag", "-"), action["new_tag"], action["reason"]]
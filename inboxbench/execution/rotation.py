@@ -0,0 +1,171 @@
+import heapq
+import logging
+from array import array
+
+# Tags that are never treated as a customer tag
+SYSTEM_TAGS = {"Sending", "Sick", "Warming", "Benched", "Active", "Dead", "Completed", "Paused", "Inactive"}
+
+def get_customer_tag(tags_list):
+    """Returns the first tag that is NOT a system status tag."""
+    for t in tags_list:
+        if t not in SYSTEM_TAGS and not t.startswith("status-"):
+            return t
+    return "-"
+
+def build_rotation_buckets(accounts, campaigns, tag_map, ignore_customer_tags=True):
+    """
+    Groups accounts and campaigns into rotation buckets.
+    Accounts must already carry 'customer_tag' (see run_adhoc_workflow hydration).
+    """
+    if ignore_customer_tags:
+        return {"Global": {"accounts": accounts, "campaigns": campaigns}}
+
+    # Group Accounts using pre-calculated customer_tag
+    buckets = {}
+    for acc in accounts:
+        b_key = acc.get("customer_tag", "General")
+        if b_key not in buckets: buckets[b_key] = {"accounts": [], "campaigns": []}
+        buckets[b_key]["accounts"].append(acc)
+
+    # Map Campaigns to Buckets
+    for camp in campaigns:
+        # Quick resolve for rotation logic if not processed above
+        if "tags_resolved" not in camp:
+             c_t_ids = camp.get("tags", [])
+             camp["tags_resolved"] = [tag_map.get(tid, str(tid)) for tid in c_t_ids]
+
+        b_key = get_customer_tag(camp["tags_resolved"])
+        if b_key not in buckets: buckets[b_key] = {"accounts": [], "campaigns": []}
+        buckets[b_key]["campaigns"].append(camp)
+
+    return buckets
+
+def plan_rotation(buckets, bench_percent, ignore_customer_tags=True, policy=None):
+    """
+    Decides which accounts to force into Benched/Sending so each bucket
+    reaches its target bench percentage.
+    With a PolicyTable, each customer bucket uses its own bench_percent.
+    Returns {email: "Benched" | "Sending"}.
+    """
+    force_map = {}
+    if policy is None and bench_percent <= 0:
+        return force_map
+
+    logging.info(f"Running Rotation Logic on {len(buckets)} buckets (Ignore Tags: {ignore_customer_tags})")
+
+    for b_name, b_data in buckets.items():
+        if policy is not None and not ignore_customer_tags:
+            bucket_percent = policy.for_tag(b_name).bench_percent
+        else:
+            bucket_percent = bench_percent
+        if bucket_percent <= 0:
+            continue
+
+        b_accs = b_data["accounts"]
+        b_camps = b_data["campaigns"]
+
+        active_candidates = []
+        benched_candidates = []
+
+        for acc in b_accs:
+            tags = acc.get("tags_resolved", [])
+            if "Sending" in tags:
+                active_candidates.append(acc)
+            elif "Benched" in tags:
+                benched_candidates.append(acc)
+
+        total_pool = len(active_candidates) + len(benched_candidates)
+        if total_pool == 0:
+            continue
+
+        has_campaigns = len(b_camps) > 0
+        if ignore_customer_tags: has_campaigns = True
+
+        if not has_campaigns and b_name != "General":
+            target_bench_count = total_pool
+            logging.info(f"Bucket '{b_name}': No campaigns found. Forcing 100% Bench.")
+        else:
+            target_bench_count = int(total_pool * bucket_percent / 100)
+
+        current_bench_count = len(benched_candidates)
+
+        logging.info(f"Rotation ({b_name}): Total={total_pool}, Target Bench={target_bench_count}, Current={current_bench_count}")
+
+        if current_bench_count < target_bench_count:
+            # Deficit: Bench some Actives
+            needed = target_bench_count - current_bench_count
+            active_candidates.sort(key=lambda x: int(x.get('stat_warmup_score', 100) or 0))
+            to_bench = active_candidates[:needed]
+            for a in to_bench: force_map[a['email']] = "Benched"
+            logging.info(f"Rotation ({b_name}): Forcing BENCH for {len(to_bench)} accounts.")
+
+        elif current_bench_count > target_bench_count:
+            # Surplus: Activate some Benched
+            release = current_bench_count - target_bench_count
+            benched_candidates.sort(key=lambda x: int(x.get('stat_warmup_score', 0) or 0), reverse=True)
+            to_activate = benched_candidates[:release]
+            for a in to_activate: force_map[a['email']] = "Sending"
+            logging.info(f"Rotation ({b_name}): Forcing SENDING for {len(to_activate)} accounts.")
+
+    return force_map
+
+class RotationTally:
+    """
+    plan_rotation for accounts that stream past once (execution/stream_report.py).
+
+    add() keeps only (sort key, stream position) of each Sending/Benched
+    account, in int arrays per bucket, instead of the accounts themselves.
+    plan() then picks the same accounts plan_rotation would (stable ordering,
+    same missing-score defaults) and returns {position: "Benched" | "Sending"}.
+    """
+    def __init__(self, ignore_customer_tags=True):
+        self.ignore_customer_tags = ignore_customer_tags
+        self.buckets = {}
+
+    def add(self, position, acc):
+        tags = acc.get("tags_resolved", [])
+        if "Sending" in tags:
+            kind, key = 0, int(acc.get('stat_warmup_score', 100) or 0)
+        elif "Benched" in tags:
+            kind, key = 1, int(acc.get('stat_warmup_score', 0) or 0)
+        else:
+            return
+        b_key = "Global" if self.ignore_customer_tags else acc.get("customer_tag", "General")
+        if b_key not in self.buckets:
+            self.buckets[b_key] = ((array("i"), array("q")), (array("i"), array("q")))
+        keys, positions = self.buckets[b_key][kind]
+        keys.append(key)
+        positions.append(position)
+
+    def plan(self, bench_percent, campaign_tags=(), policy=None):
+        """campaign_tags: customer tags that have at least one campaign."""
+        force = {}
+        campaign_tags = set(campaign_tags)
+        for b_name, ((a_keys, a_pos), (b_keys, b_pos)) in self.buckets.items():
+            if policy is not None and not self.ignore_customer_tags:
+                bucket_percent = policy.for_tag(b_name).bench_percent
+            else:
+                bucket_percent = bench_percent
+            if bucket_percent <= 0:
+                continue
+
+            total_pool = len(a_keys) + len(b_keys)
+            has_campaigns = self.ignore_customer_tags or b_name in campaign_tags
+            if not has_campaigns and b_name != "General":
+                target_bench_count = total_pool
+            else:
+                target_bench_count = int(total_pool * bucket_percent / 100)
+            current_bench_count = len(b_keys)
+
+            logging.info(f"Rotation ({b_name}): Total={total_pool}, Target Bench={target_bench_count}, Current={current_bench_count}")
+
+            # nsmallest/nlargest keep ties in stream order, like the stable sorts in plan_rotation
+            if current_bench_count < target_bench_count:
+                picked = heapq.nsmallest(target_bench_count - current_bench_count, range(len(a_keys)), key=a_keys.__getitem__)
+                force.update((a_pos[i], "Benched") for i in picked)
+                logging.info(f"Rotation ({b_name}): Forcing BENCH for {len(picked)} accounts.")
+            elif current_bench_count > target_bench_count:
+                picked = heapq.nlargest(current_bench_count - target_bench_count, range(len(b_keys)), key=b_keys.__getitem__)
+                force.update((b_pos[i], "Sending") for i in picked)
+                logging.info(f"Rotation ({b_name}): Forcing SENDING for {len(picked)} accounts.")
+        return force
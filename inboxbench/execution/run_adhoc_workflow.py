@@ -3,603 +3,563 @@ import json
 import logging
 import sys
 import os
+import threading
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lib.instantly_api import InstantlyAPI
-from execution.update_google_sheet import update_client_sheet
-from execution.send_email_report import send_email_report
+from lib.utils import load_json_arg
+from execution.worker_client import run_via_daemon
+from execution.update_google_sheet import open_report_sheet, publish_report_sheet, account_sheet_row
+from execution.send_email_report import send_adhoc_report_email
+from execution.rotation import build_rotation_buckets, plan_rotation
+from execution.action_executor import ActionExecutor
+from execution.report_rows import (
+    campaign_entry, account_entry, status_counts, transition_key, transition_line,
+    account_stream_row, action_stream_row, ACCOUNT_ROW_COLUMNS, ACTION_COLUMNS, TRANSITIONS_KEPT,
+)
+from execution.workspace import fetch_tag_map, fetch_tag_mappings, hydrate_from_mappings, resolve_tags, fetch_campaign_analytics
+from lib.pipeline import Pipeline, run_partitioned
+from lib.progress import ProgressEmitter, RowStream
+from lib.run_journal import RunJournal, DEFAULT_JOURNAL_DIR
+from lib.run_lock import run_exclusive, DEFAULT_LOCK_DIR
+from lib.deadline import Deadline
+from lib.snapshots import save_snapshot, load_snapshots
+
+# Customer buckets processed at once (each also runs its own toggle-resource workers)
+BUCKET_WORKERS = 4
+
+# Stages a resume skips once done (only their small outcome is journaled; fetched data
+# is fetched again). Not checkpointed while a bucket has failed, mutations are queued
+# or analytics are missing (--deadline), so a resume redoes them once those parts are done.
+JOURNALED_STAGES = ("sheet", "email")
+# Completeness statuses a --resume run finishes (a failed sheet write is final, as before)
+RESUMABLE = ("partial", "queued", "deferred", "failed_buckets")
+
+# --deadline: seconds kept back for the sheet write and the email
+SHEET_MIN_SECONDS = 15
+EMAIL_MIN_SECONDS = 5
+TAIL_RESERVE_SECONDS = SHEET_MIN_SECONDS + EMAIL_MIN_SECONDS
+# Share of a run's deadline it may spend waiting for a busy workspace; the rest is left for the run
+LOCK_WAIT_SHARE = 0.5
 
 # Setup logging to STDERR so it doesn't interfere with STDOUT JSON stream
 logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(levelname)s: %(message)s')
 
-def emit_status(step, message, percent):
-    """Emits a JSON status update to stdout"""
-    data = {
-        "type": "progress",
-        "step": step,
-        "message": message,
-        "percent": percent
-    }
-    print(json.dumps(data), flush=True)
+# Coalesced, buffered NDJSON writer for the route.ts stream (CLI runs)
+progress = ProgressEmitter()
+
+# run_streaming_report takes a subset of the run arguments
+STREAM_ARGS = ("api_key", "sheet_url", "report_email", "warmup_threshold", "bench_percent",
+               "ignore_customer_tags", "customer_policies", "stream_rows")
+
+# run_adhoc_report's optional arguments at the CLI's defaults. Filled in before the run
+# lock compares settings, so a daemon request that leaves one out joins a CLI run that spells it out.
+RUN_DEFAULTS = {
+    "sheet_url": None, "report_email": None, "warmup_threshold": 70, "bench_percent": 0,
+    "ignore_customer_tags": False, "snapshot_dir": None, "customer_policies": None,
+    "resume_run_id": None, "journal_dir": None, "deadline": None, "stream_rows": False,
+}
+
+def _items(data):
+    items = data.get("items", []) if isinstance(data, dict) else data
+    return items or []
 
-def run_adhoc_report(api_key, sheet_url, report_email=None, warmup_threshold=70, bench_percent=0, ignore_customer_tags=True):
+def run_adhoc_report(api_key, sheet_url, report_email=None, warmup_threshold=70, bench_percent=0, ignore_customer_tags=False, snapshot_dir=None, customer_policies=None, resume_run_id=None, journal_dir=None, deadline=None, stream_rows=False, progress=None):
     """
     Runs a report for ALL accounts in the workspace.
     Streams progress updates to stdout.
+
+    The work is a DAG of stages (lib/pipeline.py): independent fetches,
+    campaign analytics vs. the engine, and sheet vs. email run concurrently.
+    The Daily Snapshot is written a section at a time (overview, then account
+    health and campaign performance as each lands) rather than all at the end.
+    Within the engine stage each customer bucket (rotation, evaluation,
+    mutations) is an independent unit on a worker pool; a failed bucket is
+    reported and leaves the others alone.
+    Each bucket's actions, mutation plan and applied batches are journaled, with
+    completion markers for buckets, sheet and email (lib/run_journal.py);
+    resume_run_id picks a crashed run up where it stopped, re-fetching the data.
+
+    deadline (seconds, or a Deadline the caller already started) is a budget for
+    the whole run, shared by every stage (lib/deadline.py). Rather than overrun
+    it, campaign analytics stop early, unsent mutation batches are queued and
+    the sheet/email are deferred; the result's "completeness" says which, and
+    --resume RUN_ID finishes the rest. A resume is not quick: it fetches and
+    hydrates the whole workspace again, so it takes about as long as a fresh
+    run; it only saves re-sending applied batches and a finished sheet/email.
+
+    stream_rows sends the account table to the UI as the run goes (lib/progress.RowStream):
+    "action" lines as the engine decides, "account_rows" lines as each bucket's
+    tag updates land. The result then only keeps the first TRANSITIONS_KEPT
+    transitions, since the UI already has every row.
+
+    progress is the ProgressEmitter the NDJSON goes to (a fresh stdout one by
+    default); runs sharing a process (execution/worker_daemon.py) each get their own.
     """
-    emit_status("init", "Starting Ad-Hoc Report Workflow...", 5)
-    
-    try:
-        api = InstantlyAPI(api_key)
-        
-        # 1. Fetch ALL Accounts
+    progress = progress or ProgressEmitter()
+    progress.reset()
+    # Status lines are coalesced per step (lib/progress.py); stage events are ignored by older UIs
+    emit_status = progress.progress
+    emit_event = progress.event
+    budget = deadline if isinstance(deadline, Deadline) else Deadline(deadline)
+    # Work that can be cut short stops early enough to leave room for the report
+    work_budget = budget.less(TAIL_RESERVE_SECONDS)
+    journal = RunJournal(resume_run_id, journal_dir or DEFAULT_JOURNAL_DIR, resume=bool(resume_run_id))
+    if journal.params:
+        # A resumed run keeps the settings it was planned with
+        p = journal.params
+        sheet_url, report_email = p["sheet_url"], p["report_email"]
+        warmup_threshold, bench_percent = p["warmup_threshold"], p["bench_percent"]
+        ignore_customer_tags, snapshot_dir, customer_policies = p["ignore_customer_tags"], p["snapshot_dir"], p["customer_policies"]
+    journal.start({
+        "sheet_url": sheet_url, "report_email": report_email, "warmup_threshold": warmup_threshold,
+        "bench_percent": bench_percent, "ignore_customer_tags": ignore_customer_tags,
+        "snapshot_dir": snapshot_dir, "customer_policies": customer_policies,
+    })
+    progress.event({"type": "run", "run_id": journal.run_id, "resumed": bool(resume_run_id)})
+    emit_status("init", "Resuming Ad-Hoc Report Workflow (re-fetching workspace data)..." if resume_run_id else "Starting Ad-Hoc Report Workflow...", 5)
+    from lib.instantly_api import shared_client # requests; not needed when the daemon runs it
+    api = shared_client(api_key)
+
+    # Initialize Decision Engine config
+    from execution.decision_engine import DecisionEngine, PolicyTable
+    engine_config = {
+        "warmup_threshold": warmup_threshold,
+        "bench_percent": bench_percent,
+        "customer_policies": customer_policies or {}
+    }
+    # Per-customer thresholds are compiled once; evaluation just looks them up
+    policy = PolicyTable.compile(engine_config)
+
+    # --- FETCH ---
+    def fetch_accounts():
         emit_status("fetch_accounts", "Fetching accounts from Instantly...", 10)
-        accounts_data = api.list_accounts()
-        accounts = accounts_data.get("items", []) if isinstance(accounts_data, dict) else accounts_data
-        if not accounts: accounts = []
+        accounts = _items(api.list_accounts())
         logging.info(f"Found {len(accounts)} accounts.")
-        
-        # 2. Fetch ALL Campaigns
-        emit_status("fetch_campaigns", f"Fetching campaigns (Found {len(accounts)} accounts)...", 20)
-        campaigns_data = api.list_campaigns()
-        campaigns = campaigns_data.get("items", []) if isinstance(campaigns_data, dict) else campaigns_data
-        if not campaigns: campaigns = []
-        logging.info(f"Found {len(campaigns)} campaigns.")
+        return accounts
 
-    except Exception as e:
-        err_msg = f"API Fetch Failed: {e}"
-        logging.error(err_msg)
-        return {"success": False, "error": err_msg}
+    def fetch_campaigns():
+        emit_status("fetch_campaigns", "Fetching campaigns from Instantly...", 10)
+        campaigns = _items(api.list_campaigns())
+        logging.info(f"Found {len(campaigns)} campaigns.")
+        return campaigns
 
-    # 3. Analyze Data
-    emit_status("analyzing", f"Analyzing {len(campaigns)} campaigns...", 30)
-    
     # --- HYDRATE TAGS & MAPS ---
-    logging.info(f"Hydrating account tags... (Ignore Customer Tags: {ignore_customer_tags})")
-    
-    # Helper to identify Customer Tag (Non-Status)
-    def get_customer_tag(tags_list):
-        """Returns the first tag that is NOT a system status tag."""
-        valid_status = {"Sending", "Sick", "Warming", "Benched", "Active", "Dead", "Completed", "Paused", "Inactive"}
-        for t in tags_list:
-            if t not in valid_status and not t.startswith("status-"):
-                return t
-        return "-"
-
-    # Fetch Tag Map EARLY so campaigns can use it
-    try:
-        all_tag_map = api.get_all_tags_map()
-    except Exception as e:
-        logging.warning(f"Failed to fetch tag map: {e}")
-        all_tag_map = {}
-
-    # --- FETCH HIDDEN TAG MAPPINGS (V2 Fix) ---
-    logging.info("Fetching hidden tag mappings for resources...")
-    try:
-        # Collect IDs/Emails
-        r_ids = []
-        # Campaign IDs
-        c_map = {c.get("id"): c for c in campaigns if c.get("id")}
-        r_ids.extend(list(c_map.keys()))
-        
-        # Account Emails (as IDs)
-        a_map = {a.get("email"): a for a in accounts if a.get("email")}
-        r_ids.extend(list(a_map.keys()))
-        
-        mappings = api.get_custom_tag_mappings(r_ids)
-        logging.info(f"Found {len(mappings)} hidden tag associations.")
-        
-        for m in mappings:
-            rid = m.get("resource_id")
-            tid = m.get("tag_id")
-            if not tid: continue
-            
-            # Check Campaign Match
-            if rid in c_map:
-                tgt = c_map[rid]
-                if "tags" not in tgt: tgt["tags"] = []
-                if tid not in tgt["tags"]: tgt["tags"].append(tid)
-                
-            # Check Account Match
-            elif rid in a_map:
-                tgt = a_map[rid]
-                if "tags" not in tgt: tgt["tags"] = []
-                # Ensure we don't duplicate if already present
-                if tid not in tgt["tags"]: tgt["tags"].append(tid)
-
-        # --- RESOLVE MISSING TAG NAMES ---
-        # The hidden tags we just found are likely NOT in all_tag_map since /custom-tags list hides them.
-        # We must fetch their names explicitly so they don't show as UUIDs or get ignored.
-        unique_mapping_tags = set(m.get("tag_id") for m in mappings if m.get("tag_id"))
-        missing_tag_ids = [tid for tid in unique_mapping_tags if tid not in all_tag_map]
-        
-        logging.info(f"Resolving {len(missing_tag_ids)} hidden tag names...")
-        for tid in missing_tag_ids:
+    def mappings(accounts, campaigns):
+        emit_status("fetch_campaigns", f"Fetching tag mappings ({len(accounts)} accounts, {len(campaigns)} campaigns)...", 20)
+        return fetch_tag_mappings(api, accounts, campaigns)
+
+    def hydrate(accounts, campaigns, tag_map, mappings):
+        emit_status("analyzing", f"Analyzing {len(campaigns)} campaigns...", 30)
+        logging.info(f"Hydrating account tags... (Ignore Customer Tags: {ignore_customer_tags})")
+        # One mapping pass gives complete account -> tags; per-status-tag listings are only a fallback
+        hydrate_from_mappings(api, accounts, campaigns, tag_map, *mappings)
+
+        # Pre-resolve tags for ALL accounts now, so we can use them
+        # DEBUG: Print Tag Map sample
+        logging.info(f"Tag Map Keys: {list(tag_map.keys())[:5]}")
+        logging.info(f"Tag Map Values: {list(tag_map.values())[:5]}")
+
+        resolve_tags(accounts, tag_map)
+        resolve_tags(campaigns, tag_map)
+
+        # Record today's hydrated state for backtests (execution/simulate_engine.py)
+        if snapshot_dir:
             try:
-                # Direct fetch for hidden tag
-                # Assuming simple get endpoint works based on debug research
-                tag_details = api._get(f"/custom-tags/{tid}")
-                if tag_details and "label" in tag_details:
-                    all_tag_map[tid] = tag_details["label"]
-                    logging.info(f"Resolved hidden tag {tid} -> {tag_details['label']}")
-                else:
-                    logging.warning(f"Could not resolve name for tag {tid}")
-                    all_tag_map[tid] = str(tid) # Fallback to UUID
+                campaign_tags = [c["customer_tag"] for c in campaigns]
+                save_snapshot(accounts, snapshot_dir, campaign_tags=campaign_tags)
             except Exception as e:
-                logging.warning(f"Error fetching tag {tid}: {e}")
-                
-    except Exception as e:
-        logging.warning(f"Failed to fetch hidden mappings: {e}")
-
-    relevant_status_tags = ["Sending", "Sick", "Warming", "Benched", "Active", "Dead"]
-    email_to_acc_map = {acc['email']: acc for acc in accounts}
-    
-    # Hydrate Account Tags (Resolve IDs to Names)
-    # Also manual hydration for status tags if API didn't return them in list_accounts
-    for t_name in relevant_status_tags:
-        t_id = api.get_tag_id_by_name(t_name)
-        if t_id:
-            # unique list of accounts with this tag
-            tagged_accs_data = api.list_accounts(tag_ids=[t_id])
-            if isinstance(tagged_accs_data, list):
-                 for t_acc in tagged_accs_data:
-                     email = t_acc.get('email')
-                     if email in email_to_acc_map:
-                         if 'tags' not in email_to_acc_map[email]:
-                             email_to_acc_map[email]['tags'] = []
-                         # Avoid dupes
-                         if t_id not in email_to_acc_map[email]['tags']:
-                             email_to_acc_map[email]['tags'].append(t_id)
-
-    # Pre-resolve tags for ALL accounts now, so we can use them
-    # DEBUG: Print Tag Map sample
-    logging.info(f"Tag Map Keys: {list(all_tag_map.keys())[:5]}")
-    logging.info(f"Tag Map Values: {list(all_tag_map.values())[:5]}")
-    
-    for acc in accounts:
-        t_ids = acc.get("tags", [])
-        acc["tags_resolved"] = [all_tag_map.get(tid, str(tid)) for tid in t_ids]
-        acc["customer_tag"] = get_customer_tag(acc["tags_resolved"])
-        
-        # DEBUG specific account
-        if "powersipesautomation" in acc.get("email", ""):
-            logging.info(f"debug_acc: {acc.get('email')} | tags: {t_ids} | resolved: {acc['tags_resolved']} | customer: {acc['customer_tag']}")
-
-
-    total_sent = 0
-    total_replies = 0
-    total_leads = 0
-    
-    processed_campaigns = []
-    
-    count = 0
-    max_camps = 15
-    camps_to_process = campaigns[:max_camps]
-    total_camps_count = len(camps_to_process)
-
-    for camp in camps_to_process:
-        count += 1
-        progress_val = 30 + int((count / total_camps_count) * 40)
-        emit_status("analyzing_campaign", f"Analyzing campaign: {camp.get('name')}...", progress_val)
-        
-        camp_id = camp.get("id")
-        camp_name = camp.get("name")
-        
-        # Resolve Campaign Tags
-        c_t_ids = camp.get("tags", [])
-        c_tags_resolved = [all_tag_map.get(tid, str(tid)) for tid in c_t_ids]
-        camp_customer_tag = get_customer_tag(c_tags_resolved)
-
-        # Fetch summary
-        success_stats = {"sent": 0, "opens": 0, "replies": 0, "leads": 0}
+                logging.warning(f"Failed to save snapshot: {e}")
+        return tag_map
+
+    # --- CAMPAIGN ANALYTICS (overlaps with the engine) ---
+    def campaign_stats(campaigns, hydrate):
+        totals = {"sent": 0, "replies": 0, "leads": 0}
+        processed_campaigns = []
+        total_camps_count = len(campaigns)
+
+        def on_progress(done, total):
+            progress_val = 30 + int((done / max(total, 1)) * 40)
+            emit_status("analyzing_campaign", f"Fetched analytics for {done}/{total} campaigns...", progress_val)
+
+        # Every campaign: one shared analytics call (or concurrent per-campaign fallback)
+        summaries = fetch_campaign_analytics(api, campaigns, on_progress=on_progress, deadline=work_budget)
+        missing = sum(1 for c in campaigns if c.get("id") and c.get("id") not in summaries)
+
+        for camp in campaigns:
+            entry, stats = campaign_entry(camp, summaries.get(camp.get("id")))
+            for k in totals:
+                totals[k] += stats[k]
+            processed_campaigns.append(entry)
+        if missing:
+            emit_status("warning", f"Out of time: no analytics for {missing}/{total_camps_count} campaigns.", 70)
+        emit_status("analyzing_campaign", f"Analyzed {total_camps_count} campaigns.", 70)
+        return {"campaigns": processed_campaigns, "totals": totals, "missing": missing}
+
+    # --- ROW STREAM (--stream_rows) ---
+    action_stream = RowStream(progress, "action", ACTION_COLUMNS) if stream_rows else None
+    row_stream = RowStream(progress, "account_rows", ACCOUNT_ROW_COLUMNS) if stream_rows else None
+    streamed = {} # email -> (entry, log_row) already built for the stream; reused by rows()
+    streamed_lock = threading.Lock()
+
+    def stream_bucket(b_accounts, result):
+        built = {}
+        for acc in b_accounts:
+            action = result["actions"].get(acc.get("email"))
+            outcome = result["outcomes"].get(action["email"]) if action else None
+            entry, log_row = account_entry(acc, action, outcome)
+            built[acc.get("email")] = (entry, log_row)
+            row_stream.add(account_stream_row(entry, outcome))
+        row_stream.flush()
+        with streamed_lock:
+            streamed.update(built)
+
+    # --- PER-CUSTOMER UNITS: rotation -> engine -> mutations ---
+    def buckets(accounts, campaigns, hydrate):
+        emit_status("running_engine", f"Running Decision Engine on {len(accounts)} accounts...", 40)
+        # Each customer bucket is planned, evaluated and mutated on its own, so a slow or
+        # failing customer doesn't hold up the rest (one "Global" bucket with ignore_customer_tags)
+        parts = {name: b for name, b in build_rotation_buckets(accounts, campaigns, hydrate, ignore_customer_tags).items() if b["accounts"]}
+        evaluated = 0
+        count_lock = threading.Lock()
+
+        def evaluate(b_name, b_data):
+            nonlocal evaluated
+            engine = DecisionEngine(api, config=engine_config, policy=policy)
+            force_map = {}
+            if policy.has_rotation():
+                force_map = plan_rotation({b_name: b_data}, policy.default.bench_percent, ignore_customer_tags, policy=policy)
+
+            to_apply = []
+            for acc in b_data["accounts"]:
+                # Deep fetch (Analytics) - Placeholder for now
+                analytics = api.get_account_analytics(acc.get("email"))
+
+                # Evaluate Rules
+                force_status = force_map.get(acc.get("email"))
+                action = engine.evaluate_account(acc, analytics, force_status=force_status)
+
+                # DEBUG: Emit status for target account to see engine internals
+                email = acc.get("email")
+                if "michael" in email.lower() and "shift" in email.lower():
+                     # Re-evaluate to dump state
+                     d_tags = acc.get("tags_resolved", [])
+                     d_score = acc.get("stat_warmup_score", 0)
+                     d_found = [t for t in d_tags if t in ["Sick", "Benched", "Sending", "Warming"]]
+                     emit_status("warning", f"DEBUG: {email} | Tags={d_tags} | Found={d_found} | Score={d_score} | Threshold={warmup_threshold} | Action={action}", 55)
+
+                if action:
+                    to_apply.append((acc, action))
+                    if action_stream is not None: action_stream.add(action_stream_row(acc, action))
+                with count_lock:
+                    evaluated += 1
+                    n = evaluated
+                progress.count("accounts_evaluated")
+                if action: progress.count("actions")
+                emit_status("running_engine", f"Evaluated {n}/{len(accounts)} accounts...", 40)
+            return to_apply
+
+        def unit(b_name, b_data):
+            planned = journal.get_actions(b_name)
+            if planned is not None:
+                # Decided before the resume; today's tags already have some of it, so apply the journaled plan as is
+                by_email = {action["email"]: action for action in planned}
+                to_apply = [(acc, by_email[acc.get("email")]) for acc in b_data["accounts"] if acc.get("email") in by_email]
+            elif f"bucket:{b_name}" in journal.stages:
+                to_apply = [] # Finished before the resume with nothing to change
+            else:
+                to_apply = evaluate(b_name, b_data)
+
+            # Execute Actions (Update Instantly) in bulk
+            # SAFE METHOD: add/remove via toggle-resource instead of set_tags to preserve hidden tags
+            outcomes = ActionExecutor(api, hydrate).execute(to_apply, journal=journal, unit=b_name, deadline=work_budget) if to_apply else {}
+            queued = sum(1 for o in outcomes.values() if o["queued"])
+            result = {"actions": {action["email"]: action for _, action in to_apply}, "outcomes": outcomes, "queued": queued}
+            if not queued:
+                journal.checkpoint(f"bucket:{b_name}") # else re-run on resume to send the rest of its plan
+            if row_stream is not None:
+                action_stream.flush()
+                stream_bucket(b_data["accounts"], result)
+            return result
+
+        results, failed = run_partitioned(parts, unit, max_workers=BUCKET_WORKERS)
+        for b_name, err in failed.items():
+            emit_status("warning", f"Customer '{b_name}' failed ({err}); its accounts were left unchanged.", 75)
+        merged = {"actions": {}, "outcomes": {}, "failed": failed, "queued": 0}
+        for result in results.values():
+            merged["actions"].update(result["actions"])
+            merged["outcomes"].update(result["outcomes"])
+            merged["queued"] += result.get("queued", 0)
+        if merged["queued"]:
+            emit_status("warning", f"Out of time: {merged['queued']} accounts' tag updates queued for a follow-up run.", 75)
+        emit_status("running_engine", f"Applied {len(merged['actions']) - merged['queued']} actions.", 75)
+        return merged
+
+    # --- REPORT ROWS (workspace order, every bucket merged) ---
+    def rows(accounts, buckets):
+        processed_accounts = []
+        actions_log = []
+        for acc in accounts:
+            if acc.get("email") in streamed:
+                entry, log_row = streamed[acc.get("email")]
+            else:
+                action = buckets["actions"].get(acc.get("email"))
+                entry, log_row = account_entry(acc, action, buckets["outcomes"].get(action["email"]) if action else None)
+            if log_row:
+                actions_log.append(log_row)
+            processed_accounts.append(entry)
+        return {"accounts": processed_accounts, "actions_log": actions_log}
+
+    # Pre-emptive watch list: healthy-today accounts whose score history is dropping
+    def watch(hydrate):
+        if not snapshot_dir:
+            return None
         try:
-            summary = api.get_campaign_summary(camp_id)
-            if summary:
-                # Robust extraction: check keys found in debug (`emails_sent_count`, etc.)
-                # User preference: "Sent" column should show "Sequence Started" (unique leads contacted)
-                success_stats["sent"] = summary.get("new_leads_contacted_count", summary.get("contacted_count", 0))
-                
-                # User preference: "Replies" matching UI (20) which is manual (4) + auto (16)
-                manual_replies = summary.get("reply_count", summary.get("replies", 0))
-                auto_replies = summary.get("reply_count_automatic", 0)
-                success_stats["replies"] = manual_replies + auto_replies
-                
-                success_stats["opens"] = summary.get("open_count", summary.get("opens", 0))
-                success_stats["leads"] = summary.get("leads_count", summary.get("opportunities", 0))
-                
-                # Check for zero stats warning
-                if success_stats["sent"] == 0:
-                     logging.info(f"Campaign {camp_name} returned 0 contacted. Keys: {list(summary.keys())}")
-
+            from execution.anomaly_scan import build_watch_list, DEFAULT_WINDOW # numpy; only with --snapshot_dir
+            # Baseline window + today, with slack for gaps
+            history = load_snapshots(snapshot_dir, limit_days=DEFAULT_WINDOW * 2 + 1)
+            found = build_watch_list(history, policy=policy)
+            logging.info(f"Watch list: {found['total_accounts']} accounts, {found['total_domains']} domains")
+            return found
         except Exception as e:
-            logging.warning(f"Failed to fetch stats for {camp_name}: {e}")
-
-        total_sent += success_stats["sent"]
-        total_replies += success_stats["replies"]
-        total_leads += success_stats["leads"]
-
-        # Campaign Status Mapping
-        raw_status = camp.get("status_v2", camp.get("status"))
-        c_status_map = {1: "Active", 2: "Paused", 3: "Completed", 0: "Inactive"}
-        final_status = c_status_map.get(raw_status, str(raw_status))
-
-        processed_campaigns.append({
-            "name": camp_name,
-            "status": final_status,
-            "customer_tag": camp_customer_tag,
-            "sent": success_stats["sent"],
-            "opens": success_stats["opens"],
-            "replies": success_stats["replies"],
-            "click_rate": 0, 
-            "reply_rate": 0
-        })
-
-    # Initialize Decision Engine
-    from execution.decision_engine import DecisionEngine
-    engine_config = {
-        "warmup_threshold": warmup_threshold,
-        "bench_percent": bench_percent
-    }
-    engine = DecisionEngine(api, config=engine_config) # Tag map is passed or fetched internally? Engine might need update
-
-    processed_accounts = []
-    actions_log = [] 
-
-    emit_status("running_engine", f"Running Decision Engine on {len(accounts)} accounts...", 40)
-    
-    # Status Mapping
-    STATUS_MAP = {
-        1: "Active",
-        2: "Paused",
-        3: "Completed",
-        0: "Inactive"
-    }
+            logging.warning(f"Anomaly scan failed: {e}")
+            return None
+
+    # --- REPORT ---
+    def report(campaign_stats, rows, watch, buckets):
+        processed_accounts = rows["accounts"]
+        actions_log = rows["actions_log"]
+        report_data = {
+            "client_name": "Ad-Hoc Run",
+            "formatted_date": datetime.now(ZoneInfo("US/Mountain")).strftime('%Y-%m-%d %H:%M'),
+            "total_sent": campaign_stats["totals"]["sent"],
+            "total_leads": campaign_stats["totals"]["leads"],
+            "total_replies": campaign_stats["totals"]["replies"],
+            "total_opportunities": 0,
+            "campaigns": campaign_stats["campaigns"],
+            "accounts": processed_accounts,
+            "share_email": report_email,  # Pass for fallback sharing
+            "report_email": report_email
+        }
+
+        # Generate Transition Summary (for Sheet & Email)
+        transition_counts = {} # Only counts changes
+
+        # Calculate Global Counts (Current State of All Accounts)
+        global_counts = status_counts(processed_accounts)
+
+        transition_list = []
+
+        for log in actions_log:
+            key = transition_key(log[4])
+            transition_counts[key] = transition_counts.get(key, 0) + 1
+            transition_list.append(transition_line(log))
+
+        # Add Summary to Report Data
+        report_data["run_summary"] = {
+            "total_actions": len(actions_log),
+            "transitions": transition_list,
+            "counts": global_counts, # Use GLOBAL counts for sheet
+            "transition_counts": transition_counts
+        }
+        if watch is not None:
+            report_data["run_summary"]["watch"] = watch
+        if buckets["failed"]:
+            report_data["run_summary"]["failed_buckets"] = buckets["failed"]
+        if buckets["queued"]:
+            report_data["run_summary"]["queued_actions"] = buckets["queued"]
+        return report_data
+
+    # --- SHEET (written section by section as the data lands) ---
+    def sheet_open(accounts, campaigns):
+        if "sheet" in journal.stages:
+            return None # Written before the resume
+        snapshot = open_report_sheet(sheet_url, len(campaigns), {
+            "client_name": "Ad-Hoc Run",
+            "formatted_date": datetime.now(ZoneInfo("US/Mountain")).strftime('%Y-%m-%d %H:%M'),
+            "accounts_count": len(accounts),
+        }, share_email=report_email)
+        if snapshot is not None and not snapshot.error:
+            emit_status("updating_sheet", "Google Sheet overview written; sections follow as they finish...", 20)
+        return snapshot
+
+    # Account health as soon as the engine is done (doesn't wait for campaign analytics)
+    def sheet_accounts(sheet_open, rows):
+        if sheet_open is None or sheet_open.error:
+            return None
+        sheet_open.update_overview({"counts": status_counts(rows["accounts"])})
+        sheet_open.write_accounts([[account_sheet_row(entry) for entry in rows["accounts"]]])
+        emit_status("updating_sheet", f"Wrote {len(rows['accounts'])} accounts to Google Sheet.", 76)
+        return None
+
+    def sheet_campaigns(sheet_open, campaign_stats):
+        if sheet_open is None or sheet_open.error:
+            return None
+        totals = campaign_stats["totals"]
+        sheet_open.update_overview({"total_sent": totals["sent"], "total_leads": totals["leads"],
+                                    "total_replies": totals["replies"], "total_opportunities": 0})
+        sheet_open.write_campaigns(campaign_stats["campaigns"])
+        emit_status("updating_sheet", f"Wrote {len(campaign_stats['campaigns'])} campaigns to Google Sheet.", 71)
+        return None
+
+    def sheet(report, rows, sheet_open, sheet_accounts, sheet_campaigns):
+        if sheet_url and not budget.allows(SHEET_MIN_SECONDS):
+            emit_status("warning", "Out of time: sheet update deferred to a follow-up run.", 85)
+            return {"sheet_updated": False, "sheet_error": "Deferred: out of time", "deferred": True}
+        return publish_report_sheet(sheet_url, report, [rows["actions_log"]], on_status=emit_status, snapshot=sheet_open)
+
+    # --- EMAIL (overlaps with the sheet write) ---
+    def email(report, accounts, campaigns):
+        if report_email and not budget.allows(EMAIL_MIN_SECONDS):
+            emit_status("warning", "Out of time: report email deferred to a follow-up run.", 90)
+            return {"email_sent": False, "email_error": "Deferred: out of time", "deferred": True}
+        accounts_with_issues = sum(1 for a in report["accounts"] if "Sick" in str(a.get("status", "")))
+        return send_adhoc_report_email(report_email, report, len(accounts), len(campaigns), accounts_with_issues, on_status=emit_status)
+
+    # --- CHECKPOINTS ---
+    def checkpoint(name, value):
+        # Buckets journal their own plans/batches; everything else but the sheet/email outcome is redone on resume
+        if name not in JOURNALED_STAGES or not value or value.get("deferred") or incomplete_inputs():
+            return
+        journal.checkpoint(name, value)
+
+    def incomplete_inputs():
+        b = pipeline.results["buckets"]
+        return bool(b["failed"] or b["queued"] or (pipeline.results.get("campaign_stats") or {}).get("missing"))
+
+    def restore(stages):
+        return {k: stages[k] for k in JOURNALED_STAGES if k in stages}
+
+    pipeline = Pipeline(on_event=emit_event, max_workers=4, on_result=checkpoint, deadline=budget)
+    pipeline.add("accounts", fetch_accounts)
+    pipeline.add("campaigns", fetch_campaigns)
+    pipeline.add("tag_map", lambda: fetch_tag_map(api))
+    pipeline.add("mappings", mappings, inputs=("accounts", "campaigns"))
+    pipeline.add("hydrate", hydrate, inputs=("accounts", "campaigns", "tag_map", "mappings"))
+    pipeline.add("campaign_stats", campaign_stats, inputs=("campaigns", "hydrate"))
+    pipeline.add("buckets", buckets, inputs=("accounts", "campaigns", "hydrate"))
+    pipeline.add("rows", rows, inputs=("accounts", "buckets"))
+    pipeline.add("watch", watch, inputs=("hydrate",))
+    pipeline.add("report", report, inputs=("campaign_stats", "rows", "watch", "buckets"))
+    pipeline.add("sheet_open", sheet_open, inputs=("accounts", "campaigns"))
+    pipeline.add("sheet_accounts", sheet_accounts, inputs=("sheet_open", "rows"))
+    pipeline.add("sheet_campaigns", sheet_campaigns, inputs=("sheet_open", "campaign_stats"))
+    pipeline.add("sheet", sheet, inputs=("report", "rows", "sheet_open", "sheet_accounts", "sheet_campaigns"))
+    pipeline.add("email", email, inputs=("report", "accounts", "campaigns"))
+    results = pipeline.run(initial=restore(journal.stages))
+
+    for fetch_stage in ("accounts", "campaigns"):
+        if fetch_stage in pipeline.errors:
+            err_msg = f"API Fetch Failed: {pipeline.errors[fetch_stage]}"
+            logging.error(err_msg)
+            journal.finish("failed")
+            journal.close()
+            return {"success": False, "error": err_msg, "run_id": journal.run_id}
+    if "report" not in results:
+        # Best effort, like a failed sheet/email: report what was applied instead of raising
+        failed = {name: err for name, err in pipeline.errors.items() if not err.startswith("Skipped")}
+        err_msg = f"Workflow stages failed: {failed} (--resume {journal.run_id} finishes it; it re-fetches the workspace, so expect a full-length run)"
+        logging.error(err_msg)
+        journal.finish("failed")
+        journal.close()
+        outcomes = (results.get("buckets") or {}).get("outcomes", {})
+        return {
+            "success": False,
+            "error": err_msg,
+            "failed_stages": failed,
+            "run_id": journal.run_id,
+            "accounts_count": len(results.get("accounts") or []),
+            "campaigns_count": len(results.get("campaigns") or []),
+            "actions_applied": sum(1 for o in outcomes.values() if (o["added"] or o["removed"]) and not (o["failed"] or o["queued"])),
+            "transitions": [transition_line(log) for log in results["rows"]["actions_log"]] if "rows" in results else [],
+            "resume": f"--resume {journal.run_id}",
+            "stage_timings": {name: round(sec, 3) for name, sec in pipeline.timings.items()}
+        }
+    completeness = _completeness(results, sheet_url, report_email)
+    complete = all(status in ("complete", "skipped") for status in completeness.values())
+    follow_up = any(status in RESUMABLE for status in completeness.values())
+    if follow_up:
+        logging.warning(f"Run incomplete ({completeness}); --resume {journal.run_id} finishes it (re-fetches the workspace, so about as long as a new run)")
+    journal.finish("partial" if follow_up else "ok")
+    journal.close()
 
-    # Pre-calculate Rotation Plan
-    bench_percent = engine_config.get("bench_percent", 0)
-    force_map = {}
-    
-    if bench_percent > 0:
-        # Determine Buckets
-        if ignore_customer_tags:
-            buckets = {"Global": {"accounts": accounts, "campaigns": campaigns}}
-        else:
-            # Group Accounts using pre-calculated customer_tag
-            buckets = {}
-            for acc in accounts:
-                b_key = acc.get("customer_tag", "General")
-                if b_key not in buckets: buckets[b_key] = {"accounts": [], "campaigns": []}
-                buckets[b_key]["accounts"].append(acc)
-            
-            # Map Campaigns to Buckets
-            # We already calculated tags for processed_campaigns, but "campaigns" list might be raw
-            # Need to ensure global campaigns list has 'customer_tag' or resolve it again
-            for camp in campaigns:
-                # Quick resolve for rotation logic if not processed above
-                if "tags_resolved" not in camp:
-                     c_t_ids = camp.get("tags", [])
-                     camp["tags_resolved"] = [all_tag_map.get(tid, str(tid)) for tid in c_t_ids]
-                
-                b_key = get_customer_tag(camp["tags_resolved"])
-                if b_key not in buckets: buckets[b_key] = {"accounts": [], "campaigns": []}
-                buckets[b_key]["campaigns"].append(camp)
-
-        logging.info(f"Running Rotation Logic on {len(buckets)} buckets (Ignore Tags: {ignore_customer_tags})")
-
-        for b_name, b_data in buckets.items():
-            b_accs = b_data["accounts"]
-            b_camps = b_data["campaigns"]
-            
-            active_candidates = []
-            benched_candidates = []
-            
-            for acc in b_accs:
-                tags = acc.get("tags_resolved", [])
-                if "Sending" in tags:
-                    active_candidates.append(acc)
-                elif "Benched" in tags:
-                    benched_candidates.append(acc)
-            
-            total_pool = len(active_candidates) + len(benched_candidates)
-            if total_pool > 0:
-                has_campaigns = len(b_camps) > 0
-                if ignore_customer_tags: has_campaigns = True 
-                
-                if not has_campaigns and b_name != "General":
-                    target_bench_count = total_pool
-                    logging.info(f"Bucket '{b_name}': No campaigns found. Forcing 100% Bench.")
-                else:
-                    target_bench_count = int(total_pool * bench_percent / 100)
-                
-                current_bench_count = len(benched_candidates)
-                
-                logging.info(f"Rotation ({b_name}): Total={total_pool}, Target Bench={target_bench_count}, Current={current_bench_count}")
-                
-                if current_bench_count < target_bench_count:
-                    # Deficit: Bench some Actives
-                    needed = target_bench_count - current_bench_count
-                    active_candidates.sort(key=lambda x: int(x.get('stat_warmup_score', 100) or 0))
-                    to_bench = active_candidates[:needed]
-                    for a in to_bench: force_map[a['email']] = "Benched"
-                    logging.info(f"Rotation ({b_name}): Forcing BENCH for {len(to_bench)} accounts.")
-    
-                elif current_bench_count > target_bench_count:
-                    # Surplus: Activate some Benched
-                    release = current_bench_count - target_bench_count
-                    benched_candidates.sort(key=lambda x: int(x.get('stat_warmup_score', 0) or 0), reverse=True)
-                    to_activate = benched_candidates[:release]
-                    for a in to_activate: force_map[a['email']] = "Sending"
-                    logging.info(f"Rotation ({b_name}): Forcing SENDING for {len(to_activate)} accounts.")
-
-    count = 0
-    total_accounts = len(accounts)
-    
-    # Conflict List
-    CONFLICT_TAGS = {"Active", "Dead", "Sending", "Sick", "Warming", "Benched"}
-
-    for acc in accounts:
-        count += 1
-        # Deep fetch (Analytics) - Placeholder for now
-        analytics = api.get_account_analytics(acc.get("email"))
-        
-        # Evaluate Rules
-        force_status = force_map.get(acc.get("email"))
-        action = engine.evaluate_account(acc, analytics, force_status=force_status)
-        
-        # Default status/tags from current state
-        final_tags = list(acc.get("tags_resolved", [])) # Make a mutable copy
-        
-        raw_status = acc.get("status_v2", acc.get("status"))
-        final_status = STATUS_MAP.get(raw_status, str(raw_status))
-
-        # DEBUG: Emit status for target account to see engine internals
-        email = acc.get("email")
-        if "michael" in email.lower() and "shift" in email.lower():
-             # Re-evaluate to dump state
-             d_tags = acc.get("tags_resolved", [])
-             d_score = acc.get("stat_warmup_score", 0)
-             d_found = [t for t in d_tags if t in ["Sick", "Benched", "Sending", "Warming"]]
-             emit_status("warning", f"DEBUG: {email} | Tags={d_tags} | Found={d_found} | Score={d_score} | Threshold={warmup_threshold} | Action={action}", 55)
-
-        if action:
-            # Prepare log entry
-            email = action['email']
-            reason = action['reason']
-            new_tag = action['new_tag']
-            
-            logging.info(f"ACTION REQUIRED: {email} -> {new_tag} ({reason})")
-            
-            # Execute Action (Update Instantly)
-            # SAFE METHOD: Use add/remove instead of set_tags to preserve hidden tags
-            
-            acc_id = acc.get("id") # Need ID for toggle-resource
-            # If no ID (rare), we might have to skip or try lookup? List accounts returns IDs.
-            if not acc_id:
-                logging.warning(f"Account {email} has no ID inside logic. Skipping tag updates.")
-            else:
-                # 1. Remove Conflicts
-                for c_tag_name in CONFLICT_TAGS:
-                    if c_tag_name != new_tag and c_tag_name in final_tags:
-                        t_id_to_remove = api.get_tag_id_by_name(c_tag_name)
-                        if t_id_to_remove:
-                            logging.info(f"Removing conflict tag '{c_tag_name}' for {email}")
-                            api.remove_account_tag(acc_id, t_id_to_remove)
-                            if c_tag_name in final_tags: final_tags.remove(c_tag_name)
-                
-                # 2. Add New Tag
-                if new_tag not in final_tags:
-                    t_id_to_add = api.get_tag_id_by_name(new_tag)
-                    if t_id_to_add:
-                        logging.info(f"Adding tag '{new_tag}' for {email}")
-                        api.add_account_tag(acc_id, t_id_to_add)
-                        final_tags.append(new_tag)
-                    else:
-                        logging.warning(f"Could not resolve ID for new tag '{new_tag}'")
-
-            # Update local state for report (visuals only)
-            
-            # 2. Update Status/Warmup (if needed)
-            if action.get("warmup") is False:
-                # api.set_warmup_status(email, False)
-                pass
-
-            actions_log.append([
-                datetime.now(ZoneInfo("US/Mountain")).strftime('%Y-%m-%d %H:%M:%S'),
-                acc.get("customer_tag", "Unknown Client"), 
-                email,
-                final_status, 
-                new_tag,
-                reason,
-                "-",
-                "-"
-            ])
-            
-            # Change Display Logic
-            change_display = f"-> {new_tag}"
-        else:
-            change_display = "-"
-        
-        # 3. Format Strings for Sheet
-        # User Feedback: Don't show Customer Tag in "Tags" column (since it has its own column).
-        # Also filter out internal status tags if present.
-        c_tag = acc.get("customer_tag")
-        display_tags = [
-            t for t in final_tags 
-            if t != c_tag and not t.startswith("status-")
-        ]
-        tags_str = ", ".join(display_tags)
-        
-        # Robust Daily Limit
-        daily_limit = acc.get("limit", acc.get("daily_limit", 0))
-
-        processed_accounts.append({
-            "email": acc.get("email"),
-            "status": final_status,
-            "daily_limit": daily_limit,
-            "warmup_score": f"{acc.get('stat_warmup_score', 0)}/100",
-            "tags": tags_str,
-            "customer_tag": acc.get("customer_tag", "-"),
-            "change": change_display
-        })
-
-    report_data = {
-        "client_name": "Ad-Hoc Run",
-        "formatted_date": datetime.now(ZoneInfo("US/Mountain")).strftime('%Y-%m-%d %H:%M'),
-        "total_sent": total_sent,
-        "total_leads": total_leads,
-        "total_replies": total_replies,
-        "total_opportunities": 0,
-        "campaigns": processed_campaigns,
-        "accounts": processed_accounts,
-        "share_email": report_email,  # Pass for fallback sharing
-        "report_email": report_email
-    }
-    
-    # 4. Generate Transition Summary (for Sheet & Email)
-    transition_counts = {} # Only counts changes
-    global_counts = {
-        "Sending": 0, "Sick": 0, "Warming": 0, "Benched": 0
-    }
+    emit_status("complete", "Workflow Complete!", 100)
 
-    # Calculate Global Counts (Current State of All Accounts)
-    for acc in processed_accounts:
-        # Derived from tags string or logic
-        tags_list = acc.get("tags", "").split(", ")
-        primary = "Unknown"
-        # Priority Order
-        if "Sick" in tags_list: primary = "Sick"
-        elif "Warming" in tags_list: primary = "Warming"
-        elif "Benched" in tags_list: primary = "Benched"
-        elif "Sending" in tags_list: primary = "Sending"
-        
-        if primary in global_counts:
-            global_counts[primary] += 1
-
-    transition_list = []
-    
-    for log in actions_log:
-        # log format: [time, client, email, prev, new, reason, ...]
-        new_status = log[4]
-        # Clean key
-        key = new_status.replace("status-", "").capitalize()
-        transition_counts[key] = transition_counts.get(key, 0) + 1
-        transition_list.append(f"{log[2]} -> {log[4]} ({log[5]})")
-
-    # Add Summary to Report Data
-    report_data["run_summary"] = {
-        "total_actions": len(actions_log),
-        "transitions": transition_list,
-        "counts": global_counts, # Use GLOBAL counts for sheet
-        "transition_counts": transition_counts 
+    sheet_result = results.get("sheet") or {"sheet_updated": False, "sheet_error": pipeline.errors.get("sheet")}
+    run_summary = results["report"]["run_summary"]
+    if stream_rows:
+        # The UI has every row already; keep the result small
+        run_summary = dict(run_summary, transitions=run_summary["transitions"][:TRANSITIONS_KEPT],
+                           rows_streamed=row_stream.count)
+    return {
+        "success": True,
+        "run_id": journal.run_id,
+        "accounts_count": len(results["accounts"]),
+        "campaigns_count": len(results["campaigns"]),
+        "sheet_updated": sheet_result["sheet_updated"],
+        "sheet_error": sheet_result["sheet_error"],
+        "email_sent": (results.get("email") or {}).get("email_sent", False),
+        "run_summary": run_summary,
+        "complete": complete,
+        "completeness": completeness,
+        "resume": f"--resume {journal.run_id}" if follow_up else None,
+        "deadline": budget.to_dict() if deadline else None,
+        "stage_timings": {name: round(sec, 3) for name, sec in pipeline.timings.items()}
     }
 
-    # 5. Update Sheet
-    sheet_updated = False
-    sheet_error = None
-    if sheet_url:
-        emit_status("updating_sheet", "Writing data to Google Sheet...", 80)
-        try:
-            if "/d/" in sheet_url:
-                sheet_id = sheet_url.split("/d/")[1].split("/")[0]
-                logging.info(f"Updating Sheet ID: {sheet_id}")
-                
-                from execution.update_google_sheet import write_to_tab, get_credentials
-                from googleapiclient.discovery import build
-                
-                # Update Snapshot (Main Report) + Summary Table? 
-                # Ideally we append a summary table to the snapshot. 
-                # For now let's keep Snapshot clean and just ensure Action Log is populated.
-                sheet_updated, result_val = update_client_sheet(report_data, sheet_id)
-                
-                # Check if fallback occurred (Success + URL returned)
-                if sheet_updated and result_val and "https" in str(result_val):
-                     # Parse new Sheet ID to ensure Action Log goes to the right place
-                     try:
-                         sheet_id = result_val.split("/d/")[1].split("/")[0]
-                         logging.info(f"Failed to write to original. Created NEW Sheet: {sheet_id}")
-                         emit_status("warning", f"Original sheet locked. Created NEW Sheet -> {result_val}", 82)
-                         # Store this to return in result so main result shows the switch
-                         sheet_error = f"Created NEW Sheet: {result_val}" 
-                     except:
-                         logging.warning("Could not parse new ID")
-
-                elif not sheet_updated:
-                     sheet_error = result_val
-
-                # Update Action Log (Append)
-                if actions_log and sheet_updated:
-                    logging.info(f"Appending {len(actions_log)} actions to log...")
-                    # Re-instantiate service 
-                    creds = get_credentials()
-                    if creds:
-                        service = build('sheets', 'v4', credentials=creds)
-                        try:
-                            write_to_tab(service, sheet_id, "Action Log", actions_log, mode="APPEND")
-                        except Exception as e:
-                            logging.warning(f"Failed to append logs: {e}")
-                
-                if not sheet_updated:
-                    if not sheet_error: sheet_error = "Unknown writing error"
-                    emit_status("warning", f"Sheet Update Failed: {sheet_error}", 85)
-            else:
-                logging.warning("Invalid Sheet URL format.")
-                sheet_error = "Invalid Sheet URL format"
-                emit_status("warning", "Skipped Sheet Update: Invalid URL format", 85)
-        except Exception as e:
-            logging.error(f"Sheet Update Error: {e}")
-            sheet_error = str(e)
-    else:
-        logging.warning("No Sheet URL provided.")
-        emit_status("warning", "Skipped Sheet Update: No URL provided in settings", 85)
-    
-    # 6. Send Email Report
-    email_sent = False
-    email_error = None
-    if report_email:
-        emit_status("sending_email", f"Sending report to {report_email}...", 90)
-        resend_key = os.environ.get("RESEND_API_KEY")
-        if resend_key:
-            # Build text summary of transitions
-            trans_summary_text = "\n".join(transition_list[:10]) # Limit to 10
-            if len(transition_list) > 10:
-                trans_summary_text += f"\n...and {len(transition_list)-10} more."
-
-            full_report_struct = {
-                "client_reports": [{
-                    "client_name": "Ad-Hoc Run",
-                    "client_tag": "All",
-                    "summary": {
-                        "total_accounts": len(accounts),
-                        "total_campaigns": len(campaigns),
-                        "accounts_with_issues": sum(1 for a in processed_accounts if "Sick" in str(a.get("status", ""))),
-                        "run_summary_text": trans_summary_text # Pass this to email template if supported
-                    },
-                    "campaigns_data": processed_campaigns
-                }]
-            }
-            try:
-                email_sent, email_error = send_email_report(resend_key, report_email, "InboxBench User", full_report_struct)
-            except Exception as e:
-                logging.error(f"Email Report Logic Error: {e}")
-                email_error = str(e)
-        else:
-             logging.warning("RESEND_API_KEY not found. Skipping email.")
-             email_error = "RESEND_API_KEY not found"
+def run_workspace_report(progress=None, stream=False, chunk_size=1000, lock_dir=DEFAULT_LOCK_DIR, lock_wait=None, **run_args):
+    """
+    run_adhoc_report (or run_streaming_report, with stream=True) under the
+    workspace's run lock (lib/run_lock.py), for the CLI, the worker daemon and
+    the batch runner. Only one run touches a workspace at a time; a caller
+    asking for a run identical to the one in flight follows that run's lines
+    and gets its result instead of starting a second one.
+
+    The deadline starts here, not once the lock is held: waiting behind another
+    run uses up the same budget (at most LOCK_WAIT_SHARE of it), as does
+    lock_wait (seconds). A run that can't get the workspace in time returns a
+    "busy" result (success False) instead of blocking.
+    """
+    progress = progress or ProgressEmitter()
+    run_args = dict(RUN_DEFAULTS, **run_args)
+    settings = dict(run_args, stream=stream, chunk_size=chunk_size if stream else None)
+    waits = [Deadline(lock_wait)] if lock_wait is not None else []
+    if run_args.get("deadline") and not stream:
+        budget = Deadline(run_args["deadline"])
+        run_args = dict(run_args, deadline=budget)
+        waits.append(budget.less(budget.seconds * (1 - LOCK_WAIT_SHARE)))
+    wait = min(waits, key=lambda d: d.end) if waits else None
+
+    def run():
+        if stream:
+            from execution.stream_report import run_streaming_report
+            if run_args.get("snapshot_dir"):
+                logging.warning("--snapshot_dir is ignored in --stream mode")
+            return run_streaming_report(progress=progress, chunk_size=chunk_size, **{k: run_args[k] for k in STREAM_ARGS if k in run_args})
+        return run_adhoc_report(progress=progress, **run_args)
+
+    return run_exclusive(run_args["api_key"], settings, progress, run, lock_dir, wait=wait)
+
+def _completeness(results, sheet_url, report_email):
+    """Per-part status of a finished run: complete | partial | queued | failed | failed_buckets | deferred | skipped."""
+    buckets = results.get("buckets") or {"failed": {}, "queued": 0}
+    sheet_result = results.get("sheet") or {}
+    email_result = results.get("email") or {}
+
+    def delivery(res, requested, done_key):
+        if not requested: return "skipped"
+        if res.get("deferred"): return "deferred"
+        return "complete" if res.get(done_key) else "failed"
 
-    emit_status("complete", "Workflow Complete!", 100)
-    
     return {
-        "success": True,
-        "accounts_count": len(accounts),
-        "campaigns_count": len(campaigns),
-        "sheet_updated": sheet_updated,
-        "sheet_error": sheet_error,
-        "email_sent": email_sent,
-        "run_summary": report_data["run_summary"] 
+        "campaign_stats": "partial" if (results.get("campaign_stats") or {}).get("missing") else "complete",
+        "buckets": "failed_buckets" if buckets["failed"] else "complete",
+        "mutations": "queued" if buckets["queued"] else "complete",
+        "sheet": delivery(sheet_result, sheet_url, "sheet_updated"),
+        "email": delivery(email_result, report_email, "email_sent"),
     }
 
 if __name__ == "__main__":
@@ -610,14 +570,43 @@ if __name__ == "__main__":
     parser.add_argument("--warmup_threshold", type=int, default=70, help="Min Warmup Score (Default 70)")
     parser.add_argument("--bench_percent", type=int, default=0, help="Target Bench %% (Default 0)")
     parser.add_argument("--ignore_customer_tags", action="store_true", help="Ignore (preserve) non-system tags")
+    parser.add_argument("--snapshot_dir", required=False, help="Record a daily account snapshot here (for simulate_engine.py)")
+    parser.add_argument("--policies", required=False, help='Per-customer-tag policies (JSON or file path): {"Client X": {"warmup_threshold": 85, "bench_percent": 30}}')
+    parser.add_argument("--resume", required=False, metavar="RUN_ID", help="Finish a crashed or partial run: re-fetches the workspace (about as long as a new run), then skips applied mutations and a finished sheet/email")
+    parser.add_argument("--journal_dir", required=False, help=f"Run journal directory (Default {DEFAULT_JOURNAL_DIR})")
+    parser.add_argument("--deadline", type=float, required=False, metavar="SECONDS", help="Time budget: degrade (partial analytics, queued mutations, deferred sheet/email) instead of overrunning")
+    parser.add_argument("--lock_wait", type=float, required=False, metavar="SECONDS", help="Give up (\"busy\" result) if another run holds the workspace this long (Default: wait; with --deadline, at most half of it)")
+    parser.add_argument("--stream_rows", action="store_true", help='Also emit the account table as batched "action"/"account_rows" lines while the run goes (see lib/progress.RowStream)')
+    parser.add_argument("--stream", action="store_true", help="Bounded-memory streaming mode for very large workspaces (execution/stream_report.py)")
+    parser.add_argument("--chunk_size", type=int, default=1000, help="Accounts per chunk in --stream mode (Default 1000)")
+    parser.add_argument("--no_daemon", action="store_true", help="Run in this process even if execution/worker_daemon.py is listening")
     args = parser.parse_args()
+    if args.stream and (args.resume or args.deadline):
+        parser.error("--resume/--deadline are not supported with --stream")
     
     try:
-        result = run_adhoc_report(args.key, args.sheet, args.report_email, args.warmup_threshold, args.bench_percent, args.ignore_customer_tags)
+        # Directories go over as absolute paths: the daemon's cwd isn't ours
+        absolute = lambda path: os.path.abspath(path) if path else path
+        run_args = {
+            "api_key": args.key, "sheet_url": args.sheet, "report_email": args.report_email,
+            "warmup_threshold": args.warmup_threshold, "bench_percent": args.bench_percent,
+            "ignore_customer_tags": args.ignore_customer_tags, "snapshot_dir": absolute(args.snapshot_dir),
+            "customer_policies": load_json_arg(args.policies) if args.policies else None,
+            "resume_run_id": args.resume, "journal_dir": absolute(args.journal_dir),
+            "deadline": args.deadline, "stream_rows": args.stream_rows,
+            "stream": args.stream, "chunk_size": args.chunk_size, "lock_wait": args.lock_wait,
+        }
+        if not args.no_daemon:
+            # Thin client: hand the run to the warm worker daemon if there is one
+            ok = run_via_daemon({"type": "run", "args": run_args})
+            if ok is not None:
+                sys.exit(0 if ok else 1)
+        result = run_workspace_report(progress=progress, **run_args)
         # Final output for the API to capture as the "Result"
-        print(json.dumps({"type": "result", "data": result}), flush=True)
+        progress.result(result)
     except Exception as e:
         # Catch-all for top-level script errors
-        error_json = {"type": "error", "message": f"Critical Script Crash: {str(e)}"}
-        print(json.dumps(error_json), flush=True)
+        progress.error(f"Critical Script Crash: {str(e)}")
         sys.exit(1)
+    finally:
+        progress.close()
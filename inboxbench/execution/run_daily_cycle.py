@@ -4,39 +4,79 @@ import logging
 from datetime import datetime
 import json
 import argparse
+from contextlib import nullcontext
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from lib.instantly_api import InstantlyAPI
 from execution.decision_engine import DecisionEngine
+from execution.workspace import fetch_workspace
+from execution.mutation_plan import build_plan, apply_plan, save_plan, load_plan
+from lib.run_journal import RunJournal, DEFAULT_JOURNAL_DIR
+from lib.run_lock import WorkspaceLock
 from execution.update_google_sheet import update_client_sheet, write_to_tab
 from execution.send_email_report import send_email_report
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_daily_cycle(api_key, sheet_url, report_email=None, dry_run=False):
-    logging.info(f"Starting Daily Cycle (Dry Run: {dry_run})")
+def _apply_journaled(api, plan, journal):
+    outcomes = apply_plan(api, plan, skip=journal.applied, on_batch=journal.record_mutation)
+    failed = [e for e, o in outcomes.items() if o["failed"]]
+    logging.info(f"Plan applied: {len(outcomes)} accounts, {len(failed)} with failures.")
+    journal.finish("failed" if failed else "ok")
+    journal.close()
+
+def run_daily_cycle(api_key, sheet_url, report_email=None, dry_run=False, plan_out=None, apply_plan_path=None,
+                    resume_run_id=None, journal_dir=None, apply=False):
+    """
+    Evaluates every account and turns the actions into a minimal mutation plan
+    (execution/mutation_plan.py). The plan is only printed (or saved with
+    plan_out) unless apply is set: tag writes stay off by default, as before.
+    dry_run: no writes at all (no tags, no sheet).
+    apply_plan_path: skip evaluation and apply a previously saved plan (with
+    dry_run: just load and print it).
+    resume_run_id: finish a crashed apply from its journal (lib/run_journal.py).
+    """
+    logging.info(f"Starting Daily Cycle (Dry Run: {dry_run}, Apply: {apply})")
     
     api = InstantlyAPI(api_key)
+
+    if dry_run and apply_plan_path:
+        plan = load_plan(apply_plan_path)
+        logging.info(f"Dry run: not applying saved plan {apply_plan_path} (created {plan.get('created_at')}, cost {plan['cost']})")
+        print(json.dumps(plan, indent=2))
+        return True
+
+    journal = None
+    if not dry_run and (apply or apply_plan_path or resume_run_id):
+        journal = RunJournal(resume_run_id, journal_dir or DEFAULT_JOURNAL_DIR, resume=bool(resume_run_id))
+        journal.start({"sheet_url": sheet_url, "apply_plan": apply_plan_path})
+        logging.info(f"Run ID: {journal.run_id} (resume with --resume {journal.run_id})")
+        if journal.plan is not None:
+            logging.info(f"Resuming from journaled plan ({len(journal.applied)} batches already applied)")
+            _apply_journaled(api, journal.plan, journal)
+            return True
+
+    if apply_plan_path:
+        plan = load_plan(apply_plan_path)
+        logging.info(f"Applying saved plan {apply_plan_path} (created {plan.get('created_at')}, cost {plan['cost']})")
+        journal.record_plan(plan)
+        _apply_journaled(api, plan, journal)
+        return True
+
     engine = DecisionEngine(api)
 
-    # 1. Fetch Data
+    # 1. Fetch Data (hydrated, so the plan diffs against the real current tags)
     logging.info("Fetching Accounts & Campaigns...")
-    accounts = api.list_accounts()
-    campaigns = api.list_campaigns()
-    tag_map = api.get_all_tags_map()
-
-    # Resolve tags for accounts beforehand
-    for acc in accounts:
-        # Map tag IDs to Names
-        t_ids = acc.get("tags", [])
-        acc["tags_resolved"] = [tag_map.get(tid, str(tid)) for tid in t_ids]
+    ws = fetch_workspace(api)
+    accounts = ws["accounts"]
+    tag_map = ws["tag_map"]
 
     # 2. Run Decision Engine
     logging.info(f"Analyzing {len(accounts)} accounts...")
-    actions_to_take = []
+    decisions = []
     
     for acc in accounts:
         # Deep fetch (Analytics) - Placeholder for now
@@ -44,43 +84,37 @@ def run_daily_cycle(api_key, sheet_url, report_email=None, dry_run=False):
         
         action = engine.evaluate_account(acc, analytics)
         if action:
-            actions_to_take.append(action)
+            decisions.append((acc, action))
+
+    # 3. Plan Actions (only real changes cost requests)
+    logging.info(f"Found {len(decisions)} actions to execute.")
+    plan = build_plan(decisions, tag_map)
+    logging.info(f"Mutation plan: {plan['stats']} | Estimated API calls: {plan['cost']['total']}")
+    if plan_out:
+        save_plan(plan, plan_out)
+        logging.info(f"Plan written to {plan_out}")
+
+    if journal is not None:
+        journal.record_plan(plan)
+        _apply_journaled(api, plan, journal)
+    else:
+        if not dry_run:
+            logging.info("Plan only; pass --apply to apply it (or --apply-plan a saved one)")
+        if dry_run or not plan_out:
+            print(json.dumps(plan, indent=2))
 
-    # 3. Execute Actions
-    logging.info(f"Found {len(actions_to_take)} actions to execute.")
     execution_log = [] # Log for the sheet
-    
-    for action in actions_to_take:
-        email = action['email']
-        reason = action['reason']
-        new_tag = action['new_tag']
-        
+    for acc, action in decisions:
         log_entry = [
             datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "Client? (Map later)", # Need client mapping
-            email,
+            acc.get("customer_tag", "Unknown Client"),
+            action['email'],
             "Unknown", # Previous Status
-            new_tag,
-            reason,
+            action['new_tag'],
+            action['reason'],
             "TODO", # Campaigns Removed
             "TODO"  # Campaigns Added
         ]
-        
-        if not dry_run:
-            # Update Tag
-            # 1. Resolve Tag Name to ID? Or create if missing?
-            # Assuming tags exist for now.
-            tag_id = api.get_tag_id_by_name(new_tag)
-            if tag_id:
-                # Remove OLD status tags? 
-                # Ideally we fetch current tags, filter out old status tags, add new one.
-                # For MVP: Just add pending robustness.
-                # Using simple add for now:
-                # api.add_account_tag(email, tag_id)
-                pass # Skip actual write for safety until verified
-            else:
-                 logging.warning(f"Tag {new_tag} not found in Instantly!")
-
         execution_log.append(log_entry)
 
     # 4. Prepare Report Data (Snapshot)
@@ -134,7 +168,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--key", required=True)
     parser.add_argument("--sheet", required=False)
-    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="No writes at all: print the mutation plan (or the --apply-plan plan) and skip the sheet")
+    parser.add_argument("--apply", action="store_true", help="Apply the mutation plan (Default: plan only)")
+    parser.add_argument("--plan-out", required=False, help="Save the mutation plan as JSON")
+    parser.add_argument("--apply-plan", required=False, help="Apply a saved plan (skips evaluation)")
+    parser.add_argument("--resume", required=False, metavar="RUN_ID", help="Finish a crashed run: re-apply only the mutations not yet journaled")
+    parser.add_argument("--journal_dir", required=False, help=f"Run journal directory (Default {DEFAULT_JOURNAL_DIR})")
     args = parser.parse_args()
+    if args.dry_run and (args.apply or args.resume):
+        parser.error("--apply/--resume write tags; they can't be combined with --dry-run")
     
-    run_daily_cycle(args.key, args.sheet, dry_run=args.dry_run)
+    # Never apply tag changes alongside another run on the same workspace (e.g. an ad-hoc run from the UI)
+    with nullcontext() if args.dry_run else WorkspaceLock(args.key):
+        run_daily_cycle(args.key, args.sheet, dry_run=args.dry_run, plan_out=args.plan_out, apply_plan_path=args.apply_plan,
+                        resume_run_id=args.resume, journal_dir=args.journal_dir, apply=args.apply)
@@ -0,0 +1,122 @@
+"""
+Read-only "what-if" sweep over warmup_threshold / bench_percent settings.
+
+Fetches the workspace once, then evaluates every (warmup_threshold, bench_percent)
+pair with the batch engine and reports how many accounts would land in each
+status. Nothing is written back to Instantly.
+
+Usage:
+    python3 run_threshold_sweep.py --key KEY --thresholds 60,70,80 --bench_percents 0,10,20
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.instantly_api import InstantlyAPI
+from lib.progress import ProgressEmitter
+from execution.workspace import fetch_workspace
+from execution.batch_engine import (
+    FleetArrays, NO_ACTION, STATUS_NAMES, evaluate_batch, resolve_status, plan_rotation_batch,
+)
+
+# Setup logging to STDERR so it doesn't interfere with STDOUT JSON stream
+logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(levelname)s: %(message)s')
+
+N_STATUS = len(STATUS_NAMES)
+STATUS_LABELS = ["Unlabeled"] + STATUS_NAMES[1:]
+
+progress = ProgressEmitter()
+
+def emit_status(step, message, percent):
+    """Emits a JSON status update to stdout (coalesced per step, see lib/progress.py)"""
+    progress.progress(step, message, percent)
+
+def sweep_thresholds(fleet, thresholds, bench_percents, now_ts=None, bucket_has_campaigns=None, ignore_customer_tags=True):
+    """
+    Evaluates every (threshold, bench_percent) pair against one fleet.
+    Thresholds are broadcast as a (k, 1) column, so each bench percent costs
+    one rotation plan plus one batch evaluation for all thresholds together.
+    """
+    now_ts = now_ts if now_ts is not None else datetime.now(timezone.utc).timestamp()
+    k = len(thresholds)
+    th_col = np.asarray(thresholds, dtype=np.float64)[:, None]
+    row_offsets = (np.arange(k) * N_STATUS)[:, None]
+    current = resolve_status(fleet.status_mask, fleet.score, th_col)
+
+    results = []
+    for bp in bench_percents:
+        force = plan_rotation_batch(fleet, bp, bucket_has_campaigns, ignore_customer_tags) if bp > 0 else None
+        new_status, _ = evaluate_batch(fleet, now_ts, th_col, force)
+        acted = new_status != NO_ACTION
+        final = np.where(acted, new_status, current)
+        # One bincount for all k rows: offset each row into its own block of N_STATUS bins
+        counts = np.bincount((final + row_offsets).ravel(), minlength=k * N_STATUS).reshape(k, N_STATUS)
+        changed = (final != current).sum(axis=1)
+        n_actions = acted.sum(axis=1)
+        n_forced = int(np.count_nonzero(force)) if force is not None else 0
+
+        for i, th in enumerate(thresholds):
+            results.append({
+                "warmup_threshold": th,
+                "bench_percent": bp,
+                "counts": {STATUS_LABELS[c]: int(counts[i, c]) for c in range(N_STATUS)},
+                "actions": int(n_actions[i]),
+                "status_changes": int(changed[i]),
+                "forced_rotations": n_forced,
+            })
+    return results
+
+def run_threshold_sweep(api_key, thresholds, bench_percents, ignore_customer_tags=True):
+    emit_status("init", "Starting Threshold Sweep...", 5)
+    try:
+        api = InstantlyAPI(api_key)
+        emit_status("fetch_accounts", "Fetching workspace snapshot from Instantly...", 10)
+        ws = fetch_workspace(api)
+    except Exception as e:
+        err_msg = f"API Fetch Failed: {e}"
+        logging.error(err_msg)
+        return {"success": False, "error": err_msg}
+
+    accounts = ws["accounts"]
+    emit_status("analyzing", f"Evaluating {len(thresholds) * len(bench_percents)} configs on {len(accounts)} accounts...", 60)
+
+    fleet = FleetArrays.from_accounts(accounts)
+    campaign_tags = {c["customer_tag"] for c in ws["campaigns"]}
+    has_campaigns = np.array([name in campaign_tags for name in fleet.bucket_names], dtype=bool)
+    configs = sweep_thresholds(fleet, thresholds, bench_percents,
+                               bucket_has_campaigns=has_campaigns, ignore_customer_tags=ignore_customer_tags)
+
+    emit_status("complete", "Sweep Complete!", 100)
+    return {
+        "success": True,
+        "accounts_count": len(accounts),
+        "campaigns_count": len(ws["campaigns"]),
+        "configs": configs,
+    }
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--key", required=True)
+    parser.add_argument("--thresholds", type=_int_list, default=[70], help="Comma-separated warmup thresholds, e.g. 60,70,80")
+    parser.add_argument("--bench_percents", type=_int_list, default=[0], help="Comma-separated bench percents, e.g. 0,10,20")
+    parser.add_argument("--ignore_customer_tags", action="store_true", help="Rotate the whole workspace as one bucket")
+    args = parser.parse_args()
+
+    try:
+        result = run_threshold_sweep(args.key, args.thresholds, args.bench_percents, args.ignore_customer_tags)
+        progress.result(result)
+    except Exception as e:
+        progress.error(f"Critical Script Crash: {str(e)}")
+        sys.exit(1)
+    finally:
+        progress.close()
@@ -1,7 +1,6 @@
 import sys
 import os
 import logging
-import resend
 from datetime import datetime
 
 # Add parent dir to path
@@ -61,6 +60,7 @@ def send_email_report(api_key, recipient_email, agency_name, full_report):
         logging.error(msg)
         return False, msg
         
+    import resend # ~30ms; only loaded when an email actually goes out
     resend.api_key = api_key
 
     body = format_email_body(full_report, agency_name)
@@ -82,6 +82,47 @@ def send_email_report(api_key, recipient_email, agency_name, full_report):
         logging.error(f"Failed to send email via Resend: {e}")
         return False, str(e)
 
+def send_adhoc_report_email(report_email, report, accounts_count, campaigns_count, accounts_with_issues, on_status=None):
+    """
+    Emails an ad-hoc run's report (run_adhoc_workflow.py) to report_email.
+    Returns {"email_sent": bool, "email_error": str | None}.
+    """
+    email_sent = False
+    email_error = None
+    if report_email:
+        if on_status: on_status("sending_email", f"Sending report to {report_email}...", 90)
+        resend_key = os.environ.get("RESEND_API_KEY")
+        if resend_key:
+            run_summary = report["run_summary"]
+            transition_list = run_summary["transitions"]
+            # Build text summary of transitions
+            trans_summary_text = "\n".join(transition_list[:10]) # Limit to 10
+            if run_summary["total_actions"] > 10:
+                trans_summary_text += f"\n...and {run_summary['total_actions']-10} more."
+
+            full_report_struct = {
+                "client_reports": [{
+                    "client_name": "Ad-Hoc Run",
+                    "client_tag": "All",
+                    "summary": {
+                        "total_accounts": accounts_count,
+                        "total_campaigns": campaigns_count,
+                        "accounts_with_issues": accounts_with_issues,
+                        "run_summary_text": trans_summary_text # Pass this to email template if supported
+                    },
+                    "campaigns_data": report["campaigns"]
+                }]
+            }
+            try:
+                email_sent, email_error = send_email_report(resend_key, report_email, "InboxBench User", full_report_struct)
+            except Exception as e:
+                logging.error(f"Email Report Logic Error: {e}")
+                email_error = str(e)
+        else:
+             logging.warning("RESEND_API_KEY not found. Skipping email.")
+             email_error = "RESEND_API_KEY not found"
+    return {"email_sent": email_sent, "email_error": email_error}
+
 if __name__ == "__main__":
     # Test execution
     config = load_config()
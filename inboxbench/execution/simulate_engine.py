@@ -0,0 +1,183 @@
+"""
+Backtest the DecisionEngine + rotation rules over recorded daily snapshots.
+
+Nothing here touches the Instantly API: each day's recorded warmup scores are
+replayed against an in-memory fleet whose status tags evolve only through the
+simulated decisions. Snapshots are written by run_adhoc_workflow.py --snapshot_dir.
+
+Usage:
+    python3 simulate_engine.py --snapshots data/snapshots --warmup_threshold 80 --bench_percent 20
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.snapshots import load_snapshots, snapshot_accounts
+from lib.utils import load_json_arg
+from execution.decision_engine import DecisionEngine, PolicyTable
+from execution.batch_engine import (
+    FleetArrays, NO_ACTION, STATUS_BENCHED, STATUS_NAMES, resolve_status, plan_rotation_batch,
+)
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(levelname)s: %(message)s')
+
+N_STATUS = len(STATUS_NAMES)
+STATUS_LABELS = ["Unlabeled"] + STATUS_NAMES[1:]
+
+class SimulatedClock:
+    """Drop-in for datetime.now that returns the simulated day instead of wall time."""
+    def __init__(self, now=None):
+        self.now = now
+
+    def set(self, now):
+        self.now = now
+
+    def __call__(self, tz=None):
+        if tz is None:
+            # Naive timestamps are compared in local time, like datetime.now()
+            return self.now.astimezone().replace(tzinfo=None)
+        return self.now.astimezone(tz)
+
+def _seed_fleet(snapshots):
+    """Union of accounts across all days. First appearance seeds tags, age and bucket."""
+    index = {}
+    seed_rows = []
+    for snap in snapshots:
+        cols = snap["accounts"]
+        new_rows = [i for i, email in enumerate(cols["email"]) if email not in index]
+        if not new_rows:
+            continue
+        for i in new_rows:
+            index[cols["email"][i]] = len(index)
+        # Only the seed rows get expanded into dicts
+        day_rows = snapshot_accounts({"accounts": {f: [col[i] for i in new_rows] for f, col in cols.items()}})
+        seed_rows.extend(day_rows)
+    return index, FleetArrays.from_accounts(seed_rows)
+
+def simulate(snapshots, config=None, ignore_customer_tags=True):
+    """
+    Replays snapshots day by day.
+    Returns {"days": [...per-day distribution/churn...], "summary": {...}}.
+    """
+    config = config or {}
+    policy = PolicyTable.compile(config)
+    bench_percent = policy.default.bench_percent
+
+    clock = SimulatedClock()
+    engine = DecisionEngine(None, config=config, clock=clock, policy=policy)
+
+    index, fleet = _seed_fleet(snapshots)
+    flips = np.zeros(len(fleet), dtype=np.int32)
+    # Day index each account was benched on; -1 = not benched or benched before the first snapshot
+    benched_on = np.full(len(fleet), -1, dtype=np.int32)
+    warmup_col, bench_col, _ = policy.bucket_columns(fleet.bucket_names)
+    # Effective-status thresholds per account (same lookup the engine does)
+    warmup_min = np.asarray(warmup_col, dtype=np.float64)[fleet.bucket_codes] if policy.by_tag else policy.default.warmup_threshold
+    rotation_percent = bench_percent if ignore_customer_tags else np.asarray(bench_col, dtype=np.float64)
+    days = []
+
+    for day_i, snap in enumerate(snapshots):
+        cols = snap["accounts"]
+        clock.set(datetime.fromisoformat(snap["recorded_at"]))
+        idx = np.fromiter(map(index.__getitem__, cols["email"]), dtype=np.int64, count=len(cols["email"]))
+
+        # Today's recorded scores, simulated tags. None -> NaN marks a missing score.
+        day = fleet.take(idx)
+        raw_scores = np.array(cols["stat_warmup_score"], dtype=np.float64)
+        day.has_score = ~np.isnan(raw_scores)
+        day.score = np.nan_to_num(raw_scores).astype(np.int32)
+        day_benched_on = benched_on[idx]
+        day.days_benched = np.where(day_benched_on >= 0, day_i - day_benched_on, -1).astype(np.int32)
+        day_warmup = warmup_min[idx] if np.ndim(warmup_min) else warmup_min
+
+        before = resolve_status(day.status_mask, day.score, day_warmup)
+
+        force = None
+        if policy.has_rotation():
+            campaign_tags = set(snap.get("campaign_tags", []))
+            has_campaigns = np.array([name in campaign_tags for name in fleet.bucket_names], dtype=bool)
+            force = plan_rotation_batch(day, rotation_percent, has_campaigns, ignore_customer_tags)
+
+        new_status, _ = engine.evaluate_batch(day, force)
+        acted = new_status != NO_ACTION
+
+        # An applied action leaves exactly one status tag on the account
+        new_mask = np.where(acted, np.left_shift(1, np.clip(new_status, 0, None)), day.status_mask).astype(np.uint8)
+        fleet.status_mask[idx] = new_mask
+        fleet.n_status[idx] = np.where(acted, 1, day.n_status)
+
+        after = resolve_status(new_mask, day.score, day_warmup)
+        changed = before != after
+        flips[idx[changed]] += 1
+        benched_on[idx] = np.where(after != STATUS_BENCHED, -1, np.where(before != STATUS_BENCHED, day_i, day_benched_on))
+
+        counts = np.bincount(after, minlength=N_STATUS)
+        moves = np.bincount(before[changed].astype(np.int64) * N_STATUS + after[changed], minlength=N_STATUS * N_STATUS)
+        transitions = {
+            f"{STATUS_LABELS[k // N_STATUS]}->{STATUS_LABELS[k % N_STATUS]}": int(moves[k])
+            for k in np.flatnonzero(moves)
+        }
+        days.append({
+            "date": snap["date"],
+            "accounts": len(idx),
+            "actions": int(acted.sum()),
+            "forced": int(np.count_nonzero(force)) if force is not None else 0,
+            "churn": int(changed.sum()),
+            "churn_rate": round(float(changed.mean()) if len(idx) else 0.0, 4),
+            "counts": {STATUS_LABELS[c]: int(counts[c]) for c in range(N_STATUS)},
+            "transitions": transitions,
+        })
+
+    summary = {
+        "days": len(days),
+        "accounts": len(fleet),
+        "total_actions": sum(d["actions"] for d in days),
+        "total_churn": sum(d["churn"] for d in days),
+        "mean_churn_rate": round(sum(d["churn_rate"] for d in days) / len(days), 4) if days else 0.0,
+        "accounts_flipped": int(np.count_nonzero(flips)),
+        "max_flips_per_account": int(flips.max()) if len(flips) else 0,
+        "config": {
+            "warmup_threshold": policy.default.warmup_threshold,
+            "bench_percent": bench_percent,
+            "bench_rest_days": policy.default.bench_rest_days,
+            "customer_policies": len(policy.by_tag),
+            "ignore_customer_tags": ignore_customer_tags,
+        },
+    }
+    return {"days": days, "summary": summary}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snapshots", required=True, help="Directory written by run_adhoc_workflow.py --snapshot_dir")
+    parser.add_argument("--days", type=int, default=None, help="Only replay the most recent N days")
+    parser.add_argument("--warmup_threshold", type=int, default=70, help="Min Warmup Score (Default 70)")
+    parser.add_argument("--bench_percent", type=int, default=0, help="Target Bench %% (Default 0)")
+    parser.add_argument("--bench_rest_days", type=int, default=None, help="Min days benched before Rule 6 returns an account (Default 7)")
+    parser.add_argument("--ignore_customer_tags", action="store_true", help="Rotate the whole workspace as one bucket")
+    parser.add_argument("--policies", required=False, help="Per-customer-tag policies: JSON object or path to a JSON file")
+    args = parser.parse_args()
+
+    snapshots = load_snapshots(args.snapshots, limit_days=args.days)
+    if not snapshots:
+        print(json.dumps({"type": "error", "message": f"No snapshots found in {args.snapshots}"}))
+        sys.exit(1)
+
+    config = {"warmup_threshold": args.warmup_threshold, "bench_percent": args.bench_percent}
+    if args.bench_rest_days is not None:
+        config["bench_rest_days"] = args.bench_rest_days
+    if args.policies:
+        config["customer_policies"] = load_json_arg(args.policies)
+
+    start = time.perf_counter()
+    result = simulate(snapshots, config, ignore_customer_tags=args.ignore_customer_tags)
+    result["summary"]["elapsed_sec"] = round(time.perf_counter() - start, 3)
+    print(json.dumps({"type": "result", "data": result}))
@@ -0,0 +1,286 @@
+import logging
+import resource
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from lib.instantly_api import shared_client
+from lib.pipeline import ChunkStream
+from lib.progress import ProgressEmitter, RowStream
+from lib.spill import SpillFile
+from execution.action_executor import ActionExecutor
+from execution.decision_engine import DecisionEngine, PolicyTable
+from execution.report_rows import (
+    campaign_entry, account_entry, primary_status, transition_key, transition_line,
+    account_stream_row, action_stream_row, ACCOUNT_ROW_COLUMNS, ACTION_COLUMNS, TRANSITIONS_KEPT,
+)
+from execution.rotation import RotationTally
+from execution.send_email_report import send_adhoc_report_email
+from execution.update_google_sheet import open_report_sheet, publish_report_sheet, account_sheet_row, APPEND_BATCH_ROWS
+from execution.workspace import (
+    fetch_tag_map, fetch_tag_mappings, apply_tag_mappings, resolve_hidden_tag_names, resolve_tags,
+    fetch_campaign_analytics, iter_account_chunks, hydrate_account_chunk,
+)
+
+CHUNK_SIZE = 1000       # accounts per chunk
+
+# Account fields the engine, the mutation plan and the report rows read; the rest of each list item is dropped
+ACCOUNT_FIELDS = ("id", "email", "timestamp_created", "stat_warmup_score", "status", "status_v2",
+                  "limit", "daily_limit", "warmup_status", "days_benched", "tags")
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def run_streaming_report(api_key, sheet_url, report_email=None, warmup_threshold=70, bench_percent=0,
+                         ignore_customer_tags=False, customer_policies=None, chunk_size=CHUNK_SIZE, progress=None,
+                         stream_rows=False):
+    """
+    run_adhoc_report for workspaces too big to hold in memory (--stream).
+
+    Accounts flow hydrate -> evaluate -> apply -> rows in chunks of
+    chunk_size, one thread per stage joined by bounded queues
+    (lib/pipeline.ChunkStream). Only trimmed accounts are kept, the run
+    summary is accumulated as chunks pass, and the Account Health / Action
+    Log rows are spilled to temp files and streamed into the sheet at the end,
+    so memory stays flat as the workspace grows.
+
+    Rotation needs every bucket's totals before the first account is
+    evaluated: with a bench percentage the hydrated chunks are spilled too,
+    a RotationTally (a few ints per Sending/Benched account) plans the
+    rotation, and the spill is streamed through the rest of the chain.
+
+    Not in this mode: snapshots/watch list, the run journal (--resume), the
+    per-status-tag hydration fallback and the full transitions list (first
+    TRANSITIONS_KEPT). Mutations are planned and applied per chunk.
+
+    A chunk whose tag mappings are still incomplete after one re-fetch is
+    untrusted: its accounts are evaluated and reported, but not changed.
+    They come back as "skipped" in the log rows and in stream.skipped_untrusted.
+
+    stream_rows: emit each chunk's decisions and account rows as "action" /
+    "account_rows" lines (lib/progress.RowStream) as it passes.
+    """
+    progress = progress or ProgressEmitter()
+    emit_status = progress.progress
+    emit_status("init", f"Starting Ad-Hoc Report Workflow (streaming, {chunk_size} accounts per chunk)...", 5)
+    api = shared_client(api_key)
+
+    engine_config = {
+        "warmup_threshold": warmup_threshold,
+        "bench_percent": bench_percent,
+        "customer_policies": customer_policies or {}
+    }
+    policy = PolicyTable.compile(engine_config)
+    engine = DecisionEngine(api, config=engine_config, policy=policy)
+
+    # --- CAMPAIGNS (small: held in full) ---
+    emit_status("fetch_campaigns", "Fetching campaigns from Instantly...", 10)
+    tag_map = fetch_tag_map(api)
+    tag_lock = threading.Lock()
+    campaigns = api.list_campaigns() or []
+    logging.info(f"Found {len(campaigns)} campaigns.")
+    camp_mappings, _ = fetch_tag_mappings(api, [], campaigns)
+    if camp_mappings:
+        apply_tag_mappings([], campaigns, camp_mappings)
+        resolve_hidden_tag_names(api, camp_mappings, tag_map)
+    resolve_tags(campaigns, tag_map)
+    formatted_date = datetime.now(ZoneInfo("US/Mountain")).strftime('%Y-%m-%d %H:%M')
+
+    # The sheet's overview and campaign sections go in before the accounts are through
+    snapshot = open_report_sheet(sheet_url, len(campaigns), {"client_name": "Ad-Hoc Run", "formatted_date": formatted_date},
+                                 share_email=report_email)
+
+    def campaign_stats():
+        totals = {"sent": 0, "replies": 0, "leads": 0}
+        rows = []
+        summaries = fetch_campaign_analytics(api, campaigns)
+        for camp in campaigns:
+            entry, stats = campaign_entry(camp, summaries.get(camp.get("id")))
+            for k in totals:
+                totals[k] += stats[k]
+            rows.append(entry)
+        if snapshot is not None and not snapshot.error:
+            snapshot.update_overview({"total_sent": totals["sent"], "total_leads": totals["leads"],
+                                      "total_replies": totals["replies"], "total_opportunities": 0})
+            snapshot.write_campaigns(rows)
+        return {"campaigns": rows, "totals": totals}
+
+    # Overlaps with the account stream
+    stats_pool = ThreadPoolExecutor(max_workers=1)
+    stats_future = stats_pool.submit(campaign_stats)
+
+    # --- ACCOUNT STREAM ---
+    agg = {
+        "accounts": 0, "actions": 0, "hydration_incomplete": 0, "accounts_with_issues": 0,
+        "counts": {"Sending": 0, "Sick": 0, "Warming": 0, "Benched": 0},
+        "transition_counts": {}, "transitions": [], "skipped_untrusted": [],
+    }
+    executor = ActionExecutor(api, {})
+    account_rows = SpillFile(prefix="inboxbench-accounts-") if sheet_url else None
+    action_rows = SpillFile(prefix="inboxbench-actions-") if sheet_url else None
+    hydrated = None
+    force_map = {}
+    untrusted = set()  # positions of accounts from chunks with incomplete tag mappings
+    action_stream = RowStream(progress, "action", ACTION_COLUMNS) if stream_rows else None
+    row_stream = RowStream(progress, "account_rows", ACCOUNT_ROW_COLUMNS) if stream_rows else None
+    timings = {}
+
+    def hydrate(item):
+        start, chunk = item
+        accounts = [{k: acc[k] for k in ACCOUNT_FIELDS if k in acc} for acc in chunk]
+        if not hydrate_account_chunk(api, accounts, tag_map, tag_lock):
+            agg["hydration_incomplete"] += len(accounts)
+            untrusted.update(range(start, start + len(accounts)))
+        return start, accounts
+
+    def tally(item):
+        start, accounts = item
+        for i, acc in enumerate(accounts):
+            rotation.add(start + i, acc)
+        hydrated.write(accounts)
+        emit_status("fetch_accounts", f"Hydrated {start + len(accounts)} accounts...", 20)
+
+    def evaluate(item):
+        start, accounts = item
+        decisions = []
+        for i, acc in enumerate(accounts):
+            analytics = api.get_account_analytics(acc.get("email"))
+            action = engine.evaluate_account(acc, analytics, force_status=force_map.get(start + i))
+            decisions.append((acc, action, start + i not in untrusted))
+            if action:
+                progress.count("actions")
+                if action_stream is not None: action_stream.add(action_stream_row(acc, action))
+        progress.count("accounts_evaluated", len(accounts))
+        emit_status("running_engine", f"Evaluated {start + len(accounts)} accounts...", 40)
+        return decisions
+
+    def apply(decisions):
+        # Untrusted accounts' tags may be missing, so their actions could undo or repeat real changes
+        outcomes = {action["email"]: {"email": action["email"], "removed": [], "added": [], "failed": [], "queued": [],
+                                      "skipped": "tag mappings incomplete", "warmup": None}
+                    for acc, action, trusted in decisions if action and not trusted}
+        to_apply = [(acc, action) for acc, action, trusted in decisions if action and trusted]
+        if to_apply:
+            with tag_lock:
+                executor.tag_map = dict(tag_map)
+            outcomes.update(executor.execute(to_apply))
+        return decisions, outcomes
+
+    def rows(item):
+        decisions, outcomes = item
+        sheet_rows, log_rows = [], []
+        for acc, action, trusted in decisions:
+            outcome = outcomes.get(action["email"]) if action else None
+            if action and not trusted:
+                agg["skipped_untrusted"].append(action["email"])
+            entry, log_row = account_entry(acc, action, outcome)
+            if row_stream is not None: row_stream.add(account_stream_row(entry, outcome))
+            agg["accounts"] += 1
+            primary = primary_status(entry)
+            if primary in agg["counts"]:
+                agg["counts"][primary] += 1
+            if "Sick" in str(entry.get("status", "")):
+                agg["accounts_with_issues"] += 1
+            if log_row:
+                agg["actions"] += 1
+                key = transition_key(log_row[4])
+                agg["transition_counts"][key] = agg["transition_counts"].get(key, 0) + 1
+                if len(agg["transitions"]) < TRANSITIONS_KEPT:
+                    agg["transitions"].append(transition_line(log_row))
+                log_rows.append(log_row)
+            sheet_rows.append(account_sheet_row(entry))
+        if account_rows is not None:
+            account_rows.write(sheet_rows)
+            action_rows.write(log_rows)
+        if row_stream is not None:
+            action_stream.flush()
+            row_stream.flush()
+
+    def run(stream, source):
+        stream.run(source)
+        for name, sec in stream.timings.items():
+            timings[name] = round(timings.get(name, 0) + sec, 3)
+        if stream.errors:
+            raise RuntimeError(f"Streaming stages failed: {stream.errors}")
+
+    try:
+        emit_status("fetch_accounts", "Streaming accounts from Instantly...", 15)
+        source = iter_account_chunks(api, chunk_size)
+        if policy.has_rotation():
+            rotation = RotationTally(ignore_customer_tags)
+            hydrated = SpillFile(prefix="inboxbench-hydrated-")
+            run(ChunkStream(on_event=progress.event).add("hydrate", hydrate).add("tally", tally), source)
+            force_map = rotation.plan(policy.default.bench_percent, [c["customer_tag"] for c in campaigns], policy=policy)
+            source = enumerate_chunks(hydrated.batches(chunk_size))
+            stream = ChunkStream(on_event=progress.event)
+        else:
+            stream = ChunkStream(on_event=progress.event).add("hydrate", hydrate)
+        stream.add("evaluate", evaluate).add("apply", apply).add("rows", rows)
+        run(stream, source)
+        if hydrated is not None:
+            hydrated.close()
+        emit_status("running_engine", f"Applied {agg['actions']} actions.", 75)
+
+        campaign_result = stats_future.result()
+        report_data = {
+            "client_name": "Ad-Hoc Run",
+            "formatted_date": formatted_date,
+            "total_sent": campaign_result["totals"]["sent"],
+            "total_leads": campaign_result["totals"]["leads"],
+            "total_replies": campaign_result["totals"]["replies"],
+            "total_opportunities": 0,
+            "campaigns": campaign_result["campaigns"],
+            "accounts_count": agg["accounts"],
+            "share_email": report_email,  # Pass for fallback sharing
+            "report_email": report_email,
+            "run_summary": {
+                "total_actions": agg["actions"],
+                "transitions": agg["transitions"],
+                "counts": agg["counts"],
+                "transition_counts": agg["transition_counts"],
+            },
+        }
+        if row_stream is not None:
+            report_data["run_summary"]["rows_streamed"] = row_stream.count
+
+        sheet_result = publish_report_sheet(
+            sheet_url, report_data,
+            action_batches=action_rows.batches(APPEND_BATCH_ROWS) if action_rows is not None else (),
+            account_rows=account_rows, on_status=emit_status, snapshot=snapshot)
+        email_result = send_adhoc_report_email(report_email, report_data, agg["accounts"], len(campaigns),
+                                               agg["accounts_with_issues"], on_status=emit_status)
+    finally:
+        stats_pool.shutdown(wait=False)
+        for spill in (hydrated, account_rows, action_rows):
+            if spill is not None:
+                spill.close()
+
+    if agg["hydration_incomplete"]:
+        emit_status("warning", f"Tag mappings incomplete for {agg['hydration_incomplete']} accounts; "
+                               f"{len(agg['skipped_untrusted'])} of their actions were skipped.", 95)
+    emit_status("complete", "Workflow Complete!", 100)
+
+    return {
+        "success": True,
+        "accounts_count": agg["accounts"],
+        "campaigns_count": len(campaigns),
+        "sheet_updated": sheet_result["sheet_updated"],
+        "sheet_error": sheet_result["sheet_error"],
+        "email_sent": email_result["email_sent"],
+        "run_summary": report_data["run_summary"],
+        "stage_timings": timings,
+        "stream": {
+            "chunk_size": chunk_size,
+            "hydration_incomplete": agg["hydration_incomplete"],
+            "skipped_untrusted": agg["skipped_untrusted"],
+            "peak_rss_mb": _peak_rss_mb(),
+        },
+    }
+
+def enumerate_chunks(batches):
+    """[accounts], ... -> (position of first account, [accounts]), ..."""
+    start = 0
+    for batch in batches:
+        yield start, batch
+        start += len(batch)
@@ -1,9 +1,9 @@
 import os
 import json
 import logging
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import threading
+# google-auth / googleapiclient (~100ms to import) are loaded on first use, so
+# runs without a sheet never pay for them; see build() and the HttpError imports.
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -14,7 +14,26 @@ SCOPES = [
 ]
 SERVICE_ACCOUNT_FILE = '../../credentials.json'
 
+_creds = None
+_creds_lock = threading.Lock()
+
 def get_credentials():
+    """
+    Service account credentials, loaded once per process (a long-lived worker
+    reuses them, and their access token, across runs). None if unavailable.
+    """
+    global _creds
+    with _creds_lock:
+        if _creds is None:
+            _creds = _load_credentials()
+        return _creds
+
+def build(service_name, version, credentials):
+    """googleapiclient.discovery.build, imported on first use."""
+    from googleapiclient.discovery import build as build_service
+    return build_service(service_name, version, credentials=credentials)
+
+def _load_credentials():
     """Locate and load service account credentials from env var or local file."""
     creds = None
     
@@ -22,6 +41,7 @@ def get_credentials():
     creds_json = os.environ.get("GOOGLE_CREDENTIALS_JSON")
     if creds_json:
         try:
+            from google.oauth2 import service_account
             creds_dict = json.loads(creds_json)
             creds = service_account.Credentials.from_service_account_info(
                 creds_dict, scopes=SCOPES)
@@ -41,6 +61,7 @@ def get_credentials():
 
         if os.path.exists(file_path):
             try:
+                from google.oauth2 import service_account
                 logging.info(f"Loading credentials from file: {file_path}")
                 creds = service_account.Credentials.from_service_account_file(
                     file_path, scopes=SCOPES)
@@ -66,198 +87,281 @@ def get_credentials():
         logging.warning(f"Impersonation setup failed (fallback to SA): {e}")
         return creds
 
-def update_client_sheet(client_data, spreadsheet_id):
+# Rows per write call when account rows are streamed from a spill file
+APPEND_BATCH_ROWS = 5000
+
+ACCOUNT_HEADER = ["Customer Tag", "Email", "Status", "Daily Limit", "Warmup Score", "Tags", "Change"]
+
+def account_sheet_row(acc):
+    """One Account Health row from a report account entry."""
+    return [
+        acc.get('customer_tag', '-'),
+        acc.get('email', 'Unknown'),
+        acc.get('status', 'Unknown'),
+        acc.get('daily_limit', 0),
+        f"{acc.get('warmup_score', 'N/A')}",
+        acc.get('tags', ''),
+        acc.get('change', '-')
+    ]
+
+# Daily Snapshot layout. Sections sit at fixed rows (the campaign block's size is
+# known once campaigns are listed), so each can be written as soon as it's ready.
+SNAPSHOT_TAB = "Daily Snapshot"
+OVERVIEW_ROW = 1          # overview (9 rows), blank, status summary (5 rows)
+CAMPAIGNS_ROW = 17        # "CAMPAIGN PERFORMANCE", header, one row per campaign
+PENDING = "..."           # overview value not in yet
+
+CAMPAIGN_HEADER = ["Customer Tag", "Campaign Name", "Status", "Sent", "Opens", "Replies", "Click Rate", "Reply Rate"]
+STATUS_ORDER = ("Sending", "Warming", "Sick", "Benched")
+
+def campaign_sheet_row(camp):
+    """One Campaign Performance row from a report campaign entry."""
+    return [
+        camp.get('customer_tag', '-'),
+        camp.get('name', 'Unknown'),
+        camp.get('status', 'Unknown'),
+        camp.get('sent', 0),
+        camp.get('opens', 0),
+        camp.get('replies', 0),
+        f"{camp.get('click_rate', 0)}",
+        f"{camp.get('reply_rate', 0)}"
+    ]
+
+def snapshot_overview(client_data):
+    """Overview / status summary values of a finished report."""
+    overview = {k: client_data.get(k, 0) for k in ("total_sent", "total_leads", "total_replies", "total_opportunities")}
+    overview.update(
+        client_name=client_data.get('client_name', 'N/A'),
+        formatted_date=client_data.get('formatted_date', 'N/A'),
+        accounts_count=client_data.get('accounts_count', len(client_data.get('accounts', []))),
+        counts=client_data.get('run_summary', {}).get('counts', {}),
+    )
+    return overview
+
+class SnapshotSheet:
     """
-    Updates the Google Sheet for a specific client.
-    
-    Args:
-        client_data (dict): The report data for a single client.
-        spreadsheet_id (str): The Google Sheet ID for this client.
+    The "Daily Snapshot" tab of one spreadsheet, written section by section:
+
+        A1                    overview + status summary   update_overview(...)
+        A17                   campaign performance        write_campaigns(...)
+        A(20 + campaigns)     account health              write_accounts(...)
+
+    open() clears the tab and lays out the titles/headers with "..." for
+    overview values that aren't in yet; each section then goes to its own
+    range whenever its data lands, in any order. update_overview() merges
+    what it's given, so concurrent writers don't undo each other.
+
+    Sheets errors are kept in self.error (later writes become no-ops) rather
+    than raised. A sheet we can't access is swapped for a new one on open()
+    (self.new_url).
     """
-    if not spreadsheet_id:
-        msg = f"No Google Sheet ID provided for client {client_data.get('client_name')}"
-        logging.warning(msg)
-        return False, msg
+    def __init__(self, spreadsheet_id, campaigns_count, share_email=None):
+        self.spreadsheet_id = spreadsheet_id
+        self.campaigns_count = campaigns_count
+        self.share_email = share_email
+        # campaign title + header + rows, blank, account title + header
+        self.accounts_row = CAMPAIGNS_ROW + 2 + campaigns_count + 3
+        self.service = None
+        self.tab = SNAPSHOT_TAB
+        self.overview = {}
+        self.written = set()
+        self.error = None
+        self.new_url = None
+        self.lock = threading.Lock()
 
-    creds = get_credentials()
-    if not creds:
-        return False, "Failed to load credentials"
+    def open(self, overview=None, _fallback=True):
+        """Clears the tab and writes the skeleton. Returns False if the sheet can't be written."""
+        from googleapiclient.errors import HttpError
+        self.overview.update(overview or {})
+        creds = get_credentials()
+        if not creds:
+            self.error = "Failed to load credentials"
+            return False
+        try:
+            self.service = build('sheets', 'v4', credentials=creds)
+            # Raises on a sheet we can't reach (fallback below)
+            self.service.spreadsheets().get(spreadsheetId=self.spreadsheet_id).execute()
 
-    try:
-        service = build('sheets', 'v4', credentials=creds)
-        
-        # dynamic tab name resolution
-        sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-        sheets = sheet_metadata.get('sheets', [])
-        
-        target_sheet_title = 'Sheet1' # Default fallback
-        if sheets:
-            # logic: look for 'Report', else use the first one
-            titles = [s['properties']['title'] for s in sheets]
-            if 'Report' in titles:
-                target_sheet_title = 'Report'
-            elif 'Sheet1' in titles:
-                target_sheet_title = 'Sheet1'
-            else:
-                target_sheet_title = titles[0] # Use the very first sheet if defaults mismatch
-        
-        logging.info(f"Targeting sheet tab: '{target_sheet_title}'")
-        
-        # 0. Ensure Sharing (If requested)
-        share_target = client_data.get('share_email') or client_data.get('report_email')
-        if share_target:
-             share_sheet(spreadsheet_id, share_target)
-
-        # Prepare data for the distinct tables
-        # 1. Overview
-        overview_data = [
+            # 0. Ensure Sharing (If requested)
+            if self.share_email:
+                share_sheet(self.spreadsheet_id, self.share_email)
+
+            self.tab = resolve_tab(self.service, self.spreadsheet_id, SNAPSHOT_TAB)
+            skeleton = self._overview_rows() + [[]]
+            skeleton.append(["CAMPAIGN PERFORMANCE"])
+            skeleton.append(CAMPAIGN_HEADER)
+            skeleton.extend([[]] * (self.campaigns_count + 1))
+            skeleton.append(["ACCOUNT HEALTH"])
+            skeleton.append(ACCOUNT_HEADER)
+            self.service.spreadsheets().values().clear(spreadsheetId=self.spreadsheet_id, range=f"'{self.tab}'").execute()
+            if not self._write(skeleton, OVERVIEW_ROW):
+                logging.warning(f"Failed to write to primary tab, error: {self.error}")
+                return False
+            logging.info(f"Opened {self.tab} ({self.campaigns_count} campaigns, accounts from row {self.accounts_row})")
+            return True
+
+        except HttpError as err:
+            error_reason = str(err)
+            # Check for 403 or 404
+            status_code = 0
+            if hasattr(err, 'resp') and hasattr(err.resp, 'status'):
+                 status_code = err.resp.status
+
+            if _fallback and (status_code in [403, 404] or "PERMISSION_DENIED" in error_reason):
+                logging.warning(f"Permission Error ({status_code}). Attempting fallback to NEW sheet...")
+                try:
+                    new_title = f"InboxBench Report - {self.overview.get('client_name')}"
+                    new_id, new_url = create_and_share_sheet(new_title, share_email=self.share_email)
+                    logging.info(f"Created NEW Sheet: {new_url}")
+                except Exception as e2:
+                    logging.error(f"Fallback failed: {e2}")
+                    self.error = f"Original: {error_reason} | Fallback: {str(e2)}"
+                    return False
+                self.spreadsheet_id = new_id
+                if self.open(_fallback=False):
+                    self.new_url = new_url
+                    return True
+                self.error = f"Fallback created {new_url} but write failed: {self.error}"
+                return False
+
+            logging.error(f"Google Sheets API Error: {err}")
+            self.error = str(err)
+            return False
+        except Exception as e:
+            logging.error(f"Unexpected error opening snapshot: {e}")
+            self.error = str(e)
+            return False
+
+    def _overview_rows(self):
+        o = self.overview
+        counts = o.get("counts")
+        return [
             ["Metric", "Value"],
-            ["Client Name", client_data.get('client_name', 'N/A')],
-            ["Date", client_data.get('formatted_date', 'N/A')],
-            ["Total Sent", client_data.get('total_sent', 0)],
-            ["Total Leads", client_data.get('total_leads', 0)],
-            ["Replies", client_data.get('total_replies', 0)],
-            ["Opportunities", client_data.get('total_opportunities', 0)],
-            ["Total Accounts", len(client_data.get('accounts', []))],
-            ["Total Campaigns", len(client_data.get('campaigns', []))],
-        ]
+            ["Client Name", o.get('client_name', 'N/A')],
+            ["Date", o.get('formatted_date', 'N/A')],
+            ["Total Sent", o.get('total_sent', PENDING)],
+            ["Total Leads", o.get('total_leads', PENDING)],
+            ["Replies", o.get('total_replies', PENDING)],
+            ["Opportunities", o.get('total_opportunities', PENDING)],
+            ["Total Accounts", o.get('accounts_count', PENDING)],
+            ["Total Campaigns", self.campaigns_count],
+            [],
+            ["STATUS SUMMARY", "Count"],
+        ] + [[status, counts.get(status, 0) if counts is not None else PENDING] for status in STATUS_ORDER]
 
-        # 2. Campaign Performance
-        campaign_header = ["Customer Tag", "Campaign Name", "Status", "Sent", "Opens", "Replies", "Click Rate", "Reply Rate"]
-        campaign_rows = []
-        for camp in client_data.get('campaigns', []):
-            campaign_rows.append([
-                camp.get('customer_tag', '-'),
-                camp.get('name', 'Unknown'),
-                camp.get('status', 'Unknown'),
-                camp.get('sent', 0),
-                camp.get('opens', 0),
-                camp.get('replies', 0),
-                f"{camp.get('click_rate', 0)}",
-                f"{camp.get('reply_rate', 0)}"
-            ])
-        
-        # 3. Account Health
-        account_header = ["Customer Tag", "Email", "Status", "Daily Limit", "Warmup Score", "Tags", "Change"]
-        account_rows = []
-        for acc in client_data.get('accounts', []):
-            account_rows.append([
-                acc.get('customer_tag', '-'),
-                acc.get('email', 'Unknown'),
-                acc.get('status', 'Unknown'),
-                acc.get('daily_limit', 0),
-                f"{acc.get('warmup_score', 'N/A')}",
-                acc.get('tags', ''),
-                acc.get('change', '-')
-            ])
-
-        # Prepare Data for Tabs
-        
-        # TAB 1: Daily Snapshot (Overview + Accounts)
-        # Combine overview and account list into one readable sheet?
-        # User requested specific tabs: "Daily Snapshot", "Action Log", "Client Summary", "Domain Health"
-        # For now, let's stick to the existing "Report" format for the main tab, but rename it "Daily Snapshot"
-        # and add logic to update other tabs if data is provided.
-        
-        # Status Summary Data
-        run_summary = client_data.get('run_summary', {})
-        counts = run_summary.get('counts', {})
-        status_summary_table = [
-             ["STATUS SUMMARY", "Count"],
-             ["Sending", counts.get("Sending", 0)],
-             ["Warming", counts.get("Warming", 0)],
-             ["Sick", counts.get("Sick", 0)],
-             ["Benched", counts.get("Benched", 0)]
-        ]
+    def _write(self, rows, start_row):
+        if self.error or self.service is None:
+            return False
+        try:
+            write_rows_at(self.service, self.spreadsheet_id, self.tab, rows, start_row)
+            return True
+        except Exception as e:
+            logging.error(f"Snapshot write at row {start_row} failed: {e}")
+            self.error = str(e)
+            return False
+
+    def update_overview(self, values):
+        """Merges values (client_data keys, plus "counts" for the status summary) and rewrites the top block."""
+        with self.lock:
+            self.overview.update(values)
+            if self._write(self._overview_rows(), OVERVIEW_ROW):
+                self.written.add("overview")
+
+    def write_campaigns(self, campaigns):
+        rows = [campaign_sheet_row(camp) for camp in campaigns]
+        if len(rows) > self.campaigns_count:
+            # Would run into the account block; only happens if campaigns changed since open()
+            logging.warning(f"Snapshot laid out for {self.campaigns_count} campaigns, got {len(rows)}; extra rows dropped")
+            rows = rows[:self.campaigns_count]
+        if not rows or self._write(rows, CAMPAIGNS_ROW + 2):
+            self.written.add("campaigns")
+            logging.info(f"Wrote {len(rows)} campaign rows to {self.tab}")
+
+    def write_accounts(self, batches):
+        """batches: lists of Account Health rows (account_sheet_row), written in order."""
+        next_row = self.accounts_row
+        for batch in batches:
+            if not batch:
+                continue
+            if not self._write(batch, next_row):
+                return
+            next_row += len(batch)
+        if not self.error:
+            self.written.add("accounts")
+            logging.info(f"Wrote {next_row - self.accounts_row} account rows to {self.tab}")
+
+    def finish(self, client_data, account_rows=None):
+        """
+        Writes whatever client_data has that isn't in the sheet yet, then cleans up.
+        account_rows: optional spill file of Account Health rows (execution/stream_report.py),
+        used instead of client_data['accounts']. Returns update_client_sheet's (ok, error | new URL).
+        """
+        if not self.error:
+            overview = snapshot_overview(client_data)
+            if any(self.overview.get(k) != v for k, v in overview.items()):
+                self.update_overview(overview)
+            if "campaigns" not in self.written:
+                self.write_campaigns(client_data.get('campaigns', []))
+            if "accounts" not in self.written:
+                if account_rows is not None:
+                    self.write_accounts(account_rows.batches(APPEND_BATCH_ROWS))
+                else:
+                    self.write_accounts([[account_sheet_row(acc) for acc in client_data.get('accounts', [])]])
+        if self.error:
+            return False, self.error
 
-        # Snapshot Data Construction
-        snapshot_values = []
-        snapshot_values.extend(overview_data)
-        snapshot_values.append([])
-        # Insert Status Summary
-        snapshot_values.extend(status_summary_table)
-        snapshot_values.append([])
-        
-        snapshot_values.append(["CAMPAIGN PERFORMANCE"])
-        snapshot_values.extend([campaign_header] + campaign_rows)
-        snapshot_values.append([])
-        snapshot_values.append(["ACCOUNT HEALTH"])
-        snapshot_values.extend([account_header] + account_rows)
-        
-        # Write Snapshot (Overwrite)
-        # Use the decided target sheet title if possible, or force "Daily Snapshot" BUT
-        # "Daily Snapshot" is what we prefer for the report.
-        # Let's try to write to "Daily Snapshot", but write_to_tab will now handle the fallback
-        # to the FIRST available sheet if Daily Snapshot fails to create.
-        
-        write_success, write_err = write_to_tab(service, spreadsheet_id, "Daily Snapshot", snapshot_values, mode="OVERWRITE")
-        
-        if not write_success:
-             logging.warning(f"Failed to write to primary tab, error: {write_err}")
-             # We could try one last ditch effort to "Sheet1" if the error wasn't permission related?
-             # But write_to_tab now has internal fallback.
-             return False, write_err
-             
         logging.info(f"Updated Snapshot for {client_data.get('client_name')}")
-        
-        # 3. Cleanup: Delete "Sheet1" (case insensitive, robust)
+        self.cleanup()
+        return True, self.new_url
+
+    def cleanup(self):
+        # Cleanup: Delete "Sheet1" (case insensitive, robust)
         try:
             # Refresh metadata to be sure
-            meta_clean = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+            meta_clean = self.service.spreadsheets().get(spreadsheetId=self.spreadsheet_id).execute()
             sheets_clean = meta_clean.get('sheets', [])
-            
+
             sheet_to_delete = None
             for s in sheets_clean:
                 title_clean = s['properties']['title'].lower().replace(" ", "")
                 if title_clean == "sheet1":
                     sheet_to_delete = s['properties']['sheetId']
                     break
-            
+
             if sheet_to_delete is not None and len(sheets_clean) > 1:
-                # Iterate again to ensure we don't delete the only sheet (double check)
-                if len(sheets_clean) > 1:
-                    req_del = {'deleteSheet': {'sheetId': sheet_to_delete}}
-                    service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={'requests': [req_del]}).execute()
-                    logging.info("Deleted default 'Sheet1' for cleanup.")
+                req_del = {'deleteSheet': {'sheetId': sheet_to_delete}}
+                self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id, body={'requests': [req_del]}).execute()
+                logging.info("Deleted default 'Sheet1' for cleanup.")
             elif sheet_to_delete is not None:
                 logging.info("Matched Sheet1 but it's the only sheet. Skipping delete.")
 
         except Exception as e:
             logging.warning(f"Cleanup of Sheet1 failed (non-critical): {e}")
 
-        return True, None
+def update_client_sheet(client_data, spreadsheet_id, account_rows=None):
+    """
+    Updates the Google Sheet for a specific client.
+    
+    Args:
+        client_data (dict): The report data for a single client.
+        spreadsheet_id (str): The Google Sheet ID for this client.
+        account_rows: Optional spill file of Account Health rows (execution/stream_report.py).
+            They're written below the snapshot, APPEND_BATCH_ROWS at a time, instead
+            of being built from client_data['accounts'].
 
-    except HttpError as err:
-        error_reason = str(err)
-        # Check for 403 or 404
-        status_code = 0
-        if hasattr(err, 'resp') and hasattr(err.resp, 'status'):
-             status_code = err.resp.status
-        
-        if status_code in [403, 404] or "PERMISSION_DENIED" in error_reason:
-            logging.warning(f"Permission Error ({status_code}). Attempting fallback to NEW sheet...")
-            try:
-                new_title = f"InboxBench Report - {client_data.get('client_name')}"
-                share_target = client_data.get('share_email') or client_data.get('report_email')
-                new_id, new_url = create_and_share_sheet(new_title, share_email=share_target)
-                logging.info(f"Created NEW Sheet: {new_url}")
-                
-                # Recursive retry with new ID
-                success, error = update_client_sheet(client_data, new_id)
-                
-                if success:
-                    return True, new_url
-                else:
-                    return False, f"Fallback created {new_url} but write failed: {error}"
-            except Exception as e2:
-                logging.error(f"Fallback failed: {e2}")
-                return False, f"Original: {error_reason} | Fallback: {str(e2)}"
+    Returns (success, error or the URL of a newly created sheet). For writing the
+    sections as they're ready instead, see SnapshotSheet.
+    """
+    if not spreadsheet_id:
+        msg = f"No Google Sheet ID provided for client {client_data.get('client_name')}"
+        logging.warning(msg)
+        return False, msg
 
-        logging.error(f"Google Sheets API Error: {err}")
-        return False, str(err)
-    except Exception as e:
-        logging.error(f"Unexpected error in update_client_sheet: {e}")
-        return False, str(e)
+    share_target = client_data.get('share_email') or client_data.get('report_email')
+    snapshot = SnapshotSheet(spreadsheet_id, len(client_data.get('campaigns', [])), share_email=share_target)
+    if not snapshot.open(snapshot_overview(client_data)):
+        return False, snapshot.error
+    return snapshot.finish(client_data, account_rows)
 
 def share_sheet(file_id, email):
     """Shares the file with the specified email (Writer access)."""
@@ -265,6 +369,7 @@ def share_sheet(file_id, email):
     
     creds = get_credentials()
     if not creds: return
+    from googleapiclient.errors import HttpError
 
     try:
         drive_service = build('drive', 'v3', credentials=creds)
@@ -303,14 +408,13 @@ def create_and_share_sheet(title, share_email=None):
 
     return sheet_id, sheet_url
 
-def write_to_tab(service, spreadsheet_id, tab_name, data, mode="OVERWRITE"):
+def resolve_tab(service, spreadsheet_id, tab_name):
     """
-    Helper to write data to a specific tab.
-    Creates the tab if it doesn't exist.
+    Returns the tab to write tab_name's data to, creating it if it doesn't exist
+    (falls back to the first tab if it can't be created).
     """
-    # 1. Determine Target Tab
     target_tab = tab_name
-    
+
     try:
         sheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
         sheets = sheet_metadata.get('sheets', [])
@@ -347,6 +451,16 @@ def write_to_tab(service, spreadsheet_id, tab_name, data, mode="OVERWRITE"):
         logging.error(f"Metadata fetch failed: {e}")
         # If we can't fetch metadata, we probably can't write either, but let's try writing to the requested tab blindly
         pass
+    return target_tab
+
+def write_to_tab(service, spreadsheet_id, tab_name, data, mode="OVERWRITE"):
+    """
+    Helper to write data to a specific tab.
+    Creates the tab if it doesn't exist.
+    """
+    from googleapiclient.errors import HttpError
+    # 1. Determine Target Tab
+    target_tab = resolve_tab(service, spreadsheet_id, tab_name)
 
     # 2. Write Data
     try:
@@ -374,6 +488,106 @@ def write_to_tab(service, spreadsheet_id, tab_name, data, mode="OVERWRITE"):
         logging.error(f"Unexpected error in write_to_tab: {e}")
         return False, str(e)
 
+def sheet_id_from_url(sheet_url):
+    if sheet_url and "/d/" in sheet_url:
+        return sheet_url.split("/d/")[1].split("/")[0]
+    return None
+
+def open_report_sheet(sheet_url, campaigns_count, overview=None, share_email=None):
+    """
+    Opens the Daily Snapshot of an ad-hoc report before its data is in, so
+    sections can be written as they land (SnapshotSheet); hand it to
+    publish_report_sheet to finish. None if there's no valid sheet URL.
+    """
+    sheet_id = sheet_id_from_url(sheet_url)
+    if not sheet_id:
+        return None
+    snapshot = SnapshotSheet(sheet_id, campaigns_count, share_email=share_email)
+    snapshot.open(overview)
+    return snapshot
+
+def publish_report_sheet(sheet_url, report, action_batches=(), account_rows=None, on_status=None, snapshot=None):
+    """
+    Writes an ad-hoc report to the sheet at sheet_url: the Daily Snapshot
+    (update_client_sheet) then the Action Log rows, appended batch by batch.
+    With a snapshot from open_report_sheet, only the sections it hasn't
+    written yet are filled in.
+    Returns {"sheet_updated": bool, "sheet_error": str | None}.
+    on_status(step, message, percent) gets the progress/warning lines.
+    """
+    emit_status = on_status or (lambda step, message, percent: None)
+    sheet_updated = False
+    sheet_error = None
+    if sheet_url:
+        emit_status("updating_sheet", "Writing data to Google Sheet...", 80)
+        try:
+            sheet_id = sheet_id_from_url(sheet_url)
+            if sheet_id:
+                logging.info(f"Updating Sheet ID: {sheet_id}")
+
+                # Update Snapshot (Main Report) + Summary Table?
+                # Ideally we append a summary table to the snapshot.
+                # For now let's keep Snapshot clean and just ensure Action Log is populated.
+                if snapshot is not None:
+                    sheet_updated, result_val = snapshot.finish(report, account_rows)
+                else:
+                    sheet_updated, result_val = update_client_sheet(report, sheet_id, account_rows)
+
+                # Check if fallback occurred (Success + URL returned)
+                if sheet_updated and result_val and "https" in str(result_val):
+                     # Parse new Sheet ID to ensure Action Log goes to the right place
+                     try:
+                         sheet_id = result_val.split("/d/")[1].split("/")[0]
+                         logging.info(f"Failed to write to original. Created NEW Sheet: {sheet_id}")
+                         emit_status("warning", f"Original sheet locked. Created NEW Sheet -> {result_val}", 82)
+                         # Store this to return in result so main result shows the switch
+                         sheet_error = f"Created NEW Sheet: {result_val}"
+                     except:
+                         logging.warning("Could not parse new ID")
+
+                elif not sheet_updated:
+                     sheet_error = result_val
+
+                # Update Action Log (Append)
+                if sheet_updated:
+                    service = None
+                    for batch in action_batches:
+                        if not batch:
+                            continue
+                        if service is None:
+                            # Re-instantiate service
+                            creds = get_credentials()
+                            if not creds:
+                                break
+                            service = build('sheets', 'v4', credentials=creds)
+                        logging.info(f"Appending {len(batch)} actions to log...")
+                        try:
+                            write_to_tab(service, sheet_id, "Action Log", batch, mode="APPEND")
+                        except Exception as e:
+                            logging.warning(f"Failed to append logs: {e}")
+
+                if not sheet_updated:
+                    if not sheet_error: sheet_error = "Unknown writing error"
+                    emit_status("warning", f"Sheet Update Failed: {sheet_error}", 85)
+            else:
+                logging.warning("Invalid Sheet URL format.")
+                sheet_error = "Invalid Sheet URL format"
+                emit_status("warning", "Skipped Sheet Update: Invalid URL format", 85)
+        except Exception as e:
+            logging.error(f"Sheet Update Error: {e}")
+            sheet_error = str(e)
+    else:
+        logging.warning("No Sheet URL provided.")
+        emit_status("warning", "Skipped Sheet Update: No URL provided in settings", 85)
+    return {"sheet_updated": sheet_updated, "sheet_error": sheet_error}
+
+def write_rows_at(service, spreadsheet_id, tab_name, rows, start_row):
+    """Writes rows starting at column A of start_row (1-based); the tab must exist."""
+    service.spreadsheets().values().update(
+        spreadsheetId=spreadsheet_id, range=f"'{tab_name}'!A{start_row}",
+        valueInputOption='RAW', body={'values': rows}
+    ).execute()
+
 if __name__ == "__main__":
     # Test with dummy data and config
     config_path = os.path.join(os.path.dirname(__file__), '../config/config.json')
@@ -0,0 +1,53 @@
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# Where execution/worker_daemon.py listens (route.ts uses the same default)
+SOCKET_PATH = os.environ.get("INBOXBENCH_WORKER_SOCKET") or os.path.join(tempfile.gettempdir(), "inboxbench-worker.sock")
+
+# Stdlib only: the CLI checks for the daemon before loading anything heavy.
+
+def connect(path=SOCKET_PATH):
+    """A connected socket to the worker daemon, or None if it isn't running."""
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+def run_via_daemon(request, out=None, path=SOCKET_PATH):
+    """
+    Sends one request ({"type": "run", "args": {...}}) and copies the reply's
+    NDJSON lines to out (stdout) as they arrive.
+    Returns None if no daemon is listening (run locally instead), else True
+    if the run ended with a result and False if it ended with an error.
+    """
+    out = out or sys.stdout
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock:
+        sock.sendall((json.dumps(request) + "\n").encode())
+        ended = None
+        with sock.makefile("r") as replies:
+            for line in replies:
+                out.write(line)
+                out.flush()
+                try:
+                    kind = json.loads(line).get("type")
+                except ValueError:
+                    continue
+                if kind in ("result", "error"):
+                    ended = kind
+    if ended is None:
+        # Never fall back to a local run here: the daemon may have applied part of it
+        out.write(json.dumps({"type": "error", "message": "Worker daemon connection lost before the run finished"}) + "\n")
+        out.flush()
+        return False
+    return ended == "result"
@@ -0,0 +1,153 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.progress import ProgressEmitter
+from execution.worker_client import SOCKET_PATH, connect
+from execution.run_adhoc_workflow import run_workspace_report
+# The entry points load these on first use to start fast; the daemon pays for them once, up front
+import lib.instantly_api
+import execution.stream_report
+import execution.decision_engine
+import execution.anomaly_scan
+import googleapiclient.discovery
+import google.oauth2.service_account
+import resend
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Runs at once; further requests wait for a slot
+MAX_RUNS = 4
+
+class ClientStream:
+    """
+    File-like socket writer for a run's ProgressEmitter. If the client hangs
+    up (browser closed), the run carries on to the end unobserved rather than
+    dying halfway through its tag updates.
+    """
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.gone = False
+
+    def write(self, data):
+        if self.gone:
+            return
+        try:
+            self.wfile.write(data.encode())
+        except OSError:
+            self.gone = True
+            logging.warning("Client disconnected; run continues")
+
+    def flush(self):
+        if self.gone:
+            return
+        try:
+            self.wfile.flush()
+        except OSError:
+            self.gone = True
+
+class RunHandler(socketserver.StreamRequestHandler):
+    """
+    One request per connection, as a JSON line:
+        {"type": "run", "args": {run_workspace_report keyword args}}
+        {"type": "ping"}
+    The reply is the same NDJSON the CLI prints (progress/stage/.../result or
+    error), then the connection is closed.
+    """
+    def handle(self):
+        progress = ProgressEmitter(stream=ClientStream(self.wfile))
+        try:
+            request = json.loads(self.rfile.readline() or "null")
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            progress.error(f"Bad request: {e}")
+            progress.close()
+            return
+
+        server = self.server
+        if request.get("type") == "ping":
+            progress.event({"type": "pong", "pid": os.getpid(), "uptime": round(time.monotonic() - server.started, 1),
+                            "runs": server.runs, "active": server.active})
+            progress.close()
+            return
+        if request.get("type") != "run":
+            progress.error(f"Unknown request type: {request.get('type')}")
+            progress.close()
+            return
+
+        if not server.slots.acquire(blocking=False):
+            progress.progress("queued", "Waiting for a free worker...", 0)
+            server.slots.acquire()
+        with server.lock:
+            server.runs += 1
+            server.active += 1
+        try:
+            # Workspace lock + joining identical runs, as for a CLI run
+            progress.result(run_workspace_report(progress=progress, **(request.get("args") or {})))
+        except Exception as e:
+            logging.error(f"Run failed: {e}")
+            progress.error(f"Critical Script Crash: {str(e)}")
+        finally:
+            with server.lock:
+                server.active -= 1
+            server.slots.release()
+            progress.close()
+
+class WorkerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived worker for the UI's runs: modules, Google credentials and each
+    workspace's HTTP pool (lib/instantly_api.shared_client) stay warm between
+    requests. Each connection gets its own thread and ProgressEmitter.
+    """
+    daemon_threads = True
+
+    def __init__(self, path=SOCKET_PATH, max_runs=MAX_RUNS):
+        if os.path.exists(path):
+            sock = connect(path)
+            if sock is not None:
+                sock.close()
+                raise RuntimeError(f"A worker daemon is already listening on {path}")
+            os.unlink(path) # Stale socket from a daemon that died
+        super().__init__(path, RunHandler)
+        os.chmod(path, 0o600) # Requests carry API keys
+        self.path = path
+        self.slots = threading.BoundedSemaphore(max_runs)
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.runs = 0
+        self.active = 0
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve ad-hoc runs over a Unix socket (see execution/worker_client.py)")
+    parser.add_argument("--socket", default=SOCKET_PATH, help=f"Socket path (Default {SOCKET_PATH}, or INBOXBENCH_WORKER_SOCKET)")
+    parser.add_argument("--max_runs", type=int, default=MAX_RUNS, help=f"Runs at once (Default {MAX_RUNS})")
+    args = parser.parse_args()
+
+    server = WorkerDaemon(args.socket, args.max_runs)
+    # shutdown() blocks until serve_forever returns, so it can't run on the serving thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logging.info(f"Worker daemon listening on {args.socket} (pid {os.getpid()}, {args.max_runs} runs at once)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info("Worker daemon stopped")
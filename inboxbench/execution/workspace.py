@@ -0,0 +1,267 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from execution.rotation import get_customer_tag
+
+def fetch_accounts_and_campaigns(api):
+    """Lists every account and campaign in the workspace."""
+    accounts_data = api.list_accounts()
+    accounts = accounts_data.get("items", []) if isinstance(accounts_data, dict) else accounts_data
+    if not accounts: accounts = []
+    logging.info(f"Found {len(accounts)} accounts.")
+
+    campaigns_data = api.list_campaigns()
+    campaigns = campaigns_data.get("items", []) if isinstance(campaigns_data, dict) else campaigns_data
+    if not campaigns: campaigns = []
+    logging.info(f"Found {len(campaigns)} campaigns.")
+    return accounts, campaigns
+
+RELEVANT_STATUS_TAGS = ["Sending", "Sick", "Warming", "Benched", "Active", "Dead"]
+
+def fetch_tag_map(api):
+    """Tag ID -> name for every tag /custom-tags lists (hidden tags are resolved later)."""
+    try:
+        return api.get_all_tags_map()
+    except Exception as e:
+        logging.warning(f"Failed to fetch tag map: {e}")
+        return {}
+
+def fetch_tag_mappings(api, accounts, campaigns):
+    """
+    Tag associations for every campaign (by ID) and account (by email), in one pass.
+    Returns (mappings, complete); mappings is None if the fetch failed outright.
+    """
+    logging.info("Fetching hidden tag mappings for resources...")
+    try:
+        r_ids = [c.get("id") for c in campaigns if c.get("id")]
+        r_ids.extend(a.get("email") for a in accounts if a.get("email"))
+        mappings, complete = api.get_custom_tag_mappings_checked(r_ids)
+        logging.info(f"Found {len(mappings)} hidden tag associations.")
+        return mappings, complete
+    except Exception as e:
+        logging.warning(f"Failed to fetch hidden mappings: {e}")
+        return None, False
+
+def _tag_index(resources, key):
+    """key -> (resource, set of its tag IDs). Resources without 'tags' get an empty list."""
+    index = {}
+    for res in resources:
+        k = res.get(key)
+        if k:
+            res["tags"] = res.get("tags") or []
+            index[k] = (res, set(res["tags"]))
+    return index
+
+def _merge_tags(index, pairs):
+    """Appends each (key, tag_id) the resource doesn't have yet, keeping first-seen order."""
+    for k, tid in pairs:
+        entry = index.get(k)
+        if entry is None or not tid:
+            continue
+        res, have = entry
+        if tid not in have:
+            have.add(tid)
+            res["tags"].append(tid)
+
+def apply_tag_mappings(accounts, campaigns, mappings):
+    """Merges mapped tag IDs into each campaign/account 'tags' list."""
+    # A resource_id is a campaign ID or an account email; campaigns win on the (unlikely) clash
+    index = _tag_index(accounts, "email")
+    index.update(_tag_index(campaigns, "id"))
+    _merge_tags(index, ((m.get("resource_id"), m.get("tag_id")) for m in mappings))
+
+def resolve_hidden_tag_names(api, mappings, tag_map):
+    """
+    The hidden tags from the mappings are likely NOT in tag_map since /custom-tags list hides them.
+    We must fetch their names explicitly so they don't show as UUIDs or get ignored.
+    """
+    unique_mapping_tags = set(m.get("tag_id") for m in mappings if m.get("tag_id"))
+    missing_tag_ids = unique_mapping_tags - tag_map.keys()
+
+    logging.info(f"Resolving {len(missing_tag_ids)} hidden tag names...")
+    for tid in missing_tag_ids:
+        try:
+            # Direct fetch for hidden tag
+            tag_details = api._get(f"/custom-tags/{tid}")
+            if tag_details and "label" in tag_details:
+                tag_map[tid] = tag_details["label"]
+                logging.info(f"Resolved hidden tag {tid} -> {tag_details['label']}")
+            else:
+                logging.warning(f"Could not resolve name for tag {tid}")
+                tag_map[tid] = str(tid) # Fallback to UUID
+        except Exception as e:
+            logging.warning(f"Error fetching tag {tid}: {e}")
+
+def status_tag_ids(tag_map):
+    """{status tag name: tag ID} via a reverse lookup on the tag map (no extra API calls)."""
+    wanted = set(RELEVANT_STATUS_TAGS)
+    return {name: tid for tid, name in tag_map.items() if name in wanted}
+
+def mappings_incomplete(visible, mappings, complete, status_ids):
+    """
+    Returns a reason string if the mapping pass can't be trusted for status
+    tags, else None. visible is the {(email, tag_id)} set list_accounts
+    returned, which is a subset of the truth: any status pair missing from
+    the mappings means the mappings are short.
+    """
+    if mappings is None:
+        return "mapping fetch failed"
+    if not complete:
+        return "a mapping page failed"
+    status_set = set(status_ids.values())
+    mapped = {(m.get("resource_id"), m.get("tag_id")) for m in mappings}
+    missing = {pair for pair in visible if pair[1] in status_set} - mapped
+    if missing:
+        return f"{len(missing)} visible status tags missing from mappings"
+    return None
+
+def fetch_status_members(api, status_ids):
+    """
+    Fallback: lists the accounts carrying each status tag.
+    Returns [(tag_id, [emails]), ...].
+    """
+    members = []
+    for t_name in RELEVANT_STATUS_TAGS:
+        t_id = status_ids.get(t_name)
+        if t_id:
+            tagged_accs_data = api.list_accounts(tag_ids=[t_id])
+            if isinstance(tagged_accs_data, list):
+                members.append((t_id, [t_acc.get("email") for t_acc in tagged_accs_data]))
+    return members
+
+def apply_status_members(accounts, members):
+    """Adds each status tag ID to the accounts listed under it."""
+    index = _tag_index(accounts, "email")
+    for t_id, emails in members:
+        _merge_tags(index, ((email, t_id) for email in emails))
+
+def hydrate_from_mappings(api, accounts, campaigns, tag_map, mappings, complete):
+    """
+    Applies one mapping pass to accounts/campaigns and resolves hidden tag names.
+    Per-status-tag listings only run if the mappings look incomplete.
+    """
+    visible = {(a.get("email"), tid) for a in accounts for tid in a.get("tags", [])}
+    if mappings is not None:
+        apply_tag_mappings(accounts, campaigns, mappings)
+        resolve_hidden_tag_names(api, mappings, tag_map)
+
+    status_ids = status_tag_ids(tag_map)
+    reason = mappings_incomplete(visible, mappings, complete, status_ids)
+    if reason:
+        logging.warning(f"Tag mappings look incomplete ({reason}). Falling back to per-status-tag listings.")
+        apply_status_members(accounts, fetch_status_members(api, status_ids))
+
+def iter_account_chunks(api, chunk_size):
+    """Streams the account listing as (position of first account, [accounts]) chunks."""
+    chunk = []
+    start = 0
+    for page in api.iter_pages("/accounts"):
+        chunk.extend(page)
+        if len(chunk) >= chunk_size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+def hydrate_account_chunk(api, accounts, tag_map, tag_lock=None, retries=1):
+    """
+    hydrate_from_mappings for one chunk of a streamed account listing. The
+    per-status-tag fallback lists the whole workspace, so a chunk whose
+    mappings look incomplete is re-fetched instead. tag_lock guards tag_map
+    if other threads read it. Returns True if the mappings checked out.
+    """
+    tag_lock = tag_lock or threading.Lock()
+    visible = {(a.get("email"), tid) for a in accounts for tid in a.get("tags") or []}
+    emails = [a.get("email") for a in accounts if a.get("email")]
+    for attempt in range(retries + 1):
+        mappings, complete = api.get_custom_tag_mappings_checked(emails)
+        apply_tag_mappings(accounts, [], mappings)
+        with tag_lock:
+            resolve_hidden_tag_names(api, mappings, tag_map)
+            status_ids = status_tag_ids(tag_map)
+        reason = mappings_incomplete(visible, mappings, complete, status_ids)
+        if not reason:
+            break
+        logging.warning(f"Tag mappings for {len(emails)} accounts look incomplete ({reason}).{' Retrying.' if attempt < retries else ''}")
+    with tag_lock:
+        resolve_tags(accounts, tag_map)
+    return reason is None
+
+def hydrate_tags(api, accounts, campaigns):
+    """
+    Fills in each account/campaign 'tags' (tag IDs), including the hidden tags
+    V2 list endpoints omit. Returns the tag ID -> name map.
+    """
+    all_tag_map = fetch_tag_map(api)
+    mappings, complete = fetch_tag_mappings(api, accounts, campaigns)
+    hydrate_from_mappings(api, accounts, campaigns, all_tag_map, mappings, complete)
+    return all_tag_map
+
+def resolve_tags(resources, tag_map):
+    """Sets 'tags_resolved' (names) and 'customer_tag' on accounts or campaigns."""
+    for res in resources:
+        res["tags_resolved"] = [tag_map.get(tid, str(tid)) for tid in res.get("tags", [])]
+        res["customer_tag"] = get_customer_tag(res["tags_resolved"])
+
+ANALYTICS_WORKERS = 8
+
+_OUT_OF_TIME = object()
+
+def fetch_campaign_analytics(api, campaigns, on_progress=None, max_workers=ANALYTICS_WORKERS, deadline=None):
+    """
+    Analytics for every campaign: {campaign_id: summary}.
+    Uses the shared /campaigns/analytics listing (one call for the whole
+    workspace); campaigns missing from it simply have no stats yet. Only if that
+    listing isn't usable are campaigns fetched one by one, concurrently, under
+    the client's rate limiter. on_progress(done, total) is called as they land.
+    With a Deadline (lib/deadline.py), per-campaign fetches stop once it has
+    expired and those campaigns are left out of the result.
+    """
+    ids = [c.get("id") for c in campaigns if c.get("id")]
+    total = len(ids)
+    try:
+        shared = api.get_all_campaign_analytics()
+    except Exception as e:
+        logging.warning(f"Shared campaign analytics failed: {e}")
+        shared = None
+
+    if shared is not None:
+        if on_progress: on_progress(total, total)
+        return {cid: shared.get(cid, {}) for cid in ids}
+
+    def fetch(cid):
+        if deadline is not None and deadline.expired():
+            return _OUT_OF_TIME
+        return api.get_campaign_summary(cid)
+
+    summaries = {}
+    logging.info(f"Shared analytics unavailable. Fetching {total} campaigns individually...")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch, cid): cid for cid in ids}
+        for future in as_completed(futures):
+            cid = futures[future]
+            try:
+                summary = future.result()
+                if summary is _OUT_OF_TIME:
+                    continue
+                summaries[cid] = summary or {}
+            except Exception as e:
+                logging.warning(f"Failed to fetch stats for campaign {cid}: {e}")
+                summaries[cid] = {}
+            if on_progress: on_progress(len(summaries), total)
+    if len(summaries) < total:
+        logging.warning(f"Out of time: analytics fetched for {len(summaries)}/{total} campaigns")
+    return summaries
+
+def fetch_workspace(api):
+    """
+    Fetch + hydrate + resolve in one call.
+    Returns {"accounts": [...], "campaigns": [...], "tag_map": {...}}.
+    """
+    accounts, campaigns = fetch_accounts_and_campaigns(api)
+    tag_map = hydrate_tags(api, accounts, campaigns)
+    resolve_tags(accounts, tag_map)
+    resolve_tags(campaigns, tag_map)
+    return {"accounts": accounts, "campaigns": campaigns, "tag_map": tag_map}
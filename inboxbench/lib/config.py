@@ -0,0 +1,177 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# config.json of this checkout, wherever the process was started from
+DEFAULT_CONFIG_PATH = os.environ.get("INBOXBENCH_CONFIG") or os.path.join(ROOT, "config", "config.json")
+
+RELOAD_CHECK_SECONDS = 2 # how often a cached config stats its file for changes
+
+OPTIONAL_KEYS = ("instantly_api_key", "resend_api_key", "agency_name", "reporting_email", "slack_webhook_url")
+PROFILE_KEYS = ("client_name", "google_sheet_id", "instantly_api_key")
+
+class ConfigError(ValueError):
+    """config.json is missing, not JSON, or doesn't validate."""
+
+def resolve_config_path(config_path=None):
+    """Absolute path of a config: as given if absolute, else the cwd's if it exists there, else the checkout's."""
+    if not config_path:
+        return DEFAULT_CONFIG_PATH
+    if os.path.isabs(config_path) or os.path.exists(config_path):
+        return os.path.abspath(config_path)
+    return os.path.join(ROOT, config_path)
+
+def _check_str(value, where):
+    if value is not None and not isinstance(value, str):
+        raise ConfigError(f"{where} must be a string")
+
+class ClientProfile:
+    """One entry of client_profiles."""
+    def __init__(self, data, where="client profile"):
+        if not isinstance(data, dict):
+            raise ConfigError(f"{where} must be an object")
+        if not isinstance(data.get("tag_name"), str) or not data["tag_name"].strip():
+            raise ConfigError(f"{where} has no tag_name")
+        for key in PROFILE_KEYS:
+            _check_str(data.get(key), f"{where}.{key}")
+        self.data = data
+        self.tag_name = data["tag_name"]
+        self.client_name = data.get("client_name") or self.tag_name
+        self.google_sheet_id = data.get("google_sheet_id")
+        self.instantly_api_key = data.get("instantly_api_key")
+
+    def to_dict(self):
+        return copy.deepcopy(self.data)
+
+class Config:
+    """
+    A validated config.json. Keys are attributes (None when absent); get() and
+    to_dict() keep the plain-dict view the scripts have always used.
+    """
+    def __init__(self, data, path=None):
+        if not isinstance(data, dict):
+            raise ConfigError(f"{path or 'config'} must be a JSON object")
+        self.data = data
+        self.path = path
+        for key in OPTIONAL_KEYS:
+            _check_str(data.get(key), key)
+            setattr(self, key, data.get(key))
+        raw_profiles = data.get("client_profiles") or []
+        if not isinstance(raw_profiles, list):
+            raise ConfigError("client_profiles must be a list")
+        self.profiles = [ClientProfile(p, f"client_profiles[{i}]") for i, p in enumerate(raw_profiles)]
+        # tag_name -> profile; tags identify a client, so they must be unique
+        self.profiles_by_tag = {}
+        for profile in self.profiles:
+            if profile.tag_name in self.profiles_by_tag:
+                raise ConfigError(f"Duplicate tag_name in client_profiles: {profile.tag_name}")
+            self.profiles_by_tag[profile.tag_name] = profile
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise ConfigError(f"Config file not found at {path}")
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"Error decoding JSON from {path}: {e}")
+        return cls(data, path)
+
+    def profile(self, tag_name):
+        """The client profile for a tag, or None."""
+        return self.profiles_by_tag.get(tag_name)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def to_dict(self):
+        """A copy of the raw JSON (safe to change, e.g. to write it back)."""
+        return copy.deepcopy(self.data)
+
+class ConfigService:
+    """
+    One config file, parsed once and cached. get() stats the file at most every
+    check_interval seconds and reloads it if its mtime or size changed, so
+    long-running processes (worker daemon, scheduler, queue consumers) pick up
+    edits without a restart. A bad edit is logged and the last good config kept.
+    """
+    def __init__(self, path=None, check_interval=RELOAD_CHECK_SECONDS, clock=time.monotonic):
+        self.path = resolve_config_path(path)
+        self.check_interval = check_interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._config = None
+        self._stamp = None
+        self._checked = None
+        self._listeners = []
+
+    def get(self):
+        """The current Config. Raises ConfigError if it has never loaded."""
+        with self.lock:
+            now = self.clock()
+            if self._config is None or self._checked is None or now - self._checked >= self.check_interval:
+                self._checked = now
+                self._refresh()
+            return self._config
+
+    def reload(self):
+        """Re-reads the file now, changed or not."""
+        with self.lock:
+            self._stamp = None
+            self._checked = self.clock()
+            self._refresh()
+            return self._config
+
+    def on_change(self, callback):
+        """callback(config) after every reload that replaced a loaded config."""
+        self._listeners.append(callback)
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._config is None:
+                raise ConfigError(f"Config file not found at {self.path}")
+            logging.warning(f"Config file {self.path} is gone; keeping the last loaded config")
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        try:
+            config = Config.load(self.path)
+        except ConfigError as e:
+            if self._config is None:
+                raise
+            # Could be a half-written file; the write that finishes it changes the stamp again
+            logging.error(f"{e}; keeping the last good config")
+            self._stamp = stamp
+            return
+        previous, self._config, self._stamp = self._config, config, stamp
+        if previous is not None:
+            logging.info(f"Reloaded config from {self.path} ({len(config.profiles)} client profiles)")
+            for callback in self._listeners:
+                try:
+                    callback(config)
+                except Exception as e:
+                    logging.error(f"Config change callback failed: {e}")
+
+_services = {}
+_services_lock = threading.Lock()
+
+def config_service(config_path=None):
+    """The process-wide ConfigService for a config file."""
+    path = resolve_config_path(config_path)
+    with _services_lock:
+        if path not in _services:
+            _services[path] = ConfigService(path)
+        return _services[path]
+
+def get_config(config_path=None):
+    """The cached (and, if the file changed, reloaded) Config. Raises ConfigError."""
+    return config_service(config_path).get()
@@ -0,0 +1,42 @@
+import time
+
+class Deadline:
+    """
+    Wall-clock budget for a run (--deadline SECONDS). Deadline(None) never expires.
+
+    Stages check remaining() before optional work and degrade instead of
+    overrunning; less(seconds) gives a view that expires that much earlier,
+    to keep time back for the steps that still have to run after it.
+    """
+    def __init__(self, seconds=None, clock=time.monotonic, _end=None):
+        self.seconds = seconds
+        self.clock = clock
+        self.started = clock()
+        if _end is not None:
+            self.end = _end
+        else:
+            self.end = None if seconds is None else self.started + seconds
+
+    def remaining(self):
+        if self.end is None:
+            return float("inf")
+        return max(0.0, self.end - self.clock())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """True if at least `seconds` are left."""
+        return self.remaining() >= seconds
+
+    def less(self, seconds):
+        """The same deadline, `seconds` earlier."""
+        end = None if self.end is None else self.end - seconds
+        return Deadline(self.seconds, self.clock, _end=end)
+
+    def to_dict(self):
+        return {
+            "budget": self.seconds,
+            "elapsed": round(self.clock() - self.started, 3),
+            "remaining": None if self.end is None else round(self.remaining(), 3),
+        }
@@ -1,11 +1,61 @@
 import requests
 import logging
+import threading
+import time
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
+# Requests/sec across all threads sharing one client (Instantly throttles per workspace)
+DEFAULT_RATE_LIMIT = 10
+DEFAULT_BURST = 20
+
+class RateLimiter:
+    """
+    Thread-safe token bucket. acquire() blocks until a request may go out.
+    One instance is shared by every thread using the same InstantlyAPI, so
+    concurrent stages can't burst past the workspace limit together.
+    """
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)                 # requests per second
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0                        # total seconds callers spent throttled
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+def shared_client(api_key):
+    """
+    One InstantlyAPI per workspace key for the life of the process. A long-lived
+    worker (execution/worker_daemon.py) keeps its connection pool warm between
+    runs, and concurrent runs on the same workspace share one rate limiter.
+    """
+    key = api_key.strip()
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = _shared_clients[key] = InstantlyAPI(key)
+        return client
+
 class InstantlyAPI:
-    def __init__(self, api_key):
+    def __init__(self, api_key, rate_limiter=None):
         self.api_key = api_key
+        self.rate_limiter = rate_limiter or RateLimiter(DEFAULT_RATE_LIMIT, DEFAULT_BURST)
         # Ensure we don't have whitespace
         self.headers = {
             "Accept": "application/json",
@@ -25,7 +75,8 @@ class InstantlyAPI:
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["HEAD", "GET", "OPTIONS", "POST", "DELETE", "PUT"]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Pool sized for the concurrent stages/fetchers sharing this session
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=4, pool_maxsize=16)
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
 
@@ -37,6 +88,7 @@ class InstantlyAPI:
         
         try:
             # Use session for retries
+            self.rate_limiter.acquire()
             response = self.session.get(url, params=params)
             response.raise_for_status()
             return response.json()
@@ -56,6 +108,7 @@ class InstantlyAPI:
         
         try:
             # Use session for retries
+            self.rate_limiter.acquire()
             response = self.session.post(url, json=payload)
             response.raise_for_status()
             return response.json()
@@ -68,34 +121,37 @@ class InstantlyAPI:
             return None
     def _get_all(self, endpoint, params=None):
         """Helper to fetch ALL items using limit/skip pagination."""
-        if params is None:
-            params = {}
-        
-        limit = 100
+        all_items = []
+        for items in self.iter_pages(endpoint, params):
+            all_items.extend(items)
+        return all_items
+
+    def iter_pages(self, endpoint, params=None, limit=100):
+        """
+        Yields one page of items at a time (limit/skip pagination), so callers
+        can stream a large listing without holding all of it.
+        """
+        params = dict(params or {})
         params['limit'] = limit
         params['skip'] = 0
-        
-        all_items = []
-        
+
         while True:
             data = self._get(endpoint, params=params)
-            
+
             # Safety check
             if not data or not isinstance(data, dict):
                 break
-                
+
             items = data.get("items", [])
             if not items:
                 break
-                
-            all_items.extend(items)
-            
+
+            yield items
+
             if len(items) < limit:
                 break
-                
+
             params['skip'] += limit
-            
-        return all_items
 
     def list_campaigns(self, tag_ids=None):
         """Retrieves a list of campaigns, optionally filtered by tags."""
@@ -127,6 +183,7 @@ class InstantlyAPI:
         """Deletes a custom tag."""
         url = f"{self.base_url}/custom-tags/{tag_id}"
         try:
+            self.rate_limiter.acquire()
             response = self.session.delete(url)
             response.raise_for_status()
             return True
@@ -194,6 +251,18 @@ class InstantlyAPI:
              return data
         return {}
 
+    def get_all_campaign_analytics(self):
+        """
+        One call for every campaign's analytics.
+        Returns {campaign_id: summary}, or None if the response isn't a per-campaign list.
+        """
+        data = self._get("/campaigns/analytics")
+        if isinstance(data, dict) and isinstance(data.get("items"), list):
+            data = data["items"]
+        if not isinstance(data, list):
+            return None
+        return {item.get("campaign_id"): item for item in data if isinstance(item, dict) and item.get("campaign_id")}
+
     def get_warmup_status(self, account_id):
         # V2: /accounts/{id}/summary ? Or maybe just part of account object?
         # Trying placeholder endpoint /accounts/{id}/summary as per previous failure context which didn't test this.
@@ -253,6 +322,16 @@ class InstantlyAPI:
         }
         return self._post("/custom-tags/toggle-resource", payload=payload)
 
+    def toggle_account_tags(self, tag_ids, account_ids, assign=True):
+        """Assigns (or removes) tags on many accounts in one toggle-resource call."""
+        payload = {
+            "tag_ids": list(tag_ids),
+            "resource_ids": list(account_ids),
+            "resource_type": 1, # 1 = Email Account
+            "assign": assign
+        }
+        return self._post("/custom-tags/toggle-resource", payload=payload)
+
     def update_account_status(self, email, status_id):
         """Updates the status (1=Active, etc) of an account."""
         # status: 0=Inactive?, 1=Active?
@@ -298,23 +377,39 @@ class InstantlyAPI:
         Fetches tag mappings for specific resources (Campaign IDs or Account Emails).
         This is necessary because V2 list endpoints might omit some tags.
         """
+        items, _ = self.get_custom_tag_mappings_checked(resource_ids)
+        return items
+
+    def get_custom_tag_mappings_checked(self, resource_ids):
+        """
+        Same as get_custom_tag_mappings, but returns (items, complete).
+        complete is False if any page failed, so callers can fall back.
+        """
         if not resource_ids:
-            return []
-            
+            return [], True
+
         # The API might have a limit on URL length or param count.
-        # Safe chunking: 50 IDs at a time.
+        # Safe chunking: 50 IDs at a time, each chunk paginated (50 inboxes easily carry > 100 tags).
         all_items = []
+        complete = True
         chunk_size = 50
-        
+        limit = 100
+
         for i in range(0, len(resource_ids), chunk_size):
             chunk = resource_ids[i:i + chunk_size]
             params = {
                 "resource_ids": ",".join(chunk),
-                "limit": 100 
+                "limit": limit,
+                "skip": 0
             }
-            res = self._get("/custom-tag-mappings", params=params)
-            if res and isinstance(res, dict) and "items" in res:
+            while True:
+                res = self._get("/custom-tag-mappings", params=params)
+                if not res or not isinstance(res, dict) or "items" not in res:
+                    complete = False
+                    break
                 all_items.extend(res["items"])
-                
-        return all_items
+                if len(res["items"]) < limit:
+                    break
+                params["skip"] += limit
 
+        return all_items, complete
@@ -0,0 +1,297 @@
+import json
+import logging
+import os
+import secrets
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Shared queue for runs spread over several worker nodes (SQLite on one box; Postgres across boxes)
+DEFAULT_QUEUE_DB = os.environ.get("INBOXBENCH_QUEUE_DB") or os.path.join(tempfile.gettempdir(), "inboxbench-queue.db")
+
+VISIBILITY_SECONDS = 120   # a lease not heartbeated for this long is reclaimed by another worker
+MAX_ATTEMPTS = 3           # leases per job before it's given up ("dead")
+BACKOFF_SECONDS = 30       # retry delay after a failed attempt, doubled per attempt
+MAX_BACKOFF_SECONDS = 3600
+# Queue file mode: payloads can carry API keys (jobs files, config.json jobs), so owner-only
+FILE_MODE = 0o600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    queue TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedup_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at DOUBLE PRECISION NOT NULL,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_until DOUBLE PRECISION,
+    result TEXT,
+    error TEXT,
+    created_at DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL
+)"""
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, status, run_at)",
+    "CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (queue, dedup_key)",
+)
+
+# Job status: pending -> leased -> done | pending (retry, after backoff) | dead (out of attempts)
+
+def private_file(path):
+    """Creates path with FILE_MODE if it doesn't exist, else narrows its mode to FILE_MODE."""
+    os.close(os.open(path, os.O_CREAT | os.O_RDWR, FILE_MODE))
+    if os.stat(path).st_mode & 0o777 != FILE_MODE:
+        try:
+            os.chmod(path, FILE_MODE)
+        except PermissionError:
+            logging.warning(f"{path} is readable by other users and isn't ours to chmod")
+
+def worker_name():
+    """Default lease owner: host + pid (shows up in the jobs table)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class JobQueue:
+    """
+    Durable leased job queue (SQLite). Several processes, on one box, can
+    enqueue to and lease from the same file.
+
+    - enqueue(payload): a job, optionally deduplicated on dedup_key while an
+      earlier one with that key is still open.
+    - lease(owner): the oldest ready job, held for `visibility` seconds. Jobs
+      whose lease ran out (worker crashed or hung) are ready again.
+    - heartbeat / complete / fail take the lease token; they return False
+      once the lease has been lost to another worker.
+    - fail() retries with exponential backoff until max_attempts, then the
+      job is "dead".
+    """
+    placeholder = "?"
+
+    def __init__(self, path=DEFAULT_QUEUE_DB, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.conn = self._connect()
+        with self.lock:
+            self._execute(SCHEMA)
+            for index in INDEXES:
+                self._execute(index)
+            self.conn.commit()
+
+    def _connect(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        private_file(self.path)
+        # isolation_level=None: transactions are opened explicitly (BEGIN IMMEDIATE in lease)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # SQLite creates -wal / -shm with the database's mode; older files may predate FILE_MODE
+        for path in (self.path + "-wal", self.path + "-shm"):
+            if os.path.exists(path):
+                private_file(path)
+        return conn
+
+    def _execute(self, sql, params=()):
+        return self.conn.execute(sql.replace("?", self.placeholder), params)
+
+    def _begin(self):
+        # Takes the write lock up front so two workers can't pick the same job
+        self._execute("BEGIN IMMEDIATE")
+
+    def _query(self, sql, params=()):
+        """(rows, column names) of a read, with its transaction ended (Postgres would keep it, and its snapshot, open)."""
+        try:
+            cur = self._execute(sql, params)
+            rows = cur.fetchall()
+            columns = [c[0] for c in cur.description]
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return rows, columns
+
+    def _select_ready(self, queue, now):
+        return self._execute(
+            "SELECT id, payload, attempts, max_attempts FROM jobs WHERE queue = ? AND "
+            "((status = 'pending' AND run_at <= ?) OR (status = 'leased' AND lease_until < ?)) "
+            "ORDER BY run_at, created_at LIMIT 1", (queue, now, now)).fetchone()
+
+    def enqueue(self, payload, queue="runs", dedup_key=None, delay=0, max_attempts=MAX_ATTEMPTS):
+        """Adds a job; returns its id (the open job's id if dedup_key is already queued)."""
+        now = self.clock()
+        with self.lock:
+            self._begin()
+            try:
+                if dedup_key is not None:
+                    row = self._execute(
+                        "SELECT id FROM jobs WHERE queue = ? AND dedup_key = ? AND status IN ('pending', 'leased')",
+                        (queue, dedup_key)).fetchone()
+                    if row:
+                        self.conn.commit()
+                        return row[0]
+                job_id = secrets.token_hex(8)
+                self._execute(
+                    "INSERT INTO jobs (id, queue, payload, dedup_key, status, attempts, max_attempts, run_at, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'pending', 0, ?, ?, ?, ?)",
+                    (job_id, queue, json.dumps(payload), dedup_key, max_attempts, now + delay, now, now))
+                self.conn.commit()
+                return job_id
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def lease(self, owner=None, queue="runs", visibility=VISIBILITY_SECONDS):
+        """
+        The next ready job as {"id", "payload", "attempt", "token"}, or None.
+        A reclaimed job that has used up its attempts is marked dead instead.
+        """
+        owner = owner or worker_name()
+        with self.lock:
+            while True:
+                now = self.clock()
+                self._begin()
+                try:
+                    row = self._select_ready(queue, now)
+                    if row is None:
+                        self.conn.commit()
+                        return None
+                    job_id, payload, attempts, max_attempts = row
+                    if attempts >= max_attempts:
+                        # Its last lease expired without complete/fail: the worker died on it
+                        self._execute("UPDATE jobs SET status = 'dead', error = ?, lease_token = NULL, updated_at = ? WHERE id = ?",
+                                      ("Lease expired on the last attempt", now, job_id))
+                        self.conn.commit()
+                        logging.warning(f"Job {job_id} is dead after {attempts} attempts")
+                        continue
+                    token = secrets.token_hex(8)
+                    self._execute(
+                        "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_token = ?, "
+                        "lease_until = ?, updated_at = ? WHERE id = ?",
+                        (owner, token, now + visibility, now, job_id))
+                    self.conn.commit()
+                except Exception:
+                    self.conn.rollback()
+                    raise
+                if attempts:
+                    logging.info(f"Job {job_id}: attempt {attempts + 1} (leased by {owner})")
+                return {"id": job_id, "payload": json.loads(payload), "attempt": attempts + 1, "token": token}
+
+    def _update_leased(self, job, sets, params):
+        """Applies an update if the caller still holds the job's lease; True if it did."""
+        with self.lock:
+            cur = self._execute(f"UPDATE jobs SET {sets} WHERE id = ? AND lease_token = ? AND status = 'leased'",
+                                (*params, job["id"], job["token"]))
+            self.conn.commit()
+            return cur.rowcount == 1
+
+    def heartbeat(self, job, visibility=VISIBILITY_SECONDS):
+        """Extends the lease. False if it was lost (expired and taken by another worker)."""
+        now = self.clock()
+        return self._update_leased(job, "lease_until = ?, updated_at = ?", (now + visibility, now))
+
+    def complete(self, job, result=None):
+        now = self.clock()
+        return self._update_leased(job, "status = 'done', result = ?, lease_token = NULL, updated_at = ?",
+                                   (json.dumps(result), now))
+
+    def fail(self, job, error, backoff=BACKOFF_SECONDS):
+        """Schedules a retry after backoff * 2^(attempt-1), or marks the job dead on its last attempt."""
+        now = self.clock()
+        with self.lock:
+            rows, _ = self._query("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job["id"],))
+        row = rows[0] if rows else None
+        if row and row[0] >= row[1]:
+            return self._update_leased(job, "status = 'dead', error = ?, lease_token = NULL, updated_at = ?", (str(error), now))
+        delay = min(backoff * 2 ** (job["attempt"] - 1), MAX_BACKOFF_SECONDS)
+        return self._update_leased(job, "status = 'pending', error = ?, run_at = ?, lease_token = NULL, updated_at = ?",
+                                   (str(error), now + delay, now))
+
+    def get(self, job_id):
+        """A job's row as a dict (payload/result decoded), or None."""
+        with self.lock:
+            rows, columns = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = dict(zip(columns, rows[0]))
+        for key in ("payload", "result"):
+            if job[key] is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def stats(self, queue="runs"):
+        """{status: count} for a queue."""
+        with self.lock:
+            rows, _ = self._query("SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (queue,))
+        return dict(rows)
+
+class PostgresJobQueue(JobQueue):
+    """
+    The same queue on Postgres, for worker nodes on different boxes (a SQLite
+    file can't be shared between hosts). Needs psycopg2.
+    """
+    placeholder = "%s"
+
+    def __init__(self, url, clock=time.time):
+        self.url = url
+        super().__init__(path=None, clock=clock)
+
+    def _connect(self):
+        try:
+            import psycopg2
+        except ImportError:
+            raise RuntimeError("psycopg2 is required for a Postgres job queue (pip install psycopg2-binary)")
+        return psycopg2.connect(self.url)
+
+    def _execute(self, sql, params=()):
+        cur = self.conn.cursor()
+        cur.execute(sql.replace("?", self.placeholder), params)
+        return cur
+
+    def _begin(self):
+        pass # psycopg2 opens a transaction on the first statement
+
+    def _select_ready(self, queue, now):
+        # Row lock, skipping rows another worker is leasing right now
+        return self._execute(
+            "SELECT id, payload, attempts, max_attempts FROM jobs WHERE queue = ? AND "
+            "((status = 'pending' AND run_at <= ?) OR (status = 'leased' AND lease_until < ?)) "
+            "ORDER BY run_at, created_at LIMIT 1 FOR UPDATE SKIP LOCKED", (queue, now, now)).fetchone()
+
+def open_queue(spec=DEFAULT_QUEUE_DB):
+    """postgres[ql]://... -> PostgresJobQueue; anything else is a SQLite path."""
+    if spec.startswith(("postgres://", "postgresql://")):
+        return PostgresJobQueue(spec)
+    return JobQueue(spec[len("sqlite:///"):] if spec.startswith("sqlite:///") else spec)
+
+class Heartbeat:
+    """Keeps a job's lease alive from a background thread while it runs (with-block)."""
+    def __init__(self, queue, job, visibility=VISIBILITY_SECONDS):
+        self.queue = queue
+        self.job = job
+        self.visibility = visibility
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        while not self._stop.wait(self.visibility / 3):
+            try:
+                if not self.queue.heartbeat(self.job, self.visibility):
+                    self.lost = True
+                    logging.warning(f"Lost the lease on job {self.job['id']}; another worker may pick it up")
+                    return
+            except Exception as e:
+                logging.warning(f"Heartbeat for job {self.job['id']} failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,244 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class Stage:
+    """A named unit of work. fn(**inputs) receives the results of the stages it depends on."""
+    def __init__(self, name, fn, inputs=()):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+
+class Pipeline:
+    """
+    Small DAG executor for I/O-bound stages.
+
+    Each stage declares the stages whose results it needs; a stage starts as
+    soon as all of them are done, so independent stages overlap on a thread
+    pool and wall time tracks the critical path. A failing stage only skips
+    the stages downstream of it.
+
+    on_event(event) is called (from worker threads, serialized) with:
+        {"type": "stage", "stage": name, "event": "start", "remaining": seconds (with a deadline)}
+        {"type": "stage", "stage": name, "event": "end", "status": "ok" | "failed" | "skipped" | "resumed",
+         "elapsed": seconds, "error": str (failed/skipped only)}
+    """
+    def __init__(self, on_event=None, max_workers=4, on_result=None, deadline=None):
+        self.stages = {}
+        self.deadline = deadline # lib/deadline.Deadline; stages read it to degrade, events report what's left
+        self.on_event = on_event
+        self.on_result = on_result # on_result(name, value) after each successful stage (checkpointing)
+        self.max_workers = max_workers
+        self.results = {}
+        self.errors = {}
+        self.timings = {}
+        self._event_lock = threading.Lock()
+
+    def add(self, name, fn, inputs=()):
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage '{name}'")
+        self.stages[name] = Stage(name, fn, inputs)
+        return self
+
+    def _emit(self, event):
+        if self.on_event:
+            with self._event_lock:
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    logging.warning(f"Stage event handler failed: {e}")
+
+    def _check(self):
+        for stage in self.stages.values():
+            for dep in stage.inputs:
+                if dep not in self.stages and dep not in self.results:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+
+    def _run_stage(self, stage):
+        event = {"type": "stage", "stage": stage.name, "event": "start"}
+        if self.deadline is not None and self.deadline.end is not None:
+            event["remaining"] = round(self.deadline.remaining(), 3)
+        self._emit(event)
+        start = time.perf_counter()
+        try:
+            return stage.fn(**{dep: self.results[dep] for dep in stage.inputs})
+        finally:
+            self.timings[stage.name] = time.perf_counter() - start
+
+    def _record(self, name):
+        if self.on_result:
+            try:
+                self.on_result(name, self.results[name])
+            except Exception as e:
+                logging.warning(f"Stage '{name}' result handler failed: {e}")
+
+    def _finish(self, name, status, error=None):
+        event = {"type": "stage", "stage": name, "event": "end", "status": status,
+                 "elapsed": round(self.timings.get(name, 0.0), 3)}
+        if error:
+            event["error"] = error
+        self._emit(event)
+
+    def run(self, initial=None):
+        """
+        Runs every stage. initial seeds results for stages that were
+        completed elsewhere (e.g. a resumed run). Returns the results dict;
+        failures are in self.errors.
+        """
+        self.results.update(initial or {})
+        self._check()
+        for name in initial or {}:
+            if name in self.stages:
+                self._finish(name, "resumed")
+        pending = {n: s for n, s in self.stages.items() if n not in self.results}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                # Skip anything whose inputs failed
+                for name in [n for n, s in pending.items() if any(d in self.errors for d in s.inputs)]:
+                    failed = [d for d in pending[name].inputs if d in self.errors]
+                    self.errors[name] = f"Skipped: upstream failed ({', '.join(failed)})"
+                    del pending[name]
+                    self._finish(name, "skipped", self.errors[name])
+
+                ready = [n for n, s in pending.items() if all(d in self.results for d in s.inputs)]
+                for name in ready:
+                    running[pool.submit(self._run_stage, pending.pop(name))] = name
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Dependency cycle between stages: {sorted(pending)}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                        self._record(name)
+                        self._finish(name, "ok")
+                    except Exception as e:
+                        logging.error(f"Stage '{name}' failed: {e}")
+                        self.errors[name] = str(e)
+                        self._finish(name, "failed", str(e))
+        return self.results
+
+def run_partitioned(parts, fn, max_workers=4):
+    """
+    Runs fn(name, part) for every item of the parts dict on a thread pool, as
+    independent units: one failing doesn't stop the others.
+    Returns (results {name: value}, errors {name: str}).
+    """
+    results, errors = {}, {}
+    if not parts:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fn, name, part): name for name, part in parts.items()}
+        for future in futures:
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logging.error(f"Unit '{name}' failed: {e}")
+                errors[name] = str(e)
+    return results, errors
+
+QUEUE_DEPTH = 2 # chunks buffered between two streaming stages
+
+_DONE = object()
+
+class ChunkStream:
+    """
+    Linear chain of stages over a stream of chunks, for data too big to hold
+    at once. Each stage runs on its own thread and hands its output to the
+    next one through a bounded queue, so at most about
+    (stages x (depth + 1)) chunks are alive at any time and a slow stage
+    back-pressures the ones before it.
+
+    fn(chunk) returns the chunk for the next stage (None drops it; the last
+    stage's return value is ignored). After a failure the stream stops
+    pulling from the source and the remaining chunks are drained unprocessed.
+    Emits the same stage events as Pipeline.
+    """
+    def __init__(self, on_event=None, depth=QUEUE_DEPTH):
+        self.stages = []
+        self.on_event = on_event
+        self.depth = depth
+        self.errors = {}
+        self.timings = {}
+        self.chunks = {}
+        self._event_lock = threading.Lock()
+
+    def add(self, name, fn):
+        if any(name == n for n, _ in self.stages):
+            raise ValueError(f"Duplicate stage '{name}'")
+        self.stages.append((name, fn))
+        return self
+
+    def _emit(self, event):
+        if self.on_event:
+            with self._event_lock:
+                try:
+                    self.on_event(event)
+                except Exception as e:
+                    logging.warning(f"Stage event handler failed: {e}")
+
+    def _feed(self, source, out):
+        try:
+            for chunk in source:
+                if self.errors:
+                    break
+                out.put(chunk)
+        except Exception as e:
+            logging.error(f"Stream source failed: {e}")
+            self.errors["source"] = str(e)
+        finally:
+            out.put(_DONE)
+
+    def _work(self, name, fn, inq, outq):
+        self._emit({"type": "stage", "stage": name, "event": "start"})
+        self.timings[name] = 0.0
+        self.chunks[name] = 0
+        while True:
+            chunk = inq.get()
+            if chunk is _DONE:
+                break
+            if self.errors:
+                continue # keep draining so upstream never blocks on a full queue
+            start = time.perf_counter()
+            try:
+                out = fn(chunk)
+            except Exception as e:
+                logging.error(f"Stage '{name}' failed: {e}")
+                self.errors[name] = str(e)
+                continue
+            finally:
+                self.timings[name] += time.perf_counter() - start
+            self.chunks[name] += 1
+            if outq is not None and out is not None:
+                outq.put(out)
+        if outq is not None:
+            outq.put(_DONE)
+
+        event = {"type": "stage", "stage": name, "event": "end",
+                 "status": "failed" if name in self.errors else "ok",
+                 "elapsed": round(self.timings[name], 3)}
+        if name in self.errors:
+            event["error"] = self.errors[name]
+        self._emit(event)
+
+    def run(self, source):
+        """Pushes every chunk of source through the stages. Failures are in self.errors."""
+        queues = [queue.Queue(maxsize=self.depth) for _ in self.stages]
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            outq = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(target=self._work, args=(name, fn, queues[i], outq), daemon=True))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return not self.errors
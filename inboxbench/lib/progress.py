@@ -0,0 +1,160 @@
+import json
+import sys
+import threading
+import time
+
+DEFAULT_INTERVAL = 0.1 # seconds between coalesced progress lines
+ROW_BATCH = 500 # rows per account_rows/action line (--stream_rows)
+
+class ProgressEmitter:
+    """
+    NDJSON progress writer for the stdout stream route.ts forwards to the browser.
+
+    - progress() lines are coalesced: within `interval` only the latest one is
+      kept, and it is written when the interval is up (a daemon ticker flushes
+      it if nothing else comes along).
+    - A step change, and every event()/result()/error(), is written right away
+      (after whatever progress was pending, so order is kept).
+    - count() bumps named counters that ride along on the next progress line
+      as "counters", instead of one message per item.
+    - Lines are buffered and written with one write+flush per batch rather
+      than a print/flush per line.
+    - percent never goes backwards (stages run concurrently).
+    """
+    def __init__(self, stream=None, interval=DEFAULT_INTERVAL):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.counters = {}
+        self.lines_written = 0
+        self.writes = 0
+        self.coalesced = 0
+        self._buffer = []
+        self._pending = None
+        self._step = None
+        self._percent = 0
+        self._last_flush = 0.0
+        self._counters_dirty = False
+        self._wake = threading.Event()
+        self._closed = False
+        self._ticker = None
+
+    def reset(self):
+        """Start a new run on the same stream."""
+        with self.lock:
+            self.counters = {}
+            self._step = None
+            self._percent = 0
+
+    def _start_ticker(self):
+        if self._ticker is None and self.interval > 0:
+            self._ticker = threading.Thread(target=self._tick, daemon=True)
+            self._ticker.start()
+
+    def _tick(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self.lock:
+                if self._pending is not None and time.monotonic() - self._last_flush >= self.interval:
+                    self._flush_pending()
+                    self._write()
+
+    def _flush_pending(self):
+        if self._pending is not None:
+            if self._counters_dirty:
+                self._pending["counters"] = dict(self.counters)
+                self._counters_dirty = False
+            self._buffer.append(json.dumps(self._pending))
+            self._pending = None
+
+    def _write(self):
+        if not self._buffer:
+            return
+        self.stream.write("\n".join(self._buffer) + "\n")
+        self.stream.flush()
+        self.lines_written += len(self._buffer)
+        self.writes += 1
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def progress(self, step, message, percent=None):
+        with self.lock:
+            if percent is not None:
+                self._percent = max(self._percent, percent)
+            data = {"type": "progress", "step": step, "message": message, "percent": self._percent}
+            immediate = step != self._step or self._percent >= 100 or self.interval <= 0
+            self._step = step
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = data
+            if immediate or time.monotonic() - self._last_flush >= self.interval:
+                self._flush_pending()
+                self._write()
+            else:
+                self._start_ticker()
+
+    def count(self, name, n=1):
+        """Increment a counter; it goes out with the next progress line."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            self._counters_dirty = True
+
+    def event(self, data):
+        """Non-progress lines (stage, warning, ...) are never coalesced."""
+        with self.lock:
+            self._flush_pending()
+            self._buffer.append(json.dumps(data))
+            self._write()
+
+    def result(self, data):
+        self.event({"type": "result", "data": data})
+
+    def error(self, message):
+        self.event({"type": "error", "message": message})
+
+    def flush(self):
+        with self.lock:
+            self._flush_pending()
+            self._write()
+
+    def close(self):
+        self.flush()
+        self._closed = True
+        self._wake.set()
+
+class RowStream:
+    """
+    Batched table rows on a ProgressEmitter (--stream_rows), so the UI can fill
+    its tables while the run is still going instead of waiting for the result:
+
+        {"type": kind, "columns": ["email", ...], "rows": [["a@x.com", ...], ...]}
+
+    Rows are positional against "columns" (sent on every line, so each line
+    stands alone) to keep big fleets compact. Thread-safe; flush() sends a
+    partial batch.
+    """
+    def __init__(self, emitter, kind, columns, batch_size=ROW_BATCH):
+        self.emitter = emitter
+        self.kind = kind
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.count = 0
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def add(self, row):
+        with self._lock:
+            self._rows.append(row)
+            self.count += 1
+            if len(self._rows) >= self.batch_size:
+                self._send()
+
+    def flush(self):
+        with self._lock:
+            self._send()
+
+    def _send(self):
+        if self._rows:
+            self.emitter.event({"type": self.kind, "columns": self.columns, "rows": self._rows})
+            self._rows = []
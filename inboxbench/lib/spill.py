@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import threading
+
+class SpillFile:
+    """
+    Append-only temp file of JSON rows (one per line), read back in batches.
+    Lets a run build far more rows than it wants to hold in memory; the rows
+    are re-read from disk each time batches() is called.
+    """
+    def __init__(self, prefix="inboxbench-", dir=None):
+        fd, self.path = tempfile.mkstemp(prefix=prefix, suffix=".jsonl", dir=dir)
+        self._file = os.fdopen(fd, "w")
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def write(self, rows):
+        with self.lock:
+            for row in rows:
+                self._file.write(json.dumps(row, separators=(",", ":")) + "\n")
+            self.count += len(rows)
+
+    def batches(self, size):
+        """Yields lists of up to size rows, in write order."""
+        with self.lock:
+            self._file.flush()
+        batch = []
+        with open(self.path) as f:
+            for line in f:
+                batch.append(json.loads(line))
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        with self.lock:
+            if not self._file.closed:
+                self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -2,18 +2,26 @@ import json
 import os
 import logging
 
-def load_config(config_path="config/config.json"):
-    """Loads the configuration from a JSON file."""
+from lib.config import ConfigError, get_config
+
+def load_config(config_path=None):
+    """
+    Loads the configuration as a dict (None if it's missing or invalid). Cached
+    per file and reloaded when it changes; see lib/config.py.
+    """
     try:
-        with open(config_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logging.error(f"Config file not found at {config_path}")
-        return None
-    except json.JSONDecodeError:
-        logging.error(f"Error decoding JSON from {config_path}")
+        return get_config(config_path).to_dict()
+    except ConfigError as e:
+        logging.error(str(e))
         return None
 
+def load_json_arg(value):
+    """Parses a CLI value that is either inline JSON or a path to a JSON file."""
+    if os.path.isfile(value):
+        with open(value, 'r') as f:
+            return json.load(f)
+    return json.loads(value)
+
 def setup_logging(log_level=logging.INFO):
     """Sets up basic logging."""
     logging.basicConfig(
@@ -0,0 +1,374 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+# Add project root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.config import ConfigError, get_config
+from lib.utils import load_json_arg
+from lib.run_lock import workspace_id
+from lib.job_queue import open_queue, Heartbeat, DEFAULT_QUEUE_DB, VISIBILITY_SECONDS
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Workspaces run at once (each in its own process)
+DEFAULT_WORKERS = 8
+# Hard limit per job; the tenant process is killed past it
+DEFAULT_TIMEOUT = 900
+# Ad-hoc jobs get --deadline = timeout - this, so they wrap up with a partial report before the kill
+DEADLINE_MARGIN = 30
+# --consume: job statuses that put a queued unit back for a retry (with backoff); a timeout isn't retried
+RETRY_STATUSES = ("crashed", "failed")
+# --consume: seconds between polls of an empty queue
+QUEUE_POLL_SECONDS = 5
+
+def load_jobs(jobs_path=None, config_path=None):
+    """
+    Jobs from a jobs file and/or config.json.
+
+    Jobs file: a JSON list, or {"jobs": [...]}, of
+        {"name", "api_key", "sheet", "report_email", "warmup_threshold", "bench_percent",
+         "ignore_customer_tags", "policies", "deadline"}     -> an ad-hoc run (run_adhoc_workflow.py)
+        {"name", "api_key", "client_profiles": [...]}        -> tag reports (main_workflow.py)
+    Ad-hoc settings a job leaves out (scheduler.project_job leaves them all
+    out) get the CLI's defaults: warmup_threshold 70, bench_percent 0,
+    ignore_customer_tags false.
+    config.json: its client_profiles become client report jobs; a profile may
+    carry its own "instantly_api_key", else the top-level key is used. These
+    jobs remember the config's path (see refresh_profiles).
+    """
+    jobs = []
+    if jobs_path:
+        data = load_json_arg(jobs_path)
+        jobs.extend(data.get("jobs", []) if isinstance(data, dict) else data)
+    if config_path:
+        try:
+            config = get_config(config_path)
+        except ConfigError as e:
+            raise ValueError(f"Could not load config {config_path}: {e}")
+        for profile in config.profiles:
+            jobs.append({
+                "name": profile.client_name,
+                "api_key": profile.instantly_api_key or config.instantly_api_key,
+                "client_profiles": [profile.to_dict()],
+                "config": config.path,
+            })
+    seen = set()
+    for i, job in enumerate(jobs):
+        if not job.get("api_key"):
+            raise ValueError(f"Job {job.get('name') or i} has no api_key")
+        name = job.get("name") or f"job-{i}"
+        job["name"] = name if name not in seen else f"{name}-{i}" # results are matched by name
+        seen.add(job["name"])
+    return jobs
+
+def group_by_workspace(jobs):
+    """
+    One unit per API key. A unit's jobs run one after another in one process, so a
+    workspace is never hit by two tenants at once and its rate limit holds; client
+    profile jobs on the same key are merged so the workspace is fetched once.
+    """
+    units = {}
+    for job in jobs:
+        unit = units.setdefault(workspace_id(job["api_key"]), {"workspace": workspace_id(job["api_key"]), "jobs": []})
+        if "client_profiles" in job:
+            merged = next((j for j in unit["jobs"] if "client_profiles" in j and j.get("config") == job.get("config")), None)
+            if merged is not None:
+                merged["client_profiles"].extend(job["client_profiles"])
+                merged["name"] = f"{merged['name']}+{job['name']}"
+                continue
+            job = dict(job, client_profiles=list(job["client_profiles"]))
+        unit["jobs"].append(job)
+    return list(units.values())
+
+# --- WORKER SIDE (one process per workspace) ---
+
+def run_job(job, timeout, log_stream):
+    """Runs one job in this process; returns its summary."""
+    if "client_profiles" in job:
+        from orchestration.main_workflow import report_client_profiles
+        reports = report_client_profiles(job["api_key"], job["client_profiles"])
+        errors = [r["error"] for r in reports if r.get("error")] + [r["sheet_error"] for r in reports if r.get("sheet_error")]
+        return {
+            "status": "ok" if not errors else "partial",
+            "clients": len(reports),
+            "sheets_updated": sum(1 for r in reports if r.get("sheet_updated")),
+            "errors": errors,
+        }
+
+    from lib.progress import ProgressEmitter
+    from execution import run_adhoc_workflow as adhoc
+    # The run's NDJSON goes to the tenant log instead of our stdout
+    progress = ProgressEmitter(stream=log_stream)
+    deadline = job.get("deadline")
+    if deadline is None and timeout:
+        deadline = max(timeout - DEADLINE_MARGIN, timeout / 2)
+    try:
+        # Under the workspace lock: waits for (or joins) a UI run on the same workspace
+        result = adhoc.run_workspace_report(
+            progress=progress, api_key=job["api_key"], sheet_url=job.get("sheet"), report_email=job.get("report_email"),
+            warmup_threshold=job.get("warmup_threshold", 70), bench_percent=job.get("bench_percent", 0),
+            ignore_customer_tags=job.get("ignore_customer_tags", False), snapshot_dir=job.get("snapshot_dir"),
+            customer_policies=job.get("policies"), resume_run_id=job.get("resume"), journal_dir=job.get("journal_dir"),
+            deadline=deadline)
+    finally:
+        progress.close()
+    if not result.get("success"):
+        return {"status": "failed", "error": result.get("error"), "run_id": result.get("run_id")}
+    return {
+        "status": "ok" if result.get("complete", True) else "partial",
+        "run_id": result.get("run_id"),
+        "accounts": result.get("accounts_count"),
+        "campaigns": result.get("campaigns_count"),
+        "actions": result["run_summary"].get("total_actions"),
+        "sheet_updated": result.get("sheet_updated"),
+        "sheet_error": result.get("sheet_error"),
+        "email_sent": result.get("email_sent"),
+        "resume": result.get("resume"),
+    }
+
+def worker_main(timeout):
+    """--worker: reads a unit from stdin, runs its jobs, prints one JSON line per job."""
+    unit = json.load(sys.stdin)
+    for job in unit["jobs"]:
+        start = time.perf_counter()
+        try:
+            summary = run_job(job, timeout, sys.stderr)
+        except Exception as e:
+            logging.error(f"Job {job['name']} failed: {e}")
+            summary = {"status": "failed", "error": str(e)}
+        summary.update(name=job["name"], elapsed=round(time.perf_counter() - start, 2))
+        print(json.dumps(summary), flush=True)
+
+# --- PARENT SIDE ---
+
+def run_unit(unit, timeout, log_dir=None):
+    """Runs a unit in a child process, killing it once its jobs' time is up. Returns the job summaries."""
+    names = [job["name"] for job in unit["jobs"]]
+    log = open(os.path.join(log_dir, f"{unit['workspace']}.log"), "a") if log_dir else subprocess.DEVNULL
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--timeout", str(timeout)],
+            input=json.dumps(unit), stdout=subprocess.PIPE, stderr=log, text=True,
+            timeout=timeout * len(unit["jobs"]) if timeout else None)
+        out, returncode = proc.stdout, proc.returncode
+    except subprocess.TimeoutExpired as e:
+        out, returncode = e.stdout or "", None
+        if isinstance(out, bytes): out = out.decode()
+    finally:
+        if log_dir: log.close()
+
+    done = {}
+    for line in out.splitlines():
+        try:
+            summary = json.loads(line)
+            done[summary["name"]] = summary
+        except (json.JSONDecodeError, KeyError):
+            continue # stray output from a library
+    elapsed = round(time.perf_counter() - start, 2)
+    results = []
+    for name in names:
+        if name in done:
+            results.append(done[name])
+        elif returncode is None:
+            results.append({"name": name, "status": "timeout", "elapsed": elapsed, "error": f"Killed after {timeout * len(names)}s"})
+        else:
+            results.append({"name": name, "status": "crashed", "elapsed": elapsed, "error": f"Worker exited with code {returncode}"})
+    for summary in results:
+        summary["workspace"] = unit["workspace"]
+    return results
+
+def run_batch(jobs, max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, log_dir=None, on_result=None):
+    """
+    Runs every job, one isolated process per workspace, up to max_workers at once.
+    A tenant that fails, crashes or times out doesn't affect the others.
+    on_result(summary) is called as each job finishes. Returns the aggregate summary.
+    """
+    units = group_by_workspace(jobs)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    started = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
+    logging.info(f"Batch: {len(jobs)} jobs in {len(units)} workspaces, {max_workers} at a time")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_unit, unit, timeout, log_dir) for unit in units]
+        for future in as_completed(futures):
+            for summary in future.result():
+                logging.info(f"{summary['name']}: {summary['status']} ({summary['elapsed']}s)")
+                results.append(summary)
+                if on_result: on_result(summary)
+
+    counts = {}
+    for summary in results:
+        counts[summary["status"]] = counts.get(summary["status"], 0) + 1
+    return {
+        "started": started,
+        "elapsed": round(time.perf_counter() - start, 2),
+        "jobs": len(results),
+        "workspaces": len(units),
+        "counts": counts,
+        "results": sorted(results, key=lambda r: r["name"]),
+    }
+
+# --- QUEUE (several worker nodes, lib/job_queue.py) ---
+
+def enqueue_batch(queue, jobs):
+    """Queues one job per workspace unit (see group_by_workspace). Returns the queue job ids."""
+    return [queue.enqueue({"unit": unit}) for unit in group_by_workspace(jobs)]
+
+def refresh_profiles(unit):
+    """
+    A unit whose config.json jobs carry their client profiles as the config has
+    them now (looked up by tag), not as they were when queued; profiles since
+    removed are dropped, and jobs left with none. The config is cached and
+    reloaded on change, so a long-running consumer picks up edits.
+    """
+    jobs = []
+    for job in unit["jobs"]:
+        if job.get("config"):
+            try:
+                config = get_config(job["config"])
+            except ConfigError as e:
+                logging.warning(f"{e}; running {job['name']} with the profiles it was queued with")
+                jobs.append(job)
+                continue
+            profiles = []
+            for queued in job["client_profiles"]:
+                profile = config.profile(queued.get("tag_name"))
+                if profile is None:
+                    logging.info(f"Tag {queued.get('tag_name')} is no longer in {job['config']}; skipping it")
+                    continue
+                profiles.append(profile.to_dict())
+            if not profiles:
+                continue
+            job = dict(job, client_profiles=profiles)
+        jobs.append(job)
+    return dict(unit, jobs=jobs)
+
+def resolve_projects(unit, source=None):
+    """
+    A unit whose scheduler jobs (queued with a "project" id instead of an API key,
+    see scheduler.queued_project_unit) carry their project's key as the project
+    source has it now. Projects since deleted, or left without a key, are dropped.
+    """
+    if not any(job.get("project") for job in unit["jobs"]):
+        return unit
+    if source is None:
+        raise RuntimeError("Queued unit names portal projects; run the consumer with --source to look up their API keys")
+    keys = {str(p["id"]): p.get("instantly_api_key") for p in source.projects()}
+    jobs = []
+    for job in unit["jobs"]:
+        if job.get("project"):
+            key = keys.get(str(job["project"]))
+            if not key:
+                logging.info(f"Project {job['project']} is gone or has no API key; skipping {job['name']}")
+                continue
+            job = dict(job, api_key=key)
+        jobs.append(job)
+    return dict(unit, jobs=jobs)
+
+def process_queued(queue, job, timeout=DEFAULT_TIMEOUT, log_dir=None, visibility=VISIBILITY_SECONDS, source=None):
+    """Runs one leased unit, heartbeating its lease; completes it, or fails it for a retry. Returns the summaries."""
+    unit = resolve_projects(refresh_profiles(job["payload"]["unit"]), source)
+    if not unit["jobs"]:
+        queue.complete(job, [])
+        return []
+    with Heartbeat(queue, job, visibility):
+        results = run_unit(unit, timeout, log_dir)
+    retry = [r for r in results if r["status"] in RETRY_STATUSES]
+    if retry:
+        queue.fail(job, "; ".join(f"{r['name']}: {r.get('error')}" for r in retry))
+    elif not queue.complete(job, results):
+        logging.warning(f"Queue job {job['id']} finished after its lease was lost; another worker may have rerun it")
+    for summary in results:
+        summary.update(queue_job=job["id"], attempt=job["attempt"])
+    return results
+
+def consume(queue, max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, log_dir=None,
+            visibility=VISIBILITY_SECONDS, until_empty=False, on_result=None, source=None):
+    """
+    Worker node: leases units from the queue, max_workers at a time, until
+    stopped (or, with until_empty, until nothing is ready). Any number of
+    nodes can consume one queue; a node that dies stops heartbeating, and its
+    units are leased again once their visibility runs out.
+
+    source: the scheduler's project source (scheduler.open_source), needed to
+    look up the API keys of the units the scheduler enqueues.
+    """
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    def worker():
+        while True:
+            job = queue.lease(visibility=visibility)
+            if job is None:
+                if until_empty:
+                    return
+                time.sleep(QUEUE_POLL_SECONDS)
+                continue
+            try:
+                results = process_queued(queue, job, timeout, log_dir, visibility, source)
+            except Exception as e:
+                logging.error(f"Queue job {job['id']} failed: {e}")
+                queue.fail(job, str(e))
+                continue
+            for summary in results:
+                logging.info(f"{summary['name']}: {summary['status']} ({summary['elapsed']}s, attempt {job['attempt']})")
+                if on_result: on_result(summary)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for future in [pool.submit(worker) for _ in range(max_workers)]:
+            future.result()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many tenants' reports concurrently, one process per workspace")
+    parser.add_argument("--jobs", required=False, help="Jobs (JSON or file path), see load_jobs")
+    parser.add_argument("--config", required=False, help="config.json whose client_profiles become jobs")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Workspaces run at once (Default {DEFAULT_WORKERS})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help=f"Seconds per job before its process is killed (Default {DEFAULT_TIMEOUT})")
+    parser.add_argument("--log_dir", required=False, help="Per-workspace logs (stderr + the run's NDJSON)")
+    parser.add_argument("--out", required=False, help="Also write the summary JSON here")
+    parser.add_argument("--queue", required=False, help=f"Job queue (SQLite path or postgres URL, e.g. {DEFAULT_QUEUE_DB}): enqueue the jobs there instead of running them")
+    parser.add_argument("--consume", action="store_true", help="Worker node: run units from --queue")
+    parser.add_argument("--until_empty", action="store_true", help="With --consume: exit once nothing is ready")
+    parser.add_argument("--source", default=os.environ.get("DATABASE_URL"), help="With --consume: portal projects (postgres URL, Default $DATABASE_URL; sqlite:///path or a JSON file), to look up the API keys of scheduled runs")
+    parser.add_argument("--visibility", type=float, default=VISIBILITY_SECONDS, help=f"With --consume: lease seconds without a heartbeat before a unit is reclaimed (Default {VISIBILITY_SECONDS})")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args.timeout)
+        sys.exit(0)
+    if args.consume:
+        if not args.queue:
+            parser.error("--consume needs --queue")
+        from orchestration.scheduler import open_source
+        consume(open_queue(args.queue), args.workers, args.timeout, args.log_dir, args.visibility, args.until_empty,
+                on_result=lambda r: print(json.dumps({"type": "job", "data": r}), flush=True),
+                source=open_source(args.source) if args.source else None)
+        sys.exit(0)
+    if not args.jobs and not args.config:
+        parser.error("--jobs and/or --config is required")
+    if args.queue:
+        queue = open_queue(args.queue)
+        ids = enqueue_batch(queue, load_jobs(args.jobs, args.config))
+        print(json.dumps({"type": "enqueued", "data": {"jobs": ids, "queue": queue.stats()}}), flush=True)
+        sys.exit(0)
+
+    summary = run_batch(load_jobs(args.jobs, args.config), args.workers, args.timeout, args.log_dir,
+                        on_result=lambda r: print(json.dumps({"type": "job", "data": r}), flush=True))
+    print(json.dumps({"type": "summary", "data": summary}), flush=True)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(0 if set(summary["counts"]) <= {"ok", "partial"} else 1)
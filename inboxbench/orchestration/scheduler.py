@@ -0,0 +1,367 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Add project root to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.run_lock import workspace_id
+from lib.job_queue import open_queue
+from orchestration.batch_runner import run_unit, DEFAULT_TIMEOUT
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Project.run_time is the portal's "Daily Run Time (MST)", HH:MM
+SCHEDULE_TZ = ZoneInfo("US/Mountain")
+# Scheduled runs going at once, across all tenants
+DEFAULT_MAX_RUNS = 4
+# Each project starts up to this many seconds after its run_time (stable per project and day)
+DEFAULT_JITTER = 900
+# A run missed by more than this (scheduler down) waits for the next day instead
+CATCH_UP_SECONDS = 6 * 3600
+# Seconds between checks for due projects
+POLL_SECONDS = 30
+# Outcome of every scheduled run; also what keeps a project from running twice a day
+DEFAULT_STATE_DB = os.environ.get("INBOXBENCH_SCHEDULER_DB") or os.path.join(tempfile.gettempdir(), "inboxbench-scheduler.db")
+
+# Project columns (prisma/schema.prisma) the scheduler reads
+PROJECT_COLUMNS = ("id", "subdomain", "client_name", "instantly_api_key", "google_sheet_url", "report_email", "run_time")
+
+# --- PROJECT SOURCES ---
+
+class JsonSource:
+    """Projects from a JSON file: a list of Project rows, or {"projects": [...]}. Re-read on every check."""
+    def __init__(self, path):
+        self.path = path
+
+    def projects(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        return data.get("projects", []) if isinstance(data, dict) else data
+
+class SqliteSource:
+    """Projects from a SQLite table shaped like the Prisma Project model (a local stand-in for the portal DB)."""
+    def __init__(self, path, table="Project"):
+        self.path = path
+        self.table = table
+
+    def projects(self):
+        with sqlite3.connect(self.path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(f'SELECT {", ".join(PROJECT_COLUMNS)} FROM "{self.table}"').fetchall()
+        return [dict(row) for row in rows]
+
+class PostgresSource:
+    """Projects straight from the portal's Postgres (DATABASE_URL). Needs psycopg2."""
+    def __init__(self, url, table="Project"):
+        self.url = url
+        self.table = table
+
+    def projects(self):
+        try:
+            import psycopg2
+            import psycopg2.extras
+        except ImportError:
+            raise RuntimeError("psycopg2 is required for a Postgres project source (pip install psycopg2-binary)")
+        with psycopg2.connect(self.url) as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(f'SELECT {", ".join(PROJECT_COLUMNS)} FROM "{self.table}"')
+                return [dict(row) for row in cur.fetchall()]
+
+def open_source(spec):
+    """postgres[ql]://... | sqlite:///path (or a .db/.sqlite file) | a JSON file."""
+    if spec.startswith(("postgres://", "postgresql://")):
+        return PostgresSource(spec)
+    if spec.startswith("sqlite:///"):
+        return SqliteSource(spec[len("sqlite:///"):])
+    if spec.endswith((".db", ".sqlite", ".sqlite3")):
+        return SqliteSource(spec)
+    return JsonSource(spec)
+
+# --- SCHEDULE ---
+
+def parse_run_time(value):
+    """(hour, minute) from "HH:MM", or None if unset / malformed."""
+    try:
+        hour, minute = (int(part) for part in str(value).strip().split(":")[:2])
+    except (TypeError, ValueError):
+        return None
+    if 0 <= hour < 24 and 0 <= minute < 60:
+        return hour, minute
+    return None
+
+def jitter_seconds(project_id, day, jitter):
+    """Start offset for a project on a day: spread over [0, jitter), the same on every check and restart."""
+    if not jitter:
+        return 0
+    digest = hashlib.sha256(f"{project_id}:{day.isoformat()}".encode()).hexdigest()
+    return int(digest[:8], 16) % int(jitter)
+
+def due_at(project, day, jitter=DEFAULT_JITTER):
+    """When the project's run for `day` starts (SCHEDULE_TZ), or None if it isn't scheduled."""
+    hm = parse_run_time(project.get("run_time"))
+    if hm is None or not project.get("instantly_api_key"):
+        return None
+    slot = datetime(day.year, day.month, day.day, hm[0], hm[1], tzinfo=SCHEDULE_TZ)
+    return slot + timedelta(seconds=jitter_seconds(project["id"], day, jitter))
+
+class RunLog:
+    """
+    SQLite record of scheduled runs, one row per (project, day).
+    Status: dispatched (waiting for a pool slot) -> running -> the run's status,
+    or dispatched -> queued (job queue) -> the job's outcome.
+    """
+    def __init__(self, path=DEFAULT_STATE_DB):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS scheduled_runs (
+                    project_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    subdomain TEXT,
+                    due_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    status TEXT,
+                    run_id TEXT,
+                    error TEXT,
+                    summary TEXT,
+                    job_id TEXT,
+                    PRIMARY KEY (project_id, day)
+                )""")
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(scheduled_runs)")]
+            if "job_id" not in columns: # log from before --queue
+                self.conn.execute("ALTER TABLE scheduled_runs ADD COLUMN job_id TEXT")
+
+    def interrupt_stale(self):
+        """
+        Cleans up after a scheduler that died. Runs it had started are closed as
+        "interrupted" (not rerun: they may have applied changes); runs still
+        waiting for a slot never started, so they're dropped and dispatched again.
+        Returns (interrupted, requeued).
+        """
+        with self.lock, self.conn:
+            interrupted = self.conn.execute(
+                "UPDATE scheduled_runs SET status = 'interrupted', finished_at = ? WHERE status = 'running'",
+                (datetime.now(SCHEDULE_TZ).isoformat(),)).rowcount
+            requeued = self.conn.execute("DELETE FROM scheduled_runs WHERE status = 'dispatched'").rowcount
+            return interrupted, requeued
+
+    def claim(self, project, day, due):
+        """Records the run as dispatched. False if this project already has a run for the day."""
+        with self.lock, self.conn:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO scheduled_runs (project_id, day, subdomain, due_at, status) VALUES (?, ?, ?, ?, 'dispatched')",
+                (project["id"], day.isoformat(), project.get("subdomain"), due.isoformat()))
+            return cur.rowcount == 1
+
+    def start(self, project_id, day):
+        """A dispatched run got its slot and is starting now."""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE scheduled_runs SET status = 'running', started_at = ? WHERE project_id = ? AND day = ?",
+                              (datetime.now(SCHEDULE_TZ).isoformat(), project_id, day.isoformat()))
+
+    def set_queued(self, project_id, day, job_id):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE scheduled_runs SET status = 'queued', job_id = ? WHERE project_id = ? AND day = ?",
+                              (job_id, project_id, day.isoformat()))
+
+    def queued(self):
+        """[(project_id, day, job_id)] of runs handed to the job queue and not finished yet."""
+        with self.lock:
+            rows = self.conn.execute("SELECT project_id, day, job_id FROM scheduled_runs WHERE status = 'queued'").fetchall()
+        return [(project_id, date.fromisoformat(day), job_id) for project_id, day, job_id in rows]
+
+    def finish(self, project_id, day, summary):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE scheduled_runs SET finished_at = ?, status = ?, run_id = ?, error = ?, summary = ? WHERE project_id = ? AND day = ?",
+                (datetime.now(SCHEDULE_TZ).isoformat(), summary.get("status"), summary.get("run_id"),
+                 summary.get("error") or summary.get("sheet_error"), json.dumps(summary), project_id, day.isoformat()))
+
+    def recent(self, limit=50):
+        with self.lock:
+            cur = self.conn.execute("SELECT * FROM scheduled_runs ORDER BY COALESCE(started_at, due_at) DESC LIMIT ?", (limit,))
+            columns = [c[0] for c in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+def project_unit(project):
+    """A batch_runner unit (one ad-hoc job) for a project."""
+    job = project_job(project)
+    return {"workspace": workspace_id(job["api_key"]), "jobs": [job]}
+
+def queued_project_unit(project):
+    """
+    project_unit for the job queue: the job names its project instead of carrying
+    its API key, which the node that leases it looks up in its own project source
+    (batch_runner.resolve_projects), so no credentials are stored in the queue.
+    """
+    unit = project_unit(project)
+    job = {k: v for k, v in unit["jobs"][0].items() if k != "api_key"}
+    return dict(unit, jobs=[dict(job, project=project["id"])])
+
+def project_job(project):
+    """A batch_runner ad-hoc job for a project (settings the portal stores; engine defaults otherwise)."""
+    return {
+        "name": project.get("subdomain") or project["id"],
+        "api_key": project["instantly_api_key"],
+        "sheet": project.get("google_sheet_url") or None,
+        "report_email": project.get("report_email") or None,
+    }
+
+class Scheduler:
+    """
+    Runs every project once a day at its run_time (+ jitter), at most max_runs at
+    a time. Each run is an ad-hoc run in its own process (batch_runner.run_unit:
+    timeout, crash isolation) under the workspace lock, so a scheduled run and
+    a UI run never hit one workspace together.
+
+    With a job queue (lib/job_queue.py), due runs are enqueued instead, for
+    worker nodes running `batch_runner.py --consume` (their --workers is then
+    the concurrency cap); outcomes are picked up from the queue on each tick.
+    """
+    def __init__(self, source, run_log, max_runs=DEFAULT_MAX_RUNS, jitter=DEFAULT_JITTER,
+                 timeout=DEFAULT_TIMEOUT, log_dir=None, on_result=None, clock=None, queue=None):
+        self.source = source
+        self.queue = queue
+        self.run_log = run_log
+        self.jitter = jitter
+        self.timeout = timeout
+        self.log_dir = log_dir
+        self.on_result = on_result
+        self.clock = clock or (lambda: datetime.now(SCHEDULE_TZ))
+        self.max_runs = max_runs
+        self.pool = ThreadPoolExecutor(max_workers=max_runs)
+        self.futures = set()
+
+    def due(self, now=None):
+        """[(due_at, day, project)] due by now and not yet run, oldest first."""
+        now = now or self.clock()
+        found = []
+        try:
+            projects = self.source.projects()
+        except Exception as e:
+            logging.error(f"Could not read projects: {e}")
+            return found
+        today = now.date()
+        for project in projects:
+            # Yesterday too: a late run_time + jitter can spill past midnight
+            for day in (today - timedelta(days=1), today):
+                start = due_at(project, day, self.jitter)
+                if start is not None and start <= now and (now - start).total_seconds() <= CATCH_UP_SECONDS:
+                    found.append((start, day, project))
+        return sorted(found, key=lambda d: d[0])
+
+    def tick(self, now=None):
+        """Dispatches whatever is due. Returns the number of runs started."""
+        started = 0
+        for start, day, project in self.due(now):
+            if not self.run_log.claim(project, day, start):
+                continue
+            logging.info(f"Dispatching {project.get('subdomain') or project['id']} (due {start.strftime('%H:%M:%S')})")
+            if self.queue is not None:
+                job_id = self.queue.enqueue({"unit": queued_project_unit(project)}, dedup_key=f"{project['id']}:{day.isoformat()}")
+                self.run_log.set_queued(project["id"], day, job_id)
+            else:
+                self.futures.add(self.pool.submit(self._run, project, day))
+            started += 1
+        self.futures = {f for f in self.futures if not f.done()}
+        if self.queue is not None:
+            self.collect()
+        return started
+
+    def _run(self, project, day):
+        self.run_log.start(project["id"], day)
+        try:
+            summary = run_unit(project_unit(project), self.timeout, self.log_dir)[0]
+        except Exception as e:
+            summary = {"name": project.get("subdomain") or project["id"], "status": "failed", "error": str(e)}
+        self._finish(project["id"], day, summary)
+        return summary
+
+    def _finish(self, project_id, day, summary):
+        summary.update(project_id=project_id, day=day.isoformat())
+        self.run_log.finish(project_id, day, summary)
+        logging.info(f"{summary.get('name', project_id)}: {summary['status']}")
+        if self.on_result: self.on_result(summary)
+
+    def collect(self):
+        """Records the outcome of queued runs the worker nodes have finished (or given up on)."""
+        for project_id, day, job_id in self.run_log.queued():
+            job = self.queue.get(job_id)
+            if job is None:
+                self._finish(project_id, day, {"status": "failed", "error": f"Queue job {job_id} not found"})
+            elif job["status"] == "done" and not job["result"]:
+                # resolve_projects dropped it: the project was deleted, or lost its key, before a node leased it
+                self._finish(project_id, day, {"status": "skipped", "error": "Project gone or without an API key when its run was leased", "queue_job": job_id})
+            elif job["status"] == "done":
+                self._finish(project_id, day, dict(job["result"][0], queue_job=job_id, attempts=job["attempts"]))
+            elif job["status"] == "dead":
+                self._finish(project_id, day, {"status": "failed", "error": job["error"], "queue_job": job_id, "attempts": job["attempts"]})
+
+    def run_once(self):
+        """Dispatch what's due now and wait for it (cron-style). With a queue: enqueue, record finished runs, exit."""
+        self.tick()
+        wait(self.futures)
+        self.pool.shutdown()
+
+    def run_forever(self, poll=POLL_SECONDS):
+        interrupted, requeued = self.run_log.interrupt_stale()
+        if interrupted:
+            logging.warning(f"{interrupted} runs from a previous scheduler were left unfinished; marked interrupted")
+        if requeued:
+            logging.info(f"{requeued} runs a previous scheduler dispatched but never started will be dispatched again")
+        logging.info(f"Scheduler started ({self.max_runs} runs at once, jitter {self.jitter}s)")
+        try:
+            while True:
+                self.tick()
+                time.sleep(poll)
+        finally:
+            # Running tenant processes finish (or time out) before we exit
+            self.pool.shutdown(wait=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run each Project at its run_time (see orchestration/scheduler.py)")
+    parser.add_argument("--source", default=os.environ.get("DATABASE_URL"), help="Projects: postgres URL (Default $DATABASE_URL), sqlite:///path or a JSON file")
+    parser.add_argument("--state", default=DEFAULT_STATE_DB, help=f"Run outcome SQLite DB (Default {DEFAULT_STATE_DB})")
+    parser.add_argument("--max_runs", type=int, default=DEFAULT_MAX_RUNS, help=f"Runs at once across all tenants (Default {DEFAULT_MAX_RUNS})")
+    parser.add_argument("--jitter", type=int, default=DEFAULT_JITTER, help=f"Spread starts over this many seconds after run_time (Default {DEFAULT_JITTER})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help=f"Seconds per run before its process is killed (Default {DEFAULT_TIMEOUT})")
+    parser.add_argument("--log_dir", required=False, help="Per-workspace run logs")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help=f"Seconds between checks (Default {POLL_SECONDS})")
+    parser.add_argument("--once", action="store_true", help="Run what is due now, wait for it and exit (for cron)")
+    parser.add_argument("--queue", required=False, help="Enqueue due runs on this job queue (SQLite path or postgres URL) for `batch_runner.py --consume` worker nodes instead of running them here")
+    parser.add_argument("--history", action="store_true", help="Print recent scheduled runs and exit")
+    args = parser.parse_args()
+
+    run_log = RunLog(args.state)
+    if args.history:
+        for row in run_log.recent():
+            print(json.dumps(row))
+        sys.exit(0)
+    if not args.source:
+        parser.error("--source (or DATABASE_URL) is required")
+
+    scheduler = Scheduler(open_source(args.source), run_log, args.max_runs, args.jitter, args.timeout, args.log_dir,
+                          on_result=lambda r: print(json.dumps({"type": "run", "data": r}), flush=True),
+                          queue=open_queue(args.queue) if args.queue else None)
+    try:
+        if args.once:
+            scheduler.run_once()
+        else:
+            scheduler.run_forever(args.poll)
+    except KeyboardInterrupt:
+        pass
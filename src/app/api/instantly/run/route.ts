@@ -1,10 +1,23 @@
 import { NextResponse } from 'next/server';
 import { spawn } from 'child_process';
+import net from 'net';
+import os from 'os';
 import path from 'path';
 
+// Persistent worker (inboxbench/execution/worker_daemon.py): modules, Google credentials and
+// HTTP pools stay warm, so a run skips the interpreter start + imports. Without it we spawn python3.
+const WORKER_SOCKET = process.env.INBOXBENCH_WORKER_SOCKET || path.join(os.tmpdir(), 'inboxbench-worker.sock');
+
+// Whole number in [min, max], or undefined when not given; NaN when given but invalid
+function intParam(value: unknown, min: number, max: number): number | undefined {
+    if (value === undefined || value === null || value === '') return undefined;
+    const n = Number(value);
+    return Number.isInteger(n) && n >= min && n <= max ? n : NaN;
+}
+
 export async function POST(req: Request) {
     try {
-        const { token, sheetUrl, reportEmail, warmupThreshold, benchPercent, ignoreCustomerTags } = await req.json();
+        const { token, sheetUrl, reportEmail, warmupThreshold, benchPercent, ignoreCustomerTags, deadlineSeconds, resumeRunId, streamRows } = await req.json();
 
         if (!token) {
             return NextResponse.json({ success: false, error: "Token is required" }, { status: 400 });
@@ -18,57 +31,141 @@ export async function POST(req: Request) {
             return NextResponse.json({ success: false, error: "Invalid characters in token" }, { status: 400 });
         }
 
+        const warmup = intParam(warmupThreshold, 0, 100);
+        const bench = intParam(benchPercent, 0, 100);
+        if (Number.isNaN(warmup) || Number.isNaN(bench)) {
+            return NextResponse.json({ success: false, error: "warmupThreshold and benchPercent must be whole numbers from 0 to 100" }, { status: 400 });
+        }
+        const requestedDeadline = deadlineSeconds ?? undefined;
+        if (requestedDeadline !== undefined && !(Number.isFinite(Number(requestedDeadline)) && Number(requestedDeadline) > 0)) {
+            return NextResponse.json({ success: false, error: "deadlineSeconds must be a positive number" }, { status: 400 });
+        }
+        const ignoreTags = ignoreCustomerTags === true || ignoreCustomerTags === 'true';
+
         const args = ["-u", scriptPath, "--key", token]; // -u for unbuffered python output
+        // The same run for the worker daemon (run_adhoc_report keyword args). Every setting goes
+        // over explicitly, at the CLI's defaults, so both paths build (and lock on) the same run.
+        const runArgs: Record<string, any> = {
+            api_key: token, sheet_url: null, warmup_threshold: 70, bench_percent: 0, ignore_customer_tags: ignoreTags,
+        };
         if (sheetUrl) {
             const cleanUrl = sheetUrl.replace(/["']/g, "");
             args.push("--sheet", cleanUrl);
+            runArgs.sheet_url = cleanUrl;
         }
         if (reportEmail) {
             const cleanEmail = reportEmail.replace(/["' ]/g, "");
             args.push("--report_email", cleanEmail);
+            runArgs.report_email = cleanEmail;
         }
-        if (warmupThreshold) {
-            args.push("--warmup_threshold", String(warmupThreshold));
+        if (warmup !== undefined) {
+            args.push("--warmup_threshold", String(warmup));
+            runArgs.warmup_threshold = warmup;
         }
-        if (typeof benchPercent !== 'undefined') {
-            args.push("--bench_percent", String(benchPercent));
+        if (bench !== undefined) {
+            args.push("--bench_percent", String(bench));
+            runArgs.bench_percent = bench;
         }
-        if (ignoreCustomerTags === true || ignoreCustomerTags === 'true') {
+        if (ignoreTags) {
             args.push("--ignore_customer_tags");
         }
+        // Time budget so a long run returns a partial report before the platform cuts the request off.
+        // The result's "resume" (--resume RUN_ID) finishes queued work; send it back as resumeRunId.
+        // That is a full-length run, not a quick finish: it re-fetches the workspace and only skips
+        // the mutation batches and sheet/email already done, so don't present it as "almost done".
+        const deadline = Number(requestedDeadline ?? process.env.INBOXBENCH_RUN_DEADLINE);
+        if (Number.isFinite(deadline) && deadline > 0) {
+            args.push("--deadline", String(deadline));
+            runArgs.deadline = deadline;
+        }
+        // Row stream: besides progress/result, stdout carries batched table rows as the run goes.
+        // Rows are positional against "columns" (repeated on every line):
+        //   {"type": "action", "columns": ["email", "customer_tag", "new_tag", "reason"], "rows": [[...], ...]}
+        //       engine decisions, sent as accounts are evaluated (before the tag update is applied)
+        //   {"type": "account_rows", "columns": ["email", "customer_tag", "status", "daily_limit",
+        //       "warmup_score", "tags", "change", "outcome"], "rows": [[...], ...]}
+        //       final account rows once their tag updates are done; outcome is
+        //       "applied" | "failed" | "queued" | "skipped" | "" (no action)
+        // With rows streamed, result.run_summary.transitions is capped (rows_streamed has the count).
+        // Lines are forwarded as-is; clients that don't know these types ignore them.
+        if (streamRows === true || streamRows === 'true') {
+            args.push("--stream_rows");
+            runArgs.stream_rows = true;
+        }
+        if (resumeRunId) {
+            if (!/^[0-9A-Za-z\-]+$/.test(resumeRunId)) {
+                return NextResponse.json({ success: false, error: "Invalid run id" }, { status: 400 });
+            }
+            args.push("--resume", resumeRunId);
+            runArgs.resume_run_id = resumeRunId;
+        }
 
         const encoder = new TextEncoder();
 
         const stream = new ReadableStream({
             start(controller) {
-                const child = spawn('python3', args);
+                const socket = net.createConnection(WORKER_SOCKET);
+                let connected = false;
+                let ended = false;
 
-                child.stdout.on('data', (data) => {
-                    controller.enqueue(data);
+                socket.on('connect', () => {
+                    connected = true;
+                    socket.write(JSON.stringify({ type: "run", args: runArgs }) + "\n");
                 });
 
-                child.stderr.on('data', (data) => {
-                    console.error(`[Python Stderr]: ${data}`);
+                // Same NDJSON as the script's stdout; the daemon closes the connection after result/error
+                socket.on('data', (data) => {
+                    controller.enqueue(data);
                 });
 
-                child.on('close', (code) => {
-                    if (code !== 0) {
-                        console.error(`Process exited with code ${code}`);
-                        const exitMsg = JSON.stringify({ type: "error", message: `Process exited with code ${code}` });
-                        controller.enqueue(encoder.encode(exitMsg + "\n"));
-                    }
+                socket.on('end', () => {
+                    ended = true;
                     controller.close();
                 });
 
-                child.on('error', (err) => {
-                    console.error("Spawn Error:", err);
-                    const errMsg = JSON.stringify({ type: "error", message: "Spawn Failed: " + err.message });
-                    controller.enqueue(encoder.encode(errMsg + "\n"));
-                    controller.close();
+                socket.on('error', (err) => {
+                    if (ended) return;
+                    if (connected) {
+                        // Never rerun locally here: the daemon may have applied part of the run
+                        console.error("Worker Error:", err);
+                        const errMsg = JSON.stringify({ type: "error", message: "Worker connection lost: " + err.message });
+                        controller.enqueue(encoder.encode(errMsg + "\n"));
+                        controller.close();
+                        return;
+                    }
+                    spawnRun(controller); // No daemon running (ENOENT / ECONNREFUSED)
                 });
             }
         });
 
+        function spawnRun(controller: ReadableStreamDefaultController) {
+            const child = spawn('python3', [...args, "--no_daemon"]);
+
+            child.stdout.on('data', (data) => {
+                controller.enqueue(data);
+            });
+
+            child.stderr.on('data', (data) => {
+                console.error(`[Python Stderr]: ${data}`);
+            });
+
+            child.on('close', (code) => {
+                if (code !== 0) {
+                    console.error(`Process exited with code ${code}`);
+                    const exitMsg = JSON.stringify({ type: "error", message: `Process exited with code ${code}` });
+                    controller.enqueue(encoder.encode(exitMsg + "\n"));
+                }
+                controller.close();
+            });
+
+            child.on('error', (err) => {
+                console.error("Spawn Error:", err);
+                const errMsg = JSON.stringify({ type: "error", message: "Spawn Failed: " + err.message });
+                controller.enqueue(encoder.encode(errMsg + "\n"));
+                controller.close();
+            });
+        }
+
         return new Response(stream, {
             headers: {
                 'Content-Type': 'text/plain; charset=utf-8',
@@ -0,0 +1,86 @@
+import { NextResponse } from 'next/server';
+import { spawn } from 'child_process';
+import path from 'path';
+
+// Read-only what-if: evaluates many warmupThreshold/benchPercent combinations
+// against one workspace fetch. Never mutates tags.
+export async function POST(req: Request) {
+    try {
+        const { token, thresholds, benchPercents, ignoreCustomerTags } = await req.json();
+
+        if (!token) {
+            return NextResponse.json({ success: false, error: "Token is required" }, { status: 400 });
+        }
+
+        // Sanitize
+        if (/[^a-zA-Z0-9\-\_\=\:\.]/.test(token)) {
+            return NextResponse.json({ success: false, error: "Invalid characters in token" }, { status: 400 });
+        }
+
+        const toIntList = (value: unknown): string | null => {
+            if (!Array.isArray(value) || value.length === 0) return null;
+            const ints = value.map((v) => parseInt(String(v), 10)).filter((v) => Number.isFinite(v));
+            return ints.length ? ints.join(",") : null;
+        };
+
+        const scriptPath = path.join(process.cwd(), 'inboxbench/execution/run_threshold_sweep.py');
+        const args = ["-u", scriptPath, "--key", token];
+
+        const thresholdList = toIntList(thresholds);
+        if (thresholdList) {
+            args.push("--thresholds", thresholdList);
+        }
+        const benchList = toIntList(benchPercents);
+        if (benchList) {
+            args.push("--bench_percents", benchList);
+        }
+        if (ignoreCustomerTags === true || ignoreCustomerTags === 'true') {
+            args.push("--ignore_customer_tags");
+        }
+
+        const encoder = new TextEncoder();
+
+        const stream = new ReadableStream({
+            start(controller) {
+                const child = spawn('python3', args);
+
+                child.stdout.on('data', (data) => {
+                    controller.enqueue(data);
+                });
+
+                child.stderr.on('data', (data) => {
+                    console.error(`[Python Stderr]: ${data}`);
+                });
+
+                child.on('close', (code) => {
+                    if (code !== 0) {
+                        console.error(`Process exited with code ${code}`);
+                        const exitMsg = JSON.stringify({ type: "error", message: `Process exited with code ${code}` });
+                        controller.enqueue(encoder.encode(exitMsg + "\n"));
+                    }
+                    controller.close();
+                });
+
+                child.on('error', (err) => {
+                    console.error("Spawn Error:", err);
+                    const errMsg = JSON.stringify({ type: "error", message: "Spawn Failed: " + err.message });
+                    controller.enqueue(encoder.encode(errMsg + "\n"));
+                    controller.close();
+                });
+            }
+        });
+
+        return new Response(stream, {
+            headers: {
+                'Content-Type': 'text/plain; charset=utf-8',
+                'X-Content-Type-Options': 'nosniff',
+            },
+        });
+
+    } catch (error: any) {
+        return NextResponse.json({
+            success: false,
+            error: error.message
+        }, { status: 500 });
+    }
+}